@@ -0,0 +1,232 @@
+# batch.py
+
+import csv
+import json
+import os
+from collections import namedtuple
+
+from cost_index import CostIndex
+from filament_calculations import parse_usage
+from report_output import Column, open_sink
+from snapshot_store import id_sort_key
+
+JOB_FIELDS = ["job_id", "spools", "grams", "cost", "error"]
+SUMMARY_FIELDS = ["spool_id", "spool_name", "material", "jobs", "grams", "cost"]
+SUMMARY_COLUMNS = [
+    Column("spool_id", "Spool ID", 10, ""),
+    Column("spool_name", "Spool Name", 30, ""),
+    Column("jobs", "Jobs", 8, "d"),
+    Column("grams", "Grams", 12, ".2f"),
+    Column("cost", "Cost", 12, ".2f"),
+]
+
+JOB_ROW_ERROR = "each row needs a job_id, spool_id and usage."
+EMPTY_JOB_ERROR = "Job lists no spools."
+
+# A job to price: items is [(spool_id, usage), ...], error is '' unless the job
+# could not be read, in which case items is empty. Plain (job_id, items) pairs work too.
+Job = namedtuple("Job", ["job_id", "items", "error"], defaults=("",))
+# One priced job: lines holds (spool_id, grams, cost) per spool, error is '' unless it failed
+JobCost = namedtuple("JobCost", ["job_id", "spools", "lines", "grams", "cost", "error"])
+BatchResult = namedtuple("BatchResult", ["jobs", "totals"])
+
+def read_jobs(path):
+    """
+    Streams jobs from a CSV or JSON Lines job file as Job(job_id, [(spool_id, usage), ...], error).
+
+    CSV files have the columns job_id, spool_id and usage, with one row per spool
+    used; consecutive rows sharing a job_id form one job. Any other file is read
+    as JSON Lines, one job per line:
+        {"job_id": "benchy", "spools": [{"spool_id": 1, "usage": "12.5m"}]}
+    Usage strings are read by parse_usage: '100g', '1.34m', '1,5kg' or '12.3m+4g'.
+    A malformed line or row does not stop the batch: its job is yielded with the
+    line number and the problem in its error.
+    """
+    if path.lower().endswith(".csv"):
+        yield from _read_csv_jobs(path)
+    else:
+        yield from _read_jsonl_jobs(path)
+
+def _read_csv_jobs(path):
+    with open(path, "r", newline="") as job_file:
+        reader = csv.DictReader(job_file)
+        current_id = None
+        items = []
+        error = ""
+        for row in reader:
+            job_id = row.get("job_id") or f"line {reader.line_num}"
+            if (items or error) and job_id != current_id:
+                yield Job(current_id, [] if error else items, error)
+                items = []
+                error = ""
+            current_id = job_id
+            spool_id, usage = row.get("spool_id"), row.get("usage")
+            if spool_id is None or usage is None or "job_id" not in row:
+                # A bad row fails its whole job rather than the batch
+                error = error or f"Line {reader.line_num}: {JOB_ROW_ERROR}"
+                continue
+            items.append((spool_id.strip(), usage))
+        if items or error:
+            yield Job(current_id, [] if error else items, error)
+
+def _read_jsonl_jobs(path):
+    with open(path, "r") as job_file:
+        for line_number, line in enumerate(job_file, start=1):
+            if not line.strip():
+                continue
+            job_id = str(line_number)
+            try:
+                job = json.loads(line)
+                job_id = job.get("job_id", job_id)
+                items = [(str(item["spool_id"]), str(item["usage"])) for item in job.get("spools", [])]
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                # A malformed line fails its own job rather than the batch
+                if isinstance(e, json.JSONDecodeError):
+                    detail = e.msg
+                elif isinstance(e, KeyError):
+                    detail = f"missing {e}"
+                else:
+                    detail = "not a job object"
+                yield Job(job_id, [], f"Line {line_number}: invalid job ({detail}).")
+                continue
+            yield Job(job_id, items)
+
+def price_job(items, index):
+    """
+    Prices one job against a CostIndex and returns a list of (spool_id, grams, cost) lines.
+
+    Raises ValueError for unknown spools or invalid usage. Unlike the interactive
+    calculator, usage is not checked against the remaining weight, since batch
+    jobs are usually costed after they have been printed.
+    """
+    lines = []
+    for spool_id, usage in items:
+        record = index[spool_id]
+        grams, meters = parse_usage(usage)
+        grams += record.grams(meters, 'm')
+        lines.append((spool_id, grams, record.cost(grams)))
+    return lines
+
+def cost_jobs(jobs, index):
+    """
+    Prices a stream of Job or (job_id, items) jobs against a CostIndex, yielding a
+    JobCost per job in order. Never raises for bad jobs: a job with no spools, an
+    unknown spool or invalid usage gets the message in its error field instead, and
+    a Job that could not be read (such as an unreadable G-code file) keeps its own error.
+    """
+    for job in jobs:
+        job_id, items = job[0], job[1]
+        if len(job) > 2 and job[2]:
+            yield JobCost(job_id, 0, [], 0.0, 0.0, job[2])
+            continue
+        if not items:
+            yield JobCost(job_id, 0, [], 0.0, 0.0, EMPTY_JOB_ERROR)
+            continue
+        try:
+            lines = price_job(items, index)
+        except ValueError as e:
+            yield JobCost(job_id, len(items), [], 0.0, 0.0, str(e))
+            continue
+        yield JobCost(
+            job_id, len(items), lines, sum(grams for _, grams, _ in lines), sum(cost for _, _, cost in lines), ""
+        )
+
+def add_totals(totals, job, index):
+    """
+    Adds the lines of a priced JobCost to per-spool totals (dicts with SUMMARY_FIELDS, keyed by spool ID).
+    """
+    for spool_id, grams, cost in job.lines:
+        total = totals.get(spool_id)
+        if total is None:
+            record = index[spool_id]
+            total = totals[spool_id] = {
+                "spool_id": spool_id,
+                "spool_name": record.name,
+                "material": record.material,
+                "jobs": 0,
+                "grams": 0.0,
+                "cost": 0.0,
+            }
+        total["jobs"] += 1
+        total["grams"] += grams
+        total["cost"] += cost
+    return totals
+
+def price_batch(jobs, spools):
+    """
+    Prices jobs against spools (a spool list or a CostIndex) and returns a
+    BatchResult with the JobCost of every job and the per-spool totals.
+
+    Nothing is printed or written, and no state is shared between calls, so it
+    can be called from several threads at once. For job streams too large to keep
+    the results of, use cost_jobs and add_totals instead.
+    """
+    index = spools if isinstance(spools, CostIndex) else CostIndex(spools)
+    results = []
+    totals = {}
+    for job in cost_jobs(jobs, index):
+        results.append(job)
+        add_totals(totals, job, index)
+    return BatchResult(results, [totals[spool_id] for spool_id in sorted(totals, key=id_sort_key)])
+
+def job_row(job):
+    """
+    Returns the per-job result dict (with JOB_FIELDS) of a JobCost.
+    """
+    return {"job_id": job.job_id, "spools": job.spools, "grams": job.grams, "cost": job.cost, "error": job.error}
+
+def run_batch(jobs, index, write_job):
+    """
+    Prices a stream of jobs against a CostIndex, passing each per-job result dict to write_job.
+
+    Returns the per-spool totals, keyed by spool ID, for the jobs that priced
+    successfully. Only the totals are kept, so memory does not grow with the
+    number of jobs.
+    """
+    totals = {}
+    for job in cost_jobs(jobs, index):
+        add_totals(totals, job, index)
+        write_job(job_row(job))
+    return totals
+
+def default_output_path(job_path):
+    """
+    Returns the default per-job results path for a job file, e.g. jobs.csv -> jobs_costs.csv.
+    """
+    stem, extension = os.path.splitext(job_path)
+    return f"{stem}_costs{extension if extension.lower() == '.csv' else '.jsonl'}"
+
+def batch_costs(job_path, spools, output_path=None, summary_path=None):
+    """
+    Prices every job in a job file against one fetch of spools and writes the results.
+
+    Per-job results are streamed to output_path. Per-spool totals are written to
+    summary_path when given, otherwise printed as a table.
+    """
+    price_jobs(read_jobs(job_path), spools, output_path or default_output_path(job_path), summary_path)
+
+def price_jobs(jobs, spools, output_path, summary_path=None):
+    """
+    Prices a stream of (job_id, items) jobs like batch_costs, whatever they were read from.
+    """
+    index = CostIndex(spools)
+
+    with open_sink(output_path, JOB_FIELDS) as job_writer:
+        totals = run_batch(jobs, index, job_writer.write)
+    print(f"Job costs written to {output_path}")
+    write_summary(totals, summary_path)
+
+def write_summary(totals, summary_path=None):
+    """
+    Writes per-spool totals (as returned by run_batch) to summary_path, or prints them as a table.
+    """
+    rows = sorted(totals.values(), key=lambda row: id_sort_key(row["spool_id"]))
+    with open_sink(summary_path, SUMMARY_FIELDS, columns=SUMMARY_COLUMNS, title="\nSummary of Filament Usage:") as sink:
+        sink.write_rows(rows)
+        sink.footer({
+            "spool_id": "TOTAL",
+            "grams": sum(row['grams'] for row in rows),
+            "cost": sum(row['cost'] for row in rows),
+        })
+    if summary_path:
+        print(f"Summary written to {summary_path}")
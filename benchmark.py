@@ -0,0 +1,324 @@
+# benchmark.py
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from batch import price_jobs, read_jobs
+from binary_snapshot import write_binary_snapshot
+from filament_calculations import calculate_cost, calculate_costs, iter_spools, parse_filament_input, parse_filament_inputs
+from snapshot_store import SnapshotStore
+from snapshot_utils import compare_snapshots, compare_snapshots_streaming, snapshot_record, write_snapshot_json
+from spoolman_client import SpoolmanClient
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_OUTPUT = "benchmark_results.json"
+MATERIALS = ("PLA", "PETG", "ABS", "ASA", "TPU", "PA-CF")
+
+def synthetic_spool(spool_id, seed=0):
+    """
+    Returns one synthetic Spoolman spool, always the same for a given ID and seed,
+    so spool lists of any size can be generated without being kept in memory.
+    """
+    rng = random.Random(seed * 1_000_003 + spool_id)
+    initial_weight = rng.choice((250.0, 500.0, 750.0, 1000.0, 2000.0))
+    material = rng.choice(MATERIALS)
+    return {
+        "id": spool_id,
+        "registered": "2025-01-01T00:00:00Z",
+        "price": round(rng.uniform(12.0, 60.0), 2),
+        "initial_weight": initial_weight,
+        "remaining_weight": round(rng.uniform(0.0, initial_weight), 1),
+        "used_weight": 0.0,
+        "archived": False,
+        "filament": {
+            "id": spool_id % 500 + 1,
+            "name": f"{material} {rng.choice(('Black', 'White', 'Red', 'Blue', 'Grey'))} #{spool_id % 500 + 1}",
+            "material": material,
+            "color_hex": f"{rng.randrange(0x1000000):06x}",
+            "diameter": 1.75,
+            "density": rng.choice((1.24, 1.27, 1.04, 1.07, 1.21, 1.15)),
+        },
+    }
+
+def synthetic_spools(count, seed=0):
+    """
+    Yields count synthetic spools with IDs 1..count.
+    """
+    for spool_id in range(1, count + 1):
+        yield synthetic_spool(spool_id, seed)
+
+def used_spools(spools, seed=1):
+    """
+    Yields the spools with some filament used from about a third of them, as a later snapshot would see them.
+    """
+    rng = random.Random(seed)
+    for spool in spools:
+        if rng.random() < 0.3:
+            spool = dict(spool, remaining_weight=max(0.0, spool["remaining_weight"] - round(rng.uniform(1, 150), 1)))
+        yield spool
+
+class FakeSpoolman:
+    """
+    Local stand-in for the Spoolman API serving count synthetic spools from GET /api/v1/spool
+    with limit/offset pagination, generated on the fly for each page.
+    """
+
+    def __init__(self, count, seed=0):
+        self.count = count
+        self.seed = seed
+        self.requests = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path.rstrip("/") != "/api/v1/spool":
+                    self.send_error(404)
+                    return
+                fake.requests += 1
+                params = parse_qs(url.query)
+                offset = int(params.get("offset", ["0"])[0])
+                limit = int(params.get("limit", [str(fake.count)])[0])
+                end = min(fake.count, offset + limit)
+                body = json.dumps([synthetic_spool(spool_id, fake.seed) for spool_id in range(offset + 1, end + 1)]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/v1"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
+
+def measure(function, memory=True):
+    """
+    Runs function() and returns (seconds, peak_memory_bytes, result).
+
+    The time comes from a run without tracing, since tracemalloc slows allocation
+    heavily; with memory=True, function is run a second time under tracemalloc to
+    get its peak Python heap usage.
+    """
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return seconds, peak, result
+
+@contextlib.contextmanager
+def _quiet():
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+# Fixture files each scenario reads, so only the selected scenarios' files are written
+SCENARIO_FIXTURES = {
+    "compare_json": ("json",),
+    "compare_streaming": ("json",),
+    "compare_binary": ("binary",),
+    "batch_costing": ("jobs",),
+}
+
+def scenarios(size, directory, spoolman_url, seed=0, only=None):
+    """
+    Returns (name, function, items) for every benchmark scenario at one spool count,
+    or for those named in only. Each function can be called more than once.
+
+    Spool lists are generated on the fly rather than held in memory, so scenarios
+    that consume spools include generating them; the 'generate' scenario measures
+    that share on its own. Fixture files are written up front for the returned
+    scenarios only.
+    """
+    inputs = [f"{(spool_id % 997) / 10:.1f}{'gm'[spool_id % 2]}" for spool_id in range(size)]
+    spools_path = os.path.join(directory, f"spools_{size}.json")
+    used_path = os.path.join(directory, f"used_{size}.json")
+    binary_paths = [os.path.join(directory, f"spools_{size}.spsnap"), os.path.join(directory, f"used_{size}.spsnap")]
+    jobs_path = os.path.join(directory, f"jobs_{size}.jsonl")
+
+    weights = [float(250 * (number % 8 + 1)) for number in range(min(size, 100000))]
+    prices = [12.0 + number % 48 for number in range(len(weights))]
+
+    def generate():
+        for _ in synthetic_spools(size, seed):
+            pass
+
+    def parse():
+        for text in inputs:
+            parse_filament_input(text)
+
+    def parse_bulk():
+        parse_filament_inputs(inputs)
+
+    def cost_scalar():
+        for weight, price in zip(weights, prices):
+            calculate_cost(10.0, weight, price)
+
+    def cost_vectorized():
+        calculate_costs([10.0] * size, [1000.0] * size, [25.0] * size)
+
+    def fetch():
+        with SpoolmanClient(spoolman_url, retries=0) as client:
+            return sum(1 for _ in iter_spools(spoolman_url, client=client))
+
+    def snapshot_json():
+        with open(os.path.join(directory, "write.json"), "w") as snapshot_file:
+            write_snapshot_json((snapshot_record(spool) for spool in synthetic_spools(size, seed)), snapshot_file)
+
+    def snapshot_binary():
+        write_binary_snapshot((snapshot_record(spool) for spool in synthetic_spools(size, seed)), os.path.join(directory, "write.spsnap"))
+
+    def snapshot_store():
+        path = os.path.join(directory, "store.db")
+        if os.path.exists(path):
+            os.remove(path)
+        with SnapshotStore(path) as store:
+            store.append(synthetic_spools(size, seed))
+
+    def compare_json():
+        with _quiet():
+            compare_snapshots(spools_path, used_path)
+
+    def compare_streaming():
+        with _quiet():
+            compare_snapshots_streaming(spools_path, used_path)
+
+    def compare_binary():
+        with _quiet():
+            compare_snapshots(*binary_paths)
+
+    def batch():
+        with _quiet():
+            price_jobs(
+                read_jobs(jobs_path), synthetic_spools(size, seed), os.path.join(directory, "job_costs.jsonl"),
+                summary_path=os.path.join(directory, "summary.jsonl"),
+            )
+
+    selected = [
+        ("generate", generate, size),
+        ("parse_filament_input", parse, size),
+        ("parse_filament_inputs", parse_bulk, size),
+        ("calculate_cost", cost_scalar, len(weights)),
+        ("calculate_costs", cost_vectorized, size),
+        ("fetch", fetch, size),
+        ("snapshot_write_json", snapshot_json, size),
+        ("snapshot_write_binary", snapshot_binary, size),
+        ("snapshot_store_append", snapshot_store, size),
+        ("compare_json", compare_json, size),
+        ("compare_streaming", compare_streaming, size),
+        ("compare_binary", compare_binary, size),
+        ("batch_costing", batch, size),
+    ]
+    if only:
+        selected = [scenario for scenario in selected if scenario[0] in only]
+    fixtures = {fixture for name, _, _ in selected for fixture in SCENARIO_FIXTURES.get(name, ())}
+
+    if "json" in fixtures:
+        with open(spools_path, "w") as spools_file:
+            write_snapshot_json((snapshot_record(spool) for spool in synthetic_spools(size, seed)), spools_file)
+        with open(used_path, "w") as used_file:
+            write_snapshot_json((snapshot_record(spool) for spool in used_spools(synthetic_spools(size, seed))), used_file)
+    if "binary" in fixtures:
+        write_binary_snapshot((snapshot_record(spool) for spool in synthetic_spools(size, seed)), binary_paths[0])
+        write_binary_snapshot((snapshot_record(spool) for spool in used_spools(synthetic_spools(size, seed))), binary_paths[1])
+    if "jobs" in fixtures:
+        with open(jobs_path, "w") as jobs_file:
+            for number in range(size):
+                job = {"job_id": number, "spools": [{"spool_id": number + 1, "usage": inputs[number]}]}
+                jobs_file.write(json.dumps(job) + "\n")
+    return selected
+
+def run_benchmarks(sizes=DEFAULT_SIZES, only=None, memory=True, seed=0, report=print):
+    """
+    Runs the scenarios (all, or those named in only) for each spool count and returns
+    the results document: environment details plus one entry per scenario and size
+    with its time, throughput and peak memory.
+    """
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory, FakeSpoolman(size, seed) as fake:
+            for name, function, items in scenarios(size, directory, fake.url, seed, only):
+                seconds, peak, _ = measure(function, memory)
+                results.append({
+                    "scenario": name,
+                    "size": size,
+                    "seconds": round(seconds, 6),
+                    "items_per_second": round(items / seconds, 1) if seconds > 0 else None,
+                    "peak_memory_bytes": peak,
+                })
+                report("{:<24} {:>9} {:>10.3f}s {:>14.0f}/s {:>12}".format(
+                    name, size, seconds, results[-1]["items_per_second"] or 0,
+                    "-" if peak is None else f"{peak / 1e6:.1f} MB",
+                ))
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for costing, parsing, fetching and snapshot diffing.")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="Comma-separated spool counts to run, e.g. '1000,10000,1000000'."
+    )
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        help="Only run this scenario (may be repeated)."
+    )
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="Skip the second, traced run that measures peak memory."
+    )
+    parser.add_argument(
+        "--output",
+        default=DEFAULT_OUTPUT,
+        help=f"Where to write the JSON results (default: {DEFAULT_OUTPUT})."
+    )
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    print("{:<24} {:>9} {:>11} {:>16} {:>12}".format("Scenario", "Spools", "Time", "Throughput", "Peak memory"))
+    print("-" * 76)
+    document = run_benchmarks(sizes, only=args.scenario, memory=not args.no_memory)
+    with open(args.output, "w") as output_file:
+        json.dump(document, output_file, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
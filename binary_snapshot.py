@@ -0,0 +1,252 @@
+# binary_snapshot.py
+
+import math
+import mmap
+import struct
+from array import array
+
+BINARY_EXTENSION = ".spsnap"
+
+MAGIC = b"SPSNAP"
+VERSION = 2  # Version 2 adds the instance column; version 1 files are still read
+# magic, version, record count, byte offset of the string table
+HEADER = struct.Struct("<6sHQQ")
+NO_STRING = 0xFFFFFFFF  # String index used for missing names, materials and colors
+
+# Column layout after the header, each column holding one value per spool
+NUMERIC_COLUMNS = (("id", "<i8"), ("price", "<f8"), ("initial_weight", "<f8"), ("remaining_weight", "<f8"))
+STRING_COLUMNS = ("name", "material", "color_hex")
+# Instance of a namespaced spool ID ('farm1' for 'farm1:12'); the id column keeps the number
+INSTANCE_COLUMN = "instance"
+
+def is_binary_snapshot(path):
+    """
+    Tells whether a snapshot path uses the binary format, going by its extension.
+    """
+    return path.lower().endswith(BINARY_EXTENSION)
+
+def write_binary_snapshot(records, path):
+    """
+    Writes spool records (in the snapshot file format) as a columnar binary snapshot.
+
+    Numbers are stored as fixed-width little-endian columns (missing prices and
+    weights as NaN) and names, materials and colors as indexes into a shared,
+    deduplicated string table. Namespaced IDs ('farm1:12') are split into the
+    numeric id column and the instance column. Returns the number of spools written.
+    """
+    numeric = {name: array("q" if name == "id" else "d") for name, _ in NUMERIC_COLUMNS}
+    strings = {name: array("I") for name in STRING_COLUMNS + (INSTANCE_COLUMN,)}
+    string_index = {}
+
+    for record in records:
+        spool_id = record["id"]
+        instance = None
+        if isinstance(spool_id, str):
+            instance, _, spool_id = spool_id.rpartition(":")
+            if not spool_id.isdigit():
+                raise ValueError(f"Binary snapshots need numeric spool IDs, got '{record['id']}'.")
+        numeric["id"].append(int(spool_id))
+        strings[INSTANCE_COLUMN].append(
+            NO_STRING if not instance else string_index.setdefault(instance, len(string_index))
+        )
+        for name in ("price", "initial_weight", "remaining_weight"):
+            value = record.get(name)
+            numeric[name].append(float("nan") if value is None else float(value))
+        filament = record.get("filament") or {}
+        for name in STRING_COLUMNS:
+            value = filament.get(name)
+            if value is None:
+                strings[name].append(NO_STRING)
+            else:
+                strings[name].append(string_index.setdefault(value, len(string_index)))
+
+    count = len(numeric["id"])
+    encoded = [value.encode("utf-8") for value in string_index]
+    offsets = array("I", [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+
+    columns_size = count * (8 * len(NUMERIC_COLUMNS) + 4 * (len(STRING_COLUMNS) + 1))
+    strings_offset = HEADER.size + columns_size
+    with open(path, "wb") as snapshot_file:
+        snapshot_file.write(HEADER.pack(MAGIC, VERSION, count, strings_offset))
+        for name, _ in NUMERIC_COLUMNS:
+            snapshot_file.write(_little_endian(numeric[name]))
+        for name in STRING_COLUMNS + (INSTANCE_COLUMN,):
+            snapshot_file.write(_little_endian(strings[name]))
+        snapshot_file.write(struct.pack("<I", len(encoded)))
+        snapshot_file.write(_little_endian(offsets))
+        snapshot_file.write(b"".join(encoded))
+    return count
+
+def _little_endian(values):
+    if struct.pack("=I", 1) != struct.pack("<I", 1):
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+class BinarySnapshot:
+    """
+    Read-only view of a binary snapshot file through mmap.
+
+    The numeric columns (ids, price, initial_weight, remaining_weight) are NumPy
+    arrays backed directly by the mapped file, so no data is copied or parsed
+    until it is used. Strings are decoded on demand.
+    """
+
+    def __init__(self, path):
+        import numpy as np  # Only needed once a binary snapshot is actually read
+
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, strings_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version not in (1, VERSION):
+            self.close()
+            raise ValueError(f"{path} is not a binary snapshot (version 1 or {VERSION}).")
+
+        self.count = count
+        offset = HEADER.size
+        self.columns = {}
+        for name, dtype in NUMERIC_COLUMNS:
+            self.columns[name] = np.frombuffer(self._map, dtype=dtype, count=count, offset=offset)
+            offset += 8 * count
+        for name in STRING_COLUMNS + ((INSTANCE_COLUMN,) if version >= 2 else ()):
+            self.columns[name] = np.frombuffer(self._map, dtype="<u4", count=count, offset=offset)
+            offset += 4 * count
+        self.has_instances = version >= 2 and bool(np.any(self.columns[INSTANCE_COLUMN] != NO_STRING))
+
+        (string_count,) = struct.unpack_from("<I", self._map, strings_offset)
+        self._string_offsets = np.frombuffer(
+            self._map, dtype="<u4", count=string_count + 1, offset=strings_offset + 4
+        )
+        self._strings_start = strings_offset + 4 + 4 * (string_count + 1)
+        self._strings = {}
+
+    @property
+    def ids(self):
+        return self.columns["id"]
+
+    def string(self, index):
+        """
+        Returns the string table entry at an index, or None for a missing value.
+        """
+        index = int(index)
+        if index == NO_STRING:
+            return None
+        value = self._strings.get(index)
+        if value is None:
+            start = self._strings_start + int(self._string_offsets[index])
+            end = self._strings_start + int(self._string_offsets[index + 1])
+            value = self._strings[index] = self._map[start:end].decode("utf-8")
+        return value
+
+    def record(self, row):
+        """
+        Returns one spool as a record in the snapshot file format.
+        """
+        columns = self.columns
+        spool_id = int(columns["id"][row])
+        if self.has_instances:
+            instance = self.string(columns[INSTANCE_COLUMN][row])
+            if instance is not None:
+                spool_id = f"{instance}:{spool_id}"
+        return {
+            "id": spool_id,
+            "price": _number(columns["price"][row]),
+            "initial_weight": _number(columns["initial_weight"][row]),
+            "remaining_weight": _number(columns["remaining_weight"][row]),
+            "filament": {name: self.string(columns[name][row]) for name in STRING_COLUMNS},
+        }
+
+    def instances(self):
+        """
+        Returns the distinct instance names used by namespaced IDs in this snapshot.
+        """
+        if not self.has_instances:
+            return set()
+        import numpy as np
+
+        indexes = np.unique(self.columns[INSTANCE_COLUMN])
+        return {self.string(index) for index in indexes if index != NO_STRING}
+
+    def join_keys(self, instances):
+        """
+        Returns one int64 key per row combining the instance (by its position in
+        the sorted instances list, 0 for none) and the numeric ID, so rows can be
+        matched across snapshots whose string tables differ.
+        """
+        if not self.has_instances:
+            return self.ids
+        import numpy as np
+
+        column = self.columns[INSTANCE_COLUMN]
+        indexes = np.unique(column)
+        codes = np.array(
+            [0 if index == NO_STRING else instances.index(self.string(index)) + 1 for index in indexes],
+            dtype=np.int64,
+        )
+        return (codes[np.searchsorted(indexes, column)] << 40) | self.ids
+
+    def iter_records(self):
+        for row in range(self.count):
+            yield self.record(row)
+
+    def close(self):
+        # The NumPy views must be released before the map can be closed
+        self.columns = {}
+        self._string_offsets = None
+        try:
+            self._map.close()
+        except BufferError:
+            pass  # Arrays handed out by this snapshot are still alive; the map closes with them
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def _number(value):
+    return None if math.isnan(value) else float(value)
+
+def iter_binary_records(path):
+    """
+    Yields the spool records of a binary snapshot file one at a time.
+    """
+    with BinarySnapshot(path) as snapshot:
+        yield from snapshot.iter_records()
+
+def binary_comparison_pairs(snapshot1, snapshot2, show_zero_diff=False):
+    """
+    Yields (spool_id, spool1, spool2) pairs for two binary snapshots in spool ID order,
+    with None for a spool missing on one side.
+
+    Matching and change detection run on the memory-mapped columns with NumPy, and
+    records are only built for the spools that are reported: spools whose remaining
+    weight changed, spools on one side only, and with show_zero_diff all others.
+    """
+    import numpy as np
+
+    instances = sorted(snapshot1.instances() | snapshot2.instances())
+    ids1, ids2 = snapshot1.join_keys(instances), snapshot2.join_keys(instances)
+    _, rows1, rows2 = np.intersect1d(ids1, ids2, assume_unique=True, return_indices=True)
+    only1 = np.setdiff1d(np.arange(len(ids1)), rows1, assume_unique=True)
+    only2 = np.setdiff1d(np.arange(len(ids2)), rows2, assume_unique=True)
+
+    if not show_zero_diff:
+        weight1 = np.nan_to_num(snapshot1.columns["remaining_weight"][rows1])
+        weight2 = np.nan_to_num(snapshot2.columns["remaining_weight"][rows2])
+        changed = weight1 != weight2
+        rows1, rows2 = rows1[changed], rows2[changed]
+
+    # Merge the three groups into one ID-ordered sequence of (group, row in snapshot1, row in snapshot2)
+    ids = np.concatenate([ids2[rows2], ids1[only1], ids2[only2]])
+    groups = np.concatenate([np.zeros(len(rows2), np.int8), np.ones(len(only1), np.int8), np.full(len(only2), 2, np.int8)])
+    first = np.concatenate([rows1, only1, np.full(len(only2), -1)])
+    second = np.concatenate([rows2, np.full(len(only1), -1), only2])
+    for position in np.argsort(ids, kind="stable"):
+        spool1 = snapshot1.record(first[position]) if groups[position] != 2 else None
+        spool2 = snapshot2.record(second[position]) if groups[position] != 1 else None
+        yield (spool2 or spool1)["id"], spool1, spool2
@@ -0,0 +1,125 @@
+# cost_index.py
+
+from filament_calculations import (
+    NEGATIVE_USAGE_ERROR,
+    SPOOL_WEIGHT_ZERO_ERROR,
+    calculate_mass_per_meter,
+)
+
+DEFAULT_DIAMETER = 1.75  # mm, when a filament has none
+DEFAULT_DENSITY = 1.24  # g/cm³ (PLA), when a filament has none
+
+class SpoolCosts:
+    """
+    Per-spool costing constants, computed once when the spool enters the index.
+    """
+
+    __slots__ = ("spool_id", "name", "material", "color_hex", "cost_per_gram", "grams_per_meter", "remaining_grams", "signature")
+
+    def __init__(self, spool, signature):
+        filament = spool.get('filament') or {}
+        price, initial_weight, remaining_weight, diameter, density = signature[:5]
+        self.spool_id = str(spool['id'])
+        self.name = filament.get('name') or 'Unknown'
+        self.material = filament.get('material') or 'Unknown'
+        self.color_hex = filament.get('color_hex')
+        # Same arithmetic as calculate_costs, so indexed costs match it exactly
+        self.cost_per_gram = price / initial_weight if initial_weight != 0 else None
+        self.grams_per_meter = calculate_mass_per_meter(diameter, density)
+        self.remaining_grams = remaining_weight
+        self.signature = signature
+
+    @property
+    def price(self):
+        return self.signature[0]
+
+    @property
+    def diameter(self):
+        return self.signature[3]
+
+    @property
+    def density(self):
+        return self.signature[4]
+
+    def grams(self, value, unit):
+        """
+        Converts a usage value in 'g' or 'm' (as parse_filament_input returns it) to grams.
+        """
+        return value * self.grams_per_meter if unit == 'm' else value
+
+    def cost(self, grams):
+        """
+        Returns the cost of using some grams of this spool, raising ValueError like calculate_cost.
+        """
+        if self.cost_per_gram is None:
+            raise ValueError(SPOOL_WEIGHT_ZERO_ERROR)
+        if grams < 0:
+            raise ValueError(NEGATIVE_USAGE_ERROR)
+        return grams * self.cost_per_gram
+
+def _default(value, default):
+    return default if value is None else value
+
+def _signature(spool):
+    # Every field the costing constants depend on, with the defaults applied
+    filament = spool.get('filament') or {}
+    return (
+        float(spool.get('price') or 0.0),
+        float(spool.get('initial_weight') or 0.0),
+        float(spool.get('remaining_weight') or 0.0),
+        float(_default(filament.get('diameter'), DEFAULT_DIAMETER)),
+        float(_default(filament.get('density'), DEFAULT_DENSITY)),
+        filament.get('name', 'Unknown'),
+        filament.get('material', 'Unknown'),
+        filament.get('color_hex'),
+    )
+
+class CostIndex:
+    """
+    Maps spool IDs (as strings) to SpoolCosts records, built once per fetch of spools.
+
+    update() takes a fresh spool list and only rebuilds the records of spools whose
+    price, weights or filament fields changed, so refreshing a large index costs
+    little more than comparing it.
+    """
+
+    def __init__(self, spools=()):
+        self.records = {}
+        self.update(spools)
+
+    def update(self, spools, complete=True):
+        """
+        Brings the index up to date with a spool list and returns the number of
+        records added, rebuilt or removed. With complete=True, spools missing from
+        the list are dropped from the index.
+        """
+        changed = 0
+        seen = set()
+        for spool in spools:
+            spool_id = str(spool['id'])
+            seen.add(spool_id)
+            signature = _signature(spool)
+            record = self.records.get(spool_id)
+            if record is None or record.signature != signature:
+                self.records[spool_id] = SpoolCosts(spool, signature)
+                changed += 1
+        if complete:
+            for spool_id in [spool_id for spool_id in self.records if spool_id not in seen]:
+                del self.records[spool_id]
+                changed += 1
+        return changed
+
+    def get(self, spool_id):
+        return self.records.get(str(spool_id))
+
+    def __getitem__(self, spool_id):
+        record = self.records.get(str(spool_id))
+        if record is None:
+            raise ValueError(f"Unknown spool ID {spool_id}.")
+        return record
+
+    def __contains__(self, spool_id):
+        return str(spool_id) in self.records
+
+    def __len__(self):
+        return len(self.records)
@@ -1,42 +1,120 @@
 # filament_calculations.py
 
 import math
+import numbers
 import re
+from collections import namedtuple
 
-import requests
+from instrumentation import count, timer
+
+# NumPy and the HTTP client (requests) are imported where they are used, so that
+# importing this module stays cheap for commands that never cost or fetch
+
+DEFAULT_PAGE_SIZE = 500  # Spools requested per page from the Spoolman API
+
+SPOOL_WEIGHT_ZERO_ERROR = "Spool weight is zero, cannot calculate cost per gram."
+NEGATIVE_USAGE_ERROR = "Filament used cannot be negative."
+
+CostResult = namedtuple("CostResult", ["costs", "errors"])
+UsageResult = namedtuple("UsageResult", ["grams", "meters", "errors"])
+
+FILAMENT_INPUT = re.compile(r'([\d.]+)\s*([gm])?')
+# One term of a usage string such as '12,5 m' or '1.2kg'; terms are joined with '+'
+USAGE_TERM = re.compile(r'\s*(\d+(?:[.,]\d*)?|[.,]\d+)\s*(kg|g|mm|cm|m|ft)?\s*')
+# Unit -> (factor, is_length): mass units convert to grams, length units to meters
+USAGE_UNITS = {
+    None: (1.0, False),
+    'g': (1.0, False),
+    'kg': (1000.0, False),
+    'm': (1.0, True),
+    'mm': (0.001, True),
+    'cm': (0.01, True),
+    'ft': (0.3048, True),
+}
+INVALID_USAGE_ERROR = "Invalid usage '{}'. Use a number with g, kg, m, cm, mm or ft, e.g. '12.3m+4g'."
+USAGE_CACHE_SIZE = 65536  # Distinct usage strings remembered by parse_filament_inputs
+
+def calculate_costs(filament_used_grams, spool_weight_grams, spool_cost):
+    """
+    Vectorized calculate_cost over NumPy arrays (or anything broadcastable to them).
+
+    Returns a CostResult(costs, errors). Rows with a zero spool weight or negative
+    usage get a NaN cost and an (index, message) entry in errors instead of
+    raising, so one bad row does not stop the rest from being priced.
+    """
+    import numpy as np
+
+    used = np.atleast_1d(np.asarray(filament_used_grams, dtype=np.float64))
+    weight = np.atleast_1d(np.asarray(spool_weight_grams, dtype=np.float64))
+    cost = np.atleast_1d(np.asarray(spool_cost, dtype=np.float64))
+    used, weight, cost = np.broadcast_arrays(used, weight, cost)
+
+    zero_weight = weight == 0
+    negative = (used < 0) & ~zero_weight  # Zero spool weight is reported first, as in calculate_cost
+    invalid = zero_weight | negative
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        costs = used * (cost / weight)
+    costs[invalid] = np.nan
+
+    errors = []
+    if invalid.any():
+        for index in np.flatnonzero(invalid):
+            errors.append((int(index), SPOOL_WEIGHT_ZERO_ERROR if zero_weight[index] else NEGATIVE_USAGE_ERROR))
+    return CostResult(costs, errors)
 
 def calculate_cost(filament_used_grams, spool_weight_grams, spool_cost):
     """
     Calculates the cost of the filament used based on spool details.
+    Raises TypeError for arrays; use calculate_costs for those.
     """
+    _check_scalars(filament_used_grams, spool_weight_grams, spool_cost)
     if spool_weight_grams == 0:
-        raise ValueError("Spool weight is zero, cannot calculate cost per gram.")
+        raise ValueError(SPOOL_WEIGHT_ZERO_ERROR)
     if filament_used_grams < 0:
-        raise ValueError("Filament used cannot be negative.")
-    cost_per_gram = spool_cost / spool_weight_grams
-    return filament_used_grams * cost_per_gram
+        raise ValueError(NEGATIVE_USAGE_ERROR)
+    # Same arithmetic as calculate_costs, so both give the same result
+    return float(filament_used_grams * (spool_cost / spool_weight_grams))
+
+def calculate_masses_per_meter(diameter_mm, density):
+    """
+    Vectorized calculate_mass_per_meter over NumPy arrays of diameters and densities.
+    Rows with a diameter of zero or less use the default 1.75 mm.
+    """
+    import numpy as np
+
+    diameter_mm = np.atleast_1d(np.asarray(diameter_mm, dtype=np.float64))
+    density = np.atleast_1d(np.asarray(density, dtype=np.float64))
+    diameter_mm = np.where(diameter_mm <= 0, 1.75, diameter_mm)  # Default diameter in mm
+    radius_cm = diameter_mm / 10 / 2  # Convert mm to cm
+    cross_sectional_area_cm2 = math.pi * radius_cm ** 2  # in cm^2
+    return cross_sectional_area_cm2 * density * 100  # g/cm * 100 cm in a meter = g/m
 
 def calculate_mass_per_meter(diameter_mm, density):
     """
     Calculates the mass per meter of the filament based on diameter and density.
-    Assumes a default diameter of 1.75 mm if not provided or if zero.
+    Assumes a default diameter of 1.75 mm if not provided or if zero. Raises
+    TypeError for arrays; use calculate_masses_per_meter for those.
     """
+    _check_scalars(diameter_mm, density)
     if diameter_mm <= 0:
         diameter_mm = 1.75  # Default diameter in mm
-    diameter_cm = diameter_mm / 10  # Convert mm to cm
-    radius_cm = diameter_cm / 2
-    cross_sectional_area_cm2 = math.pi * (radius_cm ** 2)  # in cm^2
-    mass_per_cm = cross_sectional_area_cm2 * density  # in g/cm
-    mass_per_meter = mass_per_cm * 100  # 100 cm in a meter
-    return mass_per_meter  # in g/m
+    radius_cm = diameter_mm / 10 / 2  # Convert mm to cm
+    cross_sectional_area_cm2 = math.pi * radius_cm ** 2  # in cm^2
+    return float(cross_sectional_area_cm2 * density * 100)  # g/cm * 100 cm in a meter = g/m
+
+def _check_scalars(*values):
+    # The scalar functions stay plain Python; arrays belong to their vectorized versions
+    for value in values:
+        if not isinstance(value, numbers.Real):
+            raise TypeError(f"Expected a number, got {type(value).__name__}.")
 
 def parse_filament_input(user_input):
     """
     Parses the user input for filament used and extracts the value and unit.
     """
     user_input = user_input.strip().lower()
-    pattern = r'^([\d.]+)\s*([gm])?$'
-    match = re.match(pattern, user_input)
+    match = FILAMENT_INPUT.fullmatch(user_input)
     if not match:
         raise ValueError("Invalid input format. Please enter a number followed by 'g' or 'm', or just a number.")
     value_str, unit = match.groups()
@@ -45,19 +123,154 @@ def parse_filament_input(user_input):
         unit = 'g'  # Default to grams if unit is not specified
     return value, unit
 
-def get_spools(SPOOLMAN_API_URL):
+def parse_usage(text):
     """
-    Fetches all spools from the Spoolman API and filters out archived spools.
+    Parses a usage string with extended units into (grams, meters).
+
+    Accepts g, kg, m, cm, mm and ft (grams without a unit), a comma as the decimal
+    separator, and several terms joined with '+', e.g. '12,3m + 4g' -> (4.0, 12.3).
+    Masses and lengths are kept apart, since converting between them needs the
+    spool's density and diameter. A number instead of a string is grams; any other
+    value raises ValueError like an invalid string.
     """
-    endpoint = f"{SPOOLMAN_API_URL}/spool" 
-    # the SPOOLMAN_API_URL variable is defined in the main.py file and read from the .env file but it is not available here. how do we fix this?
+    if not isinstance(text, str):
+        if isinstance(text, (int, float)) and not isinstance(text, bool) and text >= 0 and math.isfinite(text):
+            return float(text), 0.0
+        raise ValueError(INVALID_USAGE_ERROR.format(text))
+    grams = meters = 0.0
+    for term in text.lower().split('+'):
+        match = USAGE_TERM.fullmatch(term)
+        if match is None:
+            raise ValueError(INVALID_USAGE_ERROR.format(text.strip()))
+        number, unit = match.groups()
+        factor, is_length = USAGE_UNITS[unit]
+        value = float(number.replace(',', '.')) * factor
+        if is_length:
+            meters += value
+        else:
+            grams += value
+    return grams, meters
 
-    response = requests.get(endpoint)  # , headers=HEADERS)
+def parse_filament_inputs(texts):
+    """
+    Bulk parse_usage over an iterable of usage strings, in one pass.
 
-    if response.status_code == 200:
-        spools = response.json()
-        # Filter out archived spools
-        active_spools = [spool for spool in spools if not spool.get('archived', False)]
-        return active_spools
-    else:
-        raise Exception(f"Failed to fetch spools: {response.status_code} - {response.text}")
\ No newline at end of file
+    Returns a UsageResult(grams, meters, errors) with one row per string in two
+    NumPy float arrays. Invalid rows get NaN in both and an (index, message) entry
+    in errors instead of raising, whatever the row holds. Usage columns repeat the
+    same few strings, so each distinct string is parsed once (up to
+    USAGE_CACHE_SIZE of them).
+    """
+    import numpy as np
+    from array import array
+
+    grams = array('d')
+    meters = array('d')
+    errors = []
+    parsed = {}
+    nan = (math.nan, math.nan)
+    add_grams = grams.append
+    add_meters = meters.append
+    for index, text in enumerate(texts):
+        # Only strings are cached: other values may be unhashable, and True == 1
+        result = parsed.get(text) if text.__class__ is str else None
+        if result is None:
+            try:
+                result = parse_usage(text)
+            except (TypeError, ValueError) as e:
+                result = str(e)
+            if text.__class__ is str and len(parsed) < USAGE_CACHE_SIZE:
+                parsed[text] = result
+        if result.__class__ is str:
+            errors.append((index, result))
+            result = nan
+        add_grams(result[0])
+        add_meters(result[1])
+    return UsageResult(np.frombuffer(grams, dtype=np.float64), np.frombuffer(meters, dtype=np.float64), errors)
+
+def fetch_spool_page(client, offset, page_size=DEFAULT_PAGE_SIZE, include_archived=False, headers=None):
+    """
+    Requests one page of spools sorted by ID and returns the response.
+
+    A 304 Not Modified answer to a conditional request is returned as-is;
+    any other non-200 status raises.
+    """
+    params = {
+        "limit": page_size,
+        "offset": offset,
+        "sort": "id:asc",
+        "allow_archived": "true" if include_archived else "false",
+    }
+    with timer("fetch"):
+        response = client.get("/spool", params=params, headers=headers or None)
+    count("pages_fetched")
+    if response.status_code not in (200, 304):
+        raise Exception(f"Failed to fetch spools: {response.status_code} - {response.text}")
+    return response
+
+def page_repeats(page, last_id):
+    """
+    Tells whether a page of spools starts at or before the last spool ID already
+    seen. Pages are requested sorted by ID, so that means the server ignored the
+    offset and returned the same spools again.
+    """
+    return last_id is not None and bool(page) and page[0].get('id') is not None and page[0]['id'] <= last_id
+
+def iter_spools(SPOOLMAN_API_URL, page_size=DEFAULT_PAGE_SIZE, include_archived=False, client=None, cache=None, offline=False):
+    """
+    Yields spools from the Spoolman API one page at a time.
+
+    Uses Spoolman's limit/offset pagination and lets the server drop archived
+    spools (allow_archived=false), so only one page is held in memory at a time.
+    Spools are requested sorted by ID. Requests go through the shared pooled
+    client for the API URL unless a client is passed in.
+
+    When a SpoolCache is given, spools are served from disk while fresh and
+    revalidated with conditional requests otherwise; offline=True never
+    contacts the server.
+    """
+    def keep(spool):
+        # Older Spoolman versions ignore allow_archived, so filter here as well
+        return include_archived or not spool.get('archived', False)
+
+    def fetch_page(offset, headers=None):
+        nonlocal client
+        if client is None:
+            # Created on the first request, so cache hits never import the HTTP stack
+            from spoolman_client import get_client
+            client = get_client(SPOOLMAN_API_URL)
+        return fetch_spool_page(client, offset, page_size, include_archived, headers)
+
+    if cache is not None:
+        key = f"{SPOOLMAN_API_URL.rstrip('/')}|archived={include_archived}"
+        yield from cache.iter_spools(key, fetch_page, page_size, keep=keep, offline=offline)
+        return
+    if offline:
+        raise ValueError("Offline mode requires a spool cache.")
+
+    offset = 0
+    last_id = None
+    while True:
+        response = fetch_page(offset)
+        with timer("decode"):
+            page = response.json()
+        if page_repeats(page, last_id):
+            # A server ignoring limit/offset with exactly page_size spools
+            return
+        with timer("filter"):
+            kept = [spool for spool in page if keep(spool)]
+        count("spools_fetched", len(kept))
+        yield from kept
+
+        # A short page is the last one; a page larger than requested means the
+        # server ignored the pagination parameters and returned everything.
+        if len(page) != page_size:
+            return
+        last_id = page[-1].get('id')
+        offset += page_size
+
+def get_spools(SPOOLMAN_API_URL, page_size=DEFAULT_PAGE_SIZE, client=None, cache=None, offline=False):
+    """
+    Fetches all spools from the Spoolman API and filters out archived spools.
+    """
+    return list(iter_spools(SPOOLMAN_API_URL, page_size=page_size, client=client, cache=cache, offline=offline))
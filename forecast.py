@@ -0,0 +1,320 @@
+# forecast.py
+
+import datetime
+import json
+import math
+
+from instrumentation import timer
+from report_output import Column, TableSink
+from snapshot_store import DELTA, STATE_FIELDS, TIMESTAMP_FORMAT, id_sort_key
+
+DEFAULT_HALF_LIFE_DAYS = 14.0  # Usage this many days old counts half as much towards a spool's rate
+DEFAULT_HORIZON_DAYS = 7.0
+
+RUNNING_OUT_COLUMNS = [
+    Column("spool_id", "Spool ID", 12, ""),
+    Column("name", "Name", 30, ""),
+    Column("remaining_grams", "Remaining", 12, ".2f"),
+    Column("grams_per_day", "g/day", 10, ".2f"),
+    Column("days_left", "Days left", 10, ".1f"),
+    Column("reorder_cost", "Reorder", 10, ".2f"),
+]
+MATERIAL_COLUMNS = [
+    Column("material", "Material", 20, ""),
+    Column("spools", "Spools", 8, "d"),
+    Column("remaining_grams", "Remaining", 12, ".2f"),
+    Column("grams_per_day", "g/day", 10, ".2f"),
+    Column("days_left", "Days left", 10, "s"),
+    Column("reorders", "Reorders", 9, "d"),
+    Column("reorder_cost", "Reorder cost", 12, ".2f"),
+]
+
+FORECAST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spool_forecasts (
+    spool_id NOT NULL PRIMARY KEY,
+    price REAL,
+    initial_weight REAL,
+    remaining_weight REAL,
+    name TEXT,
+    material TEXT,
+    color_hex TEXT,
+    observed_at REAL NOT NULL,
+    used_grams REAL NOT NULL,
+    used_seconds REAL NOT NULL,
+    empty_at REAL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS spool_forecasts_empty_at ON spool_forecasts (empty_at);
+CREATE TABLE IF NOT EXISTS forecast_state (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    taken_at TEXT NOT NULL,
+    half_life_days REAL NOT NULL
+);
+"""
+
+# spool_forecasts mirrors the latest stored state of every spool (STATE_FIELDS) next
+# to its consumption model: exponentially decayed sums of the grams used and of the
+# time observed, brought up to observed_at. A spool's row is only rewritten when its
+# state changes; the decay over the idle time since is applied when it is read.
+# empty_at is when the spool runs out at its rate as of observed_at. Idle time only
+# lowers the rate, so it is an early bound that lets an index find the candidates.
+# Both times are seconds since EPOCH, in the local time the snapshots are taken in.
+
+EPOCH = datetime.datetime(1970, 1, 1)
+SECONDS_PER_DAY = 86400.0
+
+STATE_COLUMNS = ", ".join(STATE_FIELDS)
+MODEL_COLUMNS = "remaining_weight, observed_at, used_grams, used_seconds, empty_at"
+# The spools of a full snapshot that are new or differ from the model, with their model
+CHANGED_SPOOLS_QUERY = (
+    f"SELECT s.spool_id, {', '.join('s.' + field for field in STATE_FIELDS)}, f.spool_id IS NOT NULL, "
+    f"{', '.join('f.' + column for column in MODEL_COLUMNS.split(', '))} "
+    "FROM spool_states s LEFT JOIN spool_forecasts f ON f.spool_id = s.spool_id "
+    "WHERE s.taken_at = ? AND (f.spool_id IS NULL OR "
+    + " OR ".join(f"s.{field} IS NOT f.{field}" for field in STATE_FIELDS) + ")"
+)
+FIELD_COUNT = len(STATE_FIELDS)
+def _seconds(taken_at):
+    return (datetime.datetime.strptime(taken_at, TIMESTAMP_FORMAT) - EPOCH).total_seconds()
+
+def _datetime(seconds):
+    try:
+        return EPOCH + datetime.timedelta(seconds=seconds)
+    except OverflowError:
+        return datetime.datetime.max
+
+class DepletionForecast:
+    """
+    Per-spool consumption rates and run-out dates, kept in the snapshot store and
+    updated from each new snapshot rather than from the whole history.
+
+    update() applies the snapshots stored since the last call: a delta snapshot
+    touches only the spools in its delta, and a full snapshot is compared with the
+    model inside SQLite so only changed spools reach Python. Queries read the model
+    alone, with an indexed lookup for the spools that may run out soon.
+
+    half_life_days defaults to the half-life the stored model was built with
+    (DEFAULT_HALF_LIFE_DAYS for a new one). A different half-life rebuilds the
+    model once and is stored with it, so later updates keep using it.
+    """
+
+    def __init__(self, store, half_life_days=None):
+        self.store = store
+        self.connection = store.connection
+        self.connection.executescript(FORECAST_SCHEMA)
+        row = self.connection.execute("SELECT half_life_days FROM forecast_state").fetchone()
+        if half_life_days is None:
+            half_life_days = row[0] if row is not None else DEFAULT_HALF_LIFE_DAYS
+        elif row is not None and row[0] != half_life_days:
+            # The decayed sums depend on the half-life, so the model is rebuilt
+            with self.connection:
+                self.connection.execute("DELETE FROM spool_forecasts")
+                self.connection.execute("DELETE FROM forecast_state")
+        self.half_life = half_life_days * SECONDS_PER_DAY
+
+    def _decay(self, seconds):
+        # Weight of usage seconds ago, and the decayed length of an interval that long
+        factor = 0.5 ** (seconds / self.half_life)
+        return factor, self.half_life / math.log(2) * (1 - factor)
+
+    def update(self):
+        """
+        Applies the snapshots stored since the last update and returns how many there were.
+        """
+        row = self.connection.execute("SELECT taken_at FROM forecast_state").fetchone()
+        last = row[0] if row else ""
+        snapshots = self.connection.execute(
+            "SELECT taken_at, kind FROM snapshots WHERE taken_at > ? ORDER BY taken_at", (last,)
+        ).fetchall()
+        if not snapshots:
+            return 0
+
+        with timer("forecast_update"), self.connection:
+            for taken_at, kind in snapshots:
+                if kind != DELTA:
+                    self._apply_full(taken_at)
+                elif last:
+                    self._apply_delta(taken_at)
+                else:
+                    # A model started on a store whose history begins before a delta
+                    self._apply_state(taken_at, self.store.state_at(taken_at))
+                last = taken_at
+            self.connection.execute(
+                "INSERT OR REPLACE INTO forecast_state (id, taken_at, half_life_days) VALUES (0, ?, ?)",
+                (last, self.half_life / SECONDS_PER_DAY),
+            )
+        return len(snapshots)
+
+    def _apply_full(self, taken_at):
+        changed = self.connection.execute(CHANGED_SPOOLS_QUERY, (taken_at,)).fetchall()
+        self.connection.execute(
+            "DELETE FROM spool_forecasts WHERE spool_id NOT IN (SELECT spool_id FROM spool_states WHERE taken_at = ?)",
+            (taken_at,),
+        )
+        self._observe(taken_at, [
+            (row[0], row[1:FIELD_COUNT + 1], row[FIELD_COUNT + 2:] if row[FIELD_COUNT + 1] else None)
+            for row in changed
+        ])
+
+    def _apply_delta(self, taken_at):
+        changes = self.connection.execute(
+            "SELECT spool_id, changes FROM spool_deltas WHERE taken_at = ?", (taken_at,)
+        ).fetchall()
+        self.connection.executemany(
+            "DELETE FROM spool_forecasts WHERE spool_id = ?",
+            [(spool_id,) for spool_id, fields in changes if fields is None],
+        )
+        observations = []
+        for spool_id, fields in changes:
+            if fields is None:
+                continue
+            row = self.connection.execute(
+                f"SELECT {STATE_COLUMNS}, {MODEL_COLUMNS} FROM spool_forecasts WHERE spool_id = ?", (spool_id,)
+            ).fetchone()
+            state = dict(zip(STATE_FIELDS, row[:FIELD_COUNT] if row else (None,) * FIELD_COUNT))
+            state.update(json.loads(fields))
+            observations.append((spool_id, tuple(state[field] for field in STATE_FIELDS), row[FIELD_COUNT:] if row else None))
+        self._observe(taken_at, observations)
+
+    def _apply_state(self, taken_at, state):
+        self.connection.execute("DELETE FROM spool_forecasts")
+        self._observe(taken_at, [(spool_id, fields, None) for spool_id, fields in state.items()])
+
+    def _observe(self, taken_at, observations):
+        # Updates the model of each spool from its (spool_id, new state, model row or None) at taken_at
+        now = _seconds(taken_at)
+        remaining_index = STATE_FIELDS.index("remaining_weight")
+        rows = []
+        for spool_id, state, model in observations:
+            state = tuple(state)
+            if model is None:
+                rows.append((spool_id,) + state + (now, 0.0, 0.0, None))
+                continue
+
+            previous, observed_at, used_grams, used_seconds, empty_at = model
+            remaining = state[remaining_index]
+            if remaining == previous:
+                # Only a price, name or color change; the rate is unaffected
+                rows.append((spool_id,) + state + (observed_at, used_grams, used_seconds, empty_at))
+                continue
+
+            interval = max(0.0, now - observed_at)
+            factor, elapsed = self._decay(interval)
+            used = previous - remaining if previous is not None and remaining is not None else 0.0
+            # The usage is spread over the interval, so it decays like the interval's time.
+            # A refill (remaining weight going up) adds time but no usage.
+            used_grams = used_grams * factor + max(0.0, used) * (elapsed / interval if interval > 0 else 1.0)
+            used_seconds = used_seconds * factor + elapsed
+            empty_at = None
+            if used_grams > 0 and used_seconds > 0 and remaining is not None:
+                empty_at = now + max(0.0, remaining) / (used_grams / used_seconds)
+            rows.append((spool_id,) + state + (now, used_grams, used_seconds, empty_at))
+
+        self.connection.executemany(
+            f"INSERT OR REPLACE INTO spool_forecasts (spool_id, {STATE_COLUMNS}, observed_at, used_grams, used_seconds, empty_at) "
+            f"VALUES ({', '.join('?' * (FIELD_COUNT + 5))})",
+            rows,
+        )
+
+    def _forecast(self, row, now):
+        # Returns the forecast dict of a spool_forecasts row as of now (seconds)
+        spool_id, price, remaining, name, material, observed_at, used_grams, used_seconds = row
+        factor, elapsed = self._decay(max(0.0, now - observed_at))
+        used_grams *= factor
+        used_seconds = used_seconds * factor + elapsed
+        rate = used_grams / used_seconds * SECONDS_PER_DAY if used_seconds > 0 else 0.0
+        remaining = max(0.0, remaining or 0.0)
+        days_left = remaining / rate if rate > 0 else None
+        return {
+            "spool_id": spool_id,
+            "name": name or "Unknown",
+            "material": material or "Unknown",
+            "remaining_grams": remaining,
+            "grams_per_day": rate,
+            "days_left": days_left,
+            "empty_at": _datetime(now + days_left * SECONDS_PER_DAY) if days_left is not None else None,
+            "reorder_cost": price or 0.0,
+        }
+
+    def _now(self, now):
+        return ((now or datetime.datetime.now()) - EPOCH).total_seconds()
+
+    def running_out(self, within_days=DEFAULT_HORIZON_DAYS, now=None):
+        """
+        Returns the forecasts of the spools expected to run out within a number of days
+        of now (a datetime, default the current time), soonest first.
+        """
+        now = self._now(now)
+        horizon = now + within_days * SECONDS_PER_DAY
+        rows = self.connection.execute(
+            "SELECT spool_id, price, remaining_weight, name, material, observed_at, used_grams, used_seconds "
+            "FROM spool_forecasts WHERE empty_at <= ?",
+            (horizon,),
+        )
+        forecasts = [self._forecast(row, now) for row in rows]
+        forecasts = [forecast for forecast in forecasts if forecast["days_left"] is not None
+                     and now + forecast["days_left"] * SECONDS_PER_DAY <= horizon]
+        forecasts.sort(key=lambda forecast: (forecast["days_left"], id_sort_key(forecast["spool_id"])))
+        return forecasts
+
+    def material_forecast(self, within_days=DEFAULT_HORIZON_DAYS, now=None):
+        """
+        Returns per-material rows, sorted by material: the number of spools, grams
+        left and used per day, days until the material runs out at that rate, and
+        the number and cost of the spools to reorder within the horizon.
+        """
+        now = self._now(now)
+        decay = math.log(2) / self.half_life
+        mean_life = self.half_life / math.log(2)
+        within = within_days * SECONDS_PER_DAY
+        exp = math.exp
+        materials = {}
+        rows = self.connection.execute(
+            "SELECT material, price, remaining_weight, observed_at, used_grams, used_seconds FROM spool_forecasts"
+        )
+        # The same arithmetic as _forecast, inlined since it runs for every spool
+        for material, price, remaining, observed_at, used_grams, used_seconds in rows:
+            totals = materials.get(material or "Unknown")
+            if totals is None:
+                totals = materials[material or "Unknown"] = [0, 0.0, 0.0, 0, 0.0]
+            remaining = max(0.0, remaining or 0.0)
+            factor = exp(decay * (min(observed_at, now) - now))
+            seconds = used_seconds * factor + mean_life * (1 - factor)
+            rate = used_grams * factor / seconds if seconds > 0 else 0.0
+            totals[0] += 1
+            totals[1] += remaining
+            totals[2] += rate
+            if rate > 0 and remaining <= rate * within:
+                totals[3] += 1
+                totals[4] += price or 0.0
+
+        forecasts = []
+        for material in sorted(materials, key=str):
+            spools, remaining, rate, reorders, reorder_cost = materials[material]
+            forecasts.append({
+                "material": material,
+                "spools": spools,
+                "remaining_grams": remaining,
+                "grams_per_day": rate * SECONDS_PER_DAY,
+                "days_left": remaining / (rate * SECONDS_PER_DAY) if rate > 0 else None,
+                "reorders": reorders,
+                "reorder_cost": reorder_cost,
+            })
+        return forecasts
+
+def print_forecast(forecast, within_days=DEFAULT_HORIZON_DAYS, now=None):
+    """
+    Prints the spools running out within the horizon and the per-material forecast.
+    """
+    spools = forecast.running_out(within_days, now)
+    with TableSink(RUNNING_OUT_COLUMNS, title=f"Spools running out within {within_days:g} days:") as table:
+        table.write_rows(dict(row, spool_id=str(row['spool_id']), name=row['name'][:30]) for row in spools)
+    if not spools:
+        print("None.")
+
+    total_cost = 0.0
+    with TableSink(MATERIAL_COLUMNS, title="\nForecast by Material:") as table:
+        for row in forecast.material_forecast(within_days, now):
+            days_left = "-" if row['days_left'] is None else f"{row['days_left']:.1f}"
+            table.write(dict(row, days_left=days_left))
+            total_cost += row['reorder_cost']
+        table.footer({"material": "Total reorder cost:", "reorder_cost": total_cost})
@@ -0,0 +1,119 @@
+# gcode_import.py
+
+import mmap
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from batch import Job
+
+GCODE_EXTENSIONS = (".gcode", ".gco", ".g")
+HEAD_SIZE = 64 * 1024  # Cura writes its usage summary at the top of the file
+TAIL_SIZE = 1024 * 1024  # PrusaSlicer and OrcaSlicer write it near the end, before their config block
+DEFAULT_MAX_WORKERS = 8
+
+# PrusaSlicer / OrcaSlicer: '; filament used [mm] = 1234.56, 0.00' and '; filament used [g] = 3.70, 0.00'
+SLICER_USAGE = re.compile(rb"^;\s*filament used \[(mm|m|g)\]\s*[=:]\s*([^\r\n]+)", re.MULTILINE)
+# Cura: ';Filament used: 1.23456m, 0m'
+CURA_USAGE = re.compile(rb"^;\s*Filament used:\s*([^\r\n]+)", re.MULTILINE)
+# Preferred unit when a slicer reports several; grams need no density to price
+UNIT_PREFERENCE = ("g", "mm", "m")
+
+def parse_tool_map(value):
+    """
+    Parses a tool to spool ID mapping such as '0=12,1=7' (T0 uses spool 12, T1 spool 7).
+    Raises ValueError for an invalid or empty mapping.
+    """
+    tools = {}
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        tool, separator, spool_id = entry.partition("=")
+        tool = tool.strip().upper().lstrip("T")
+        if not separator or not tool.isdigit() or not spool_id.strip():
+            raise ValueError(f"Invalid tool mapping '{entry}'. Use e.g. '0=12,1=7'.")
+        tools[int(tool)] = spool_id.strip()
+    if not tools:
+        raise ValueError("No tool mapping given. Use e.g. '0=12,1=7'.")
+    return tools
+
+def _numbers(text):
+    values = []
+    for part in text.split(b","):
+        part = part.strip().rstrip(b"m").strip()
+        values.append(float(part) if part else 0.0)
+    return values
+
+def read_gcode_usage(path):
+    """
+    Reads the filament used per tool from the slicer comments of a G-code file.
+
+    Only the first HEAD_SIZE and last TAIL_SIZE bytes are scanned, through a
+    memory map, so the size of the file hardly matters. Returns {tool: (value, unit)}
+    with unit 'g' or 'm', for the tools that used any filament. Raises ValueError if
+    the file has no recognised usage comments.
+    """
+    with open(path, "rb") as gcode_file:
+        if os.fstat(gcode_file.fileno()).st_size == 0:
+            raise ValueError(f"{path} is empty.")
+        with mmap.mmap(gcode_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            size = len(data)
+            regions = [(max(0, size - TAIL_SIZE), size)]
+            if regions[0][0] > 0:
+                regions.append((0, min(HEAD_SIZE, regions[0][0])))
+
+            found = {}
+            for start, end in regions:
+                for match in SLICER_USAGE.finditer(data, start, end):
+                    found.setdefault(match.group(1).decode(), _numbers(match.group(2)))
+                for match in CURA_USAGE.finditer(data, start, end):
+                    found.setdefault("m", _numbers(match.group(1)))
+
+    for unit in UNIT_PREFERENCE:
+        if unit in found:
+            values = found[unit]
+            if unit == "mm":
+                unit, values = "m", [value / 1000 for value in values]
+            return {tool: (value, unit) for tool, value in enumerate(values) if value > 0}
+    raise ValueError(f"No slicer filament usage found in {path}.")
+
+def gcode_job_items(path, tools):
+    """
+    Returns the batch job items [(spool_id, usage), ...] for a G-code file, mapping each
+    tool that used filament to its spool. Raises ValueError for unmapped tools.
+    """
+    items = []
+    for tool, (value, unit) in sorted(read_gcode_usage(path).items()):
+        spool_id = tools.get(tool)
+        if spool_id is None:
+            raise ValueError(f"Tool T{tool} is not mapped to a spool (use e.g. --tools {tool}=<spool ID>).")
+        items.append((spool_id, f"{value:.6f}{unit}"))
+    return items
+
+def gcode_paths(path):
+    """
+    Returns the G-code file itself, or the G-code files in a directory in name order.
+    """
+    if not os.path.isdir(path):
+        return [path]
+    return sorted(
+        os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(GCODE_EXTENSIONS)
+    )
+
+def gcode_jobs(paths, tools, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Yields a batch Job for each G-code file, named after the file.
+
+    Files are read in parallel on a thread pool and yielded in the order given.
+    A file that cannot be read or mapped is yielded without items and with the
+    reason in its error, which run_batch reports in the error column.
+    """
+    def load(path):
+        try:
+            return Job(os.path.basename(path), gcode_job_items(path, tools))
+        except (OSError, ValueError) as e:
+            return Job(os.path.basename(path), [], str(e))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(load, paths)
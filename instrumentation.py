@@ -0,0 +1,190 @@
+# instrumentation.py
+
+import os
+import threading
+import time
+
+METRIC_PREFIX = "spoolman_cost"
+
+class _Timer:
+    __slots__ = ("metrics", "name", "started", "resumed", "own")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        now = time.perf_counter()
+        stack = self.metrics._stack()
+        if stack:
+            parent = stack[-1]
+            parent.own += now - parent.resumed
+        self.started = self.resumed = now
+        self.own = 0.0
+        stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        now = time.perf_counter()
+        stack = self.metrics._stack()
+        stack.pop()
+        self.own += now - self.resumed
+        if stack:
+            stack[-1].resumed = now
+        self.metrics._record(self.name, now - self.started, self.own)
+        return False
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class Metrics:
+    """
+    Named phase timers and event counters for the hot paths (fetch, decode,
+    filter, compute, I/O).
+
+    Disabled by default, in which case timer() returns a shared no-op context
+    manager and count() returns at once. Timers nest per thread: each records its
+    total time and its own time excluding nested timers, so the own times of all
+    phases add up to no more than the wall time of a run.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def enable(self):
+        self.enabled = True
+        self.reset()
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.timers = {}  # name -> [calls, total seconds, own seconds]
+            self.counters = {}
+            self.started = time.perf_counter()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, name, total, own):
+        with self._lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                timer = self.timers[name] = [0, 0.0, 0.0]
+            timer[0] += 1
+            timer[1] += total
+            timer[2] += own
+
+    def timer(self, name):
+        """
+        Returns a context manager timing one call of a phase.
+        """
+        return _Timer(self, name) if self.enabled else _NULL_TIMER
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+# Shared instance used by all modules
+metrics = Metrics()
+timer = metrics.timer
+count = metrics.count
+
+def format_breakdown(metrics=metrics):
+    """
+    Returns the timer and counter breakdown as printable lines, phases by own time.
+    """
+    wall = metrics.elapsed()
+    lines = [
+        "{:<24} {:>8} {:>12} {:>12} {:>8}".format("Phase", "Calls", "Total (s)", "Own (s)", "Own %"),
+        "-" * 68,
+    ]
+    with metrics._lock:
+        timers = sorted(metrics.timers.items(), key=lambda item: -item[1][2])
+        counters = sorted(metrics.counters.items())
+    for name, (calls, total, own) in timers:
+        lines.append("{:<24} {:>8} {:>12.4f} {:>12.4f} {:>7.1f}%".format(
+            name, calls, total, own, 100 * own / wall if wall > 0 else 0.0
+        ))
+    lines.append("-" * 68)
+    lines.append("{:<24} {:>8} {:>12.4f}".format("Wall time", "", wall))
+    for name, value in counters:
+        lines.append("{:<24} {:>8}".format(name, value))
+    return lines
+
+def print_breakdown(metrics=metrics):
+    print("\nProfile:")
+    for line in format_breakdown(metrics):
+        print(line)
+
+def _metric_label(name):
+    return name.replace("\\", "\\\\").replace('"', '\\"')
+
+def write_prometheus_textfile(path, metrics=metrics, prefix=METRIC_PREFIX):
+    """
+    Writes the timers and counters in the Prometheus text format, e.g. for the
+    node_exporter textfile collector. The file is replaced atomically, so the
+    collector never reads a partly written file.
+    """
+    with metrics._lock:
+        timers = sorted(metrics.timers.items())
+        counters = sorted(metrics.counters.items())
+
+    lines = [
+        f"# HELP {prefix}_phase_calls_total Calls of each instrumented phase.",
+        f"# TYPE {prefix}_phase_calls_total counter",
+    ]
+    lines += [f'{prefix}_phase_calls_total{{phase="{_metric_label(name)}"}} {calls}' for name, (calls, _, _) in timers]
+    lines += [
+        f"# HELP {prefix}_phase_seconds_total Time spent in each phase, including nested phases.",
+        f"# TYPE {prefix}_phase_seconds_total counter",
+    ]
+    lines += [f'{prefix}_phase_seconds_total{{phase="{_metric_label(name)}"}} {total:.6f}' for name, (_, total, _) in timers]
+    lines += [
+        f"# HELP {prefix}_phase_own_seconds_total Time spent in each phase, excluding nested phases.",
+        f"# TYPE {prefix}_phase_own_seconds_total counter",
+    ]
+    lines += [f'{prefix}_phase_own_seconds_total{{phase="{_metric_label(name)}"}} {own:.6f}' for name, (_, _, own) in timers]
+    lines += [
+        f"# HELP {prefix}_events_total Counted events such as pages and spools fetched.",
+        f"# TYPE {prefix}_events_total counter",
+    ]
+    lines += [f'{prefix}_events_total{{event="{_metric_label(name)}"}} {value}' for name, value in counters]
+    lines += [
+        f"# HELP {prefix}_last_run_timestamp_seconds Unix time the metrics were written.",
+        f"# TYPE {prefix}_last_run_timestamp_seconds gauge",
+        f"{prefix}_last_run_timestamp_seconds {time.time():.3f}",
+    ]
+
+    import tempfile
+
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-", suffix=".prom.tmp")
+    try:
+        with os.fdopen(handle, "w") as metrics_file:
+            metrics_file.write("\n".join(lines) + "\n")
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
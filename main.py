@@ -1,159 +1,686 @@
 # main.py
 
 import argparse
+import itertools
+import logging
 import os
-from dotenv import load_dotenv
-from filament_calculations import (
-    calculate_cost,
-    calculate_mass_per_meter,
-    get_spools,
-    parse_filament_input,
-)
-from snapshot_utils import compare_snapshots, save_snapshot
-
-def main():
-    # Load environment variables from .env file
-    load_dotenv()
+import sys
+
+# Commands import what they need only when they run, so that e.g. 'compare' never
+# loads NumPy or the HTTP stack; see COMMANDS at the end of this file.
+
+def load_env():
+    """
+    Loads the nearest .env file above this script, like python-dotenv's load_dotenv(),
+    but only imports dotenv when there is a file to load.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, ".env")
+        if os.path.isfile(path):
+            from dotenv import load_dotenv
+            load_dotenv(path)
+            return
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return
+        directory = parent
+
+def fetch(args, cached=True):
+    """
+    Returns the spools of the configured Spoolman instances as a stream.
+
+    SPOOLMAN_API_URL (or SPOOLMAN_API_URLS for several instances, e.g.
+    'farm1=http://...,farm2=http://...', merged with spool IDs like 'farm1:12')
+    selects the servers. SPOOLMAN_API_KEY, SPOOLMAN_TIMEOUT and SPOOLMAN_RETRIES
+    configure the shared Spoolman client (see spoolman_client.py), and
+    SPOOLMAN_CACHE_DIR and SPOOLMAN_CACHE_TTL the on-disk spool cache.
+    """
+    from spool_cache import SpoolCache
+    from spoolman_instances import fetch_spools, instances_from_env
+
+    cache = SpoolCache.from_env() if cached else None
+    return fetch_spools(instances_from_env(), cache=cache, offline=getattr(args, "offline", False))
+
+def add_common_arguments(parser, suppress=False):
+    # Options accepted both before and after the command; a subcommand must not
+    # overwrite what was given before it, hence the suppressed defaults there
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=argparse.SUPPRESS if suppress else False,
+        help="Print a breakdown of the time spent fetching, decoding, filtering, computing and writing."
+    )
+    parser.add_argument(
+        "--profile-file",
+        metavar='FILE',
+        default=argparse.SUPPRESS if suppress else None,
+        help="Like --profile, and also dump cProfile statistics to FILE and print the top functions."
+    )
+    parser.add_argument(
+        "--metrics-file",
+        metavar='FILE',
+        default=argparse.SUPPRESS if suppress else os.getenv("SPOOLMAN_METRICS_FILE"),
+        help="Write timers and counters to FILE in the Prometheus text format (for node_exporter's "
+             "textfile collector); 'daemon' rewrites it after every poll."
+    )
+
+def add_offline_argument(parser, suppress=False):
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        default=argparse.SUPPRESS if suppress else False,
+        help="Use only the locally cached spool list; never contact Spoolman."
+    )
 
-    # Configuration
-    # Read the Spoolman API URL from the environment variable or use the default
-    SPOOLMAN_API_URL = os.getenv("SPOOLMAN_API_URL", "http://localhost:7912/api/v1")
-    #API_KEY = os.getenv("SPOOLMAN_API_KEY")  # Ensure your API key is set in the environment
+def add_store_argument(parser):
+    from snapshot_store import DEFAULT_STORE_PATH
 
-    HEADERS = {
-        #"Authorization": f"Bearer {API_KEY}",  # Uncomment if your API requires authentication
-        "Content-Type": "application/json"
-    }
+    # Snapshots are kept in a SQLite store, snapshots.db unless SNAPSHOT_DB says otherwise
+    parser.add_argument(
+        "--store",
+        metavar='DB',
+        default=os.getenv("SNAPSHOT_DB", DEFAULT_STORE_PATH),
+        help="Path of the SQLite snapshot store (default: SNAPSHOT_DB or snapshots.db)."
+    )
+
+def add_incremental_arguments(parser):
+    from snapshot_store import DEFAULT_KEYFRAME_INTERVAL
+
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Store only what changed since the previous snapshot."
+    )
+    parser.add_argument(
+        "--keyframe-interval",
+        type=int,
+        default=DEFAULT_KEYFRAME_INTERVAL,
+        metavar='N',
+        help=f"With --incremental, store a full keyframe every N snapshots (default: {DEFAULT_KEYFRAME_INTERVAL})."
+    )
+
+def add_output_arguments(parser, default_output):
+    parser.add_argument(
+        "--output",
+        metavar='FILE',
+        help=f"Where per-job costs are written (.csv, .parquet, otherwise JSON Lines). Defaults to {default_output}."
+    )
+    parser.add_argument(
+        "--summary",
+        metavar='FILE',
+        help="Where per-spool totals are written (.csv, .parquet or .jsonl). Printed if omitted."
+    )
+
+def add_report_output_arguments(parser, report):
+    from report_output import FORMATS
+
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        help=f"Format of the {report}: a table, CSV, JSON Lines or Parquet (needs pyarrow). "
+             "Defaults to a table, or by the extension of --output."
+    )
+    parser.add_argument(
+        "--output",
+        metavar='FILE',
+        help=f"Where the {report} is written instead of stdout."
+    )
 
-    parser = argparse.ArgumentParser(description="Filament Cost Calculator")
+def add_snapshot_arguments(parser):
+    parser.add_argument(
+        "--file", "--snapshot-file",
+        dest="snapshot_file",
+        action="store_true",
+        help="Write a snapshot_<timestamp>.json file instead of using the store."
+    )
     parser.add_argument(
-        "--snapshot",
+        "--binary",
         action="store_true",
-        help="Take a snapshot of the current state of all filaments."
+        help="With --file, write the compact binary format (.spsnap) instead of JSON."
+    )
+    parser.add_argument(
+        "--compress",
+        choices=("gzip", "zstd"),
+        help="With --file, compress the JSON snapshot (.json.gz, or .json.zst with the zstandard package)."
+    )
+    parser.add_argument(
+        "--dir",
+        metavar='DIR',
+        help="With --file, the directory to write to (default: SNAPSHOT_DIR, or the current directory)."
     )
+    add_incremental_arguments(parser)
+    add_store_argument(parser)
+    add_offline_argument(parser, suppress=True)
+
+def run_snapshot(args, parser):
+    try:
+        # Stream spool data page by page straight into the snapshot
+        spools = fetch(args)
+        first_spool = next(spools, None)
+        if first_spool is None:
+            print("No spools found to snapshot.")
+            return
+
+        spools = itertools.chain([first_spool], spools)
+        if args.snapshot_file:
+            from snapshot_utils import save_snapshot
+            save_snapshot(spools, binary=args.binary, directory=args.dir, compression=args.compress)
+        else:
+            from snapshot_store import SnapshotStore
+            with SnapshotStore(args.store) as store:
+                taken_at = store.append(
+                    spools, incremental=args.incremental, keyframe_interval=args.keyframe_interval
+                )
+                print(f"Snapshot {taken_at} saved to {args.store}")
+                update_forecast(store)
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+def update_forecast(store):
+    # Keeps the depletion forecast in the store current with each snapshot saved,
+    # at the half-life it was last built with. The snapshot is already committed,
+    # so a failure here is logged rather than failing the command.
+    try:
+        from forecast import DepletionForecast
+        DepletionForecast(store).update()
+    except Exception as e:
+        logging.error("Forecast update failed: %s", e)
+
+def add_daemon_arguments(parser):
+    from snapshot_daemon import DEFAULT_POLL_INTERVAL
+
     parser.add_argument(
-        "--compare",
-        nargs=2,
-        metavar=('SNAPSHOT1', 'SNAPSHOT2'),
-        help="Compare two snapshots by providing two snapshot file paths."
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        metavar='SECONDS',
+        help=f"Seconds between polls (default: {DEFAULT_POLL_INTERVAL})."
     )
-    args = parser.parse_args()
-    if args.snapshot:
+    add_incremental_arguments(parser)
+    add_store_argument(parser)
+
+def run_daemon(args, parser):
+    from instrumentation import write_prometheus_textfile
+    from snapshot_daemon import SnapshotDaemon
+    from snapshot_store import SnapshotStore
+
+    if args.poll_interval <= 0:
+        parser.error("--poll-interval must be positive.")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    with SnapshotStore(args.store) as store:
+        def after_poll():
+            update_forecast(store)
+            if args.metrics_file:
+                write_prometheus_textfile(args.metrics_file)
+
+        daemon = SnapshotDaemon(
+            # Always poll Spoolman itself; the cache would hide changes for up to its TTL
+            lambda: fetch(args, cached=False), store, interval=args.poll_interval,
+            incremental=args.incremental, keyframe_interval=args.keyframe_interval, after_poll=after_poll,
+        )
+        print(f"Polling Spoolman every {args.poll_interval:g}s, storing snapshots in {args.store}. Ctrl+C to stop.")
         try:
-            # Fetch spool data and save a snapshot
-            spools = get_spools(SPOOLMAN_API_URL)
-            if not spools:
-                print("No spools found to snapshot.")
-                return
-            
-            save_snapshot(spools)
-
-        except Exception as e:
-            print(f"An error occurred: {e}")
-    elif args.compare:
+            daemon.run()
+        except KeyboardInterrupt:
+            print("Stopped.")
+
+def add_serve_arguments(parser):
+    from quote_server import DEFAULT_HOST, DEFAULT_PORT, DEFAULT_REFRESH_INTERVAL
+
+    parser.add_argument(
+        "--host",
+        default=DEFAULT_HOST,
+        help=f"Address to listen on (default: {DEFAULT_HOST})."
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help=f"Port to listen on (default: {DEFAULT_PORT})."
+    )
+    parser.add_argument(
+        "--refresh-interval",
+        type=float,
+        default=DEFAULT_REFRESH_INTERVAL,
+        metavar='SECONDS',
+        help=f"Seconds between spool index refreshes (default: {DEFAULT_REFRESH_INTERVAL})."
+    )
+    add_offline_argument(parser, suppress=True)
+
+def run_serve(args, parser):
+    from quote_server import serve_quotes
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    try:
+        serve_quotes(
+            lambda: fetch(args),
+            host=args.host, port=args.port, refresh_interval=args.refresh_interval,
+        )
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+def add_batch_arguments(parser):
+    parser.add_argument("job_file", metavar='JOB_FILE', help="CSV or JSON Lines job file.")
+    add_output_arguments(parser, "<JOB_FILE>_costs")
+    add_offline_argument(parser, suppress=True)
+
+def run_batch(args, parser):
+    from batch import batch_costs
+
+    try:
+        # One spool fetch prices the whole job file
+        batch_costs(args.job_file, fetch(args), output_path=args.output, summary_path=args.summary)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+def add_recost_arguments(parser):
+    from recost import DEFAULT_CHUNK_SIZE
+
+    parser.add_argument("job_file", metavar='JOB_FILE', help="Job archive in the batch job file format.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        metavar='N',
+        help="Number of worker processes (default: one per CPU core)."
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        metavar='N',
+        help=f"Jobs priced per task (default: {DEFAULT_CHUNK_SIZE})."
+    )
+    add_output_arguments(parser, "<JOB_FILE>_costs")
+    add_offline_argument(parser, suppress=True)
+
+def run_recost(args, parser):
+    from batch import default_output_path, read_jobs
+    from recost import recost
+
+    try:
+        recost(
+            read_jobs(args.job_file), fetch(args), args.output or default_output_path(args.job_file),
+            summary_path=args.summary, max_workers=args.workers, chunk_size=args.chunk_size,
+            progress=lambda done: print(f"Re-costed {done} jobs...", end="\r", flush=True),
+        )
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+def add_whatif_arguments(parser):
+    parser.add_argument("job_file", metavar='JOB_FILE', help="Job history in the batch job file format.")
+    parser.add_argument(
+        "--scenarios",
+        required=True,
+        metavar='FILE',
+        help="JSON file listing the scenarios, e.g. [{\"name\": \"PLA +10%%\", \"prices\": {\"1\": 22.0}, \"substitutions\": {\"3\": \"7\"}}]."
+    )
+    parser.add_argument(
+        "--output",
+        metavar='FILE',
+        help="Where the cost of every job a scenario changes is written (.csv, .parquet, otherwise JSON Lines)."
+    )
+    add_offline_argument(parser, suppress=True)
+
+def run_whatif(args, parser):
+    from batch import read_jobs
+    from pricing import SCENARIO_JOB_FIELDS, PricingEngine, print_scenarios, read_scenarios
+    from report_output import open_sink
+
+    try:
+        scenarios = read_scenarios(args.scenarios)
+        engine = PricingEngine(read_jobs(args.job_file), fetch(args))
+        if args.output:
+            with open_sink(args.output, SCENARIO_JOB_FIELDS) as writer:
+                rows = engine.compare(scenarios, writer.write)
+            print(f"Changed job costs written to {args.output}")
+        else:
+            rows = engine.compare(scenarios)
+        print_scenarios(rows, skipped=len(engine.errors))
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+def add_gcode_arguments(parser):
+    parser.add_argument("path", metavar='PATH', help="A G-code file or a directory of them.")
+    parser.add_argument(
+        "--tools",
+        metavar='MAP',
+        required=True,
+        help="The spool loaded in each tool, e.g. '0=12,1=7'."
+    )
+    add_output_arguments(parser, "gcode_costs.csv")
+    add_offline_argument(parser, suppress=True)
+
+def run_gcode(args, parser):
+    from batch import price_jobs
+    from gcode_import import gcode_jobs, gcode_paths, parse_tool_map
+
+    try:
+        tools = parse_tool_map(args.tools)
+        paths = gcode_paths(args.path)
+        if not paths:
+            print(f"No G-code files found in {args.path}.")
+            return
+        price_jobs(gcode_jobs(paths, tools), fetch(args), args.output or "gcode_costs.csv", summary_path=args.summary)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+def add_convert_arguments(parser):
+    parser.add_argument("source", metavar='SOURCE', help="Snapshot file to read.")
+    parser.add_argument("target", metavar='TARGET', help="Snapshot file to write; .spsnap for binary, otherwise JSON.")
+
+def run_convert(args, parser):
+    from snapshot_utils import convert_snapshot
+
+    try:
+        count = convert_snapshot(args.source, args.target)
+        print(f"Converted {count} spools from {args.source} to {args.target}")
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+
+def add_report_arguments(parser):
+    from usage_report import INTERVALS
+
+    parser.add_argument(
+        "source",
+        metavar='SOURCE',
+        help="A directory of snapshot files or a time range in the snapshot store (e.g. '30d' or '2025-01-01..2025-02-01')."
+    )
+    parser.add_argument(
+        "--interval",
+        choices=INTERVALS,
+        default="day",
+        help="Reporting period (default: day). 'snapshot' reports every pair of consecutive snapshots."
+    )
+    parser.add_argument(
+        "--output",
+        metavar='FILE',
+        help="Where the report rows are written (.csv, .parquet, otherwise JSON Lines). Defaults to usage_report.csv."
+    )
+    add_store_argument(parser)
+
+def run_report(args, parser):
+    from report_output import open_sink
+    from snapshot_store import SnapshotStore
+    from usage_report import REPORT_FIELDS, report_states, usage_report
+
+    output_path = args.output or "usage_report.csv"
+    store = SnapshotStore(args.store) if os.path.exists(args.store) else None
+    try:
+        with open_sink(output_path, REPORT_FIELDS) as writer:
+            writer.write_rows(usage_report(report_states(args.source, store), interval=args.interval))
+        print(f"Usage report written to {output_path}")
+    except ValueError as e:
+        print(f"Error: {e}")
+    finally:
+        if store is not None:
+            store.close()
+
+def add_compare_arguments(parser):
+    parser.add_argument(
+        "snapshots",
+        nargs='+',
+        metavar='SNAPSHOT',
+        help="Two snapshot file paths, two times (e.g. '7d' 'now', '2025-02-08 10:00'), "
+             "or one range (e.g. '7d' or '2025-02-01..2025-02-08')."
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="For two snapshot files, stream them with bounded memory (files must be sorted by spool ID)."
+    )
+    add_report_output_arguments(parser, "comparison")
+    add_store_argument(parser)
+
+def run_compare(args, parser):
+    import snapshot_utils
+
+    if len(args.snapshots) > 2:
+        parser.error("compare takes one range or two snapshots.")
+    if len(args.snapshots) == 2 and all(snapshot_utils.is_snapshot_file(ref) for ref in args.snapshots):
         # Compare two snapshot files
-        snapshot1, snapshot2 = args.compare
-        compare_snapshots(snapshot1, snapshot2)
+        snapshot1, snapshot2 = args.snapshots
+        if args.stream:
+            compare = snapshot_utils.compare_snapshots_streaming
+        else:
+            compare = snapshot_utils.compare_snapshots
+        try:
+            compare(snapshot1, snapshot2, output=args.output, format=args.format)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+    elif not os.path.exists(args.store):
+        print(f"Error: No snapshot store found at {args.store}.")
+        return
     else:
+        from snapshot_store import SnapshotStore
         try:
-            spools = get_spools(SPOOLMAN_API_URL)
-            
-            if not spools:
-                print("No spools found.")
-                return
-
-            # Assign IDs to spools for easy selection
-            spool_dict = {}
-            print("Available Spools:")
-            for idx, spool in enumerate(spools, start=1):
-                spool_id = spool['id']
-                spool_name = spool['filament']['name']
-                spool_price = spool.get('price', 0.0)
-                spool_material = spool['filament'].get('material', 'Unknown')
-                spool_color = spool['filament'].get('color_hex', 'Unknown')
-                print(f"{idx}. {spool_name} (ID: {spool_id}) Price: ${spool_price:.2f} Material: {spool_material} Color: {spool_color}")
-                spool_dict[str(idx)] = spool # Mapping the selection number to the spool
-
-            total_cost = 0.0
-            summary = []
-            another = 'y'
-
-            while another.lower() == 'y':
-                spool_choice = input("\nSelect a spool by number: ").strip()
-                selected_spool = spool_dict.get(spool_choice)
-                if not selected_spool:
-                    print("Invalid selection. Please try again.")
-                    continue
-
-                # Extract necessary data from selected_spool
-                spool_cost = float(selected_spool.get('price', 0.0))  # Price you paid for the spool
-                spool_weight = float(selected_spool.get('initial_weight', 0))  # Total filament weight when new (grams)
-                remaining_weight = float(selected_spool.get('remaining_weight', 0))  # Remaining filament weight (grams)
-
-                spool_name = selected_spool['filament']['name']
-                spool_material = selected_spool['filament'].get('material', 'Unknown')
-                diameter_mm = float(selected_spool['filament'].get('diameter', 1.75))  # Default to 1.75 mm if not provided
-                density = float(selected_spool['filament'].get('density', 1.24))  # Default PLA density if not provided
-
-                print(f"\nSelected Spool: {spool_name}")
-                print(f"Spool Cost: ${spool_cost:.2f}")
-                print(f"Remaining Filament Weight: {remaining_weight:.2f} grams")
-                print(f"Material: {spool_material}, Diameter: {diameter_mm} mm, Density: {density} g/cm³")
-
-                # Calculate mass per meter
-                mass_per_meter = calculate_mass_per_meter(diameter_mm, density)
-                #print(f"Estimated Mass per Meter: {mass_per_meter:.4f} g/m")
-
-                # Prompt user for filament usage
-                filament_input = input("Enter filament used for the print (e.g., '100g' or '1.34m'): ").strip()
-                try:
-                    filament_value, unit = parse_filament_input(filament_input)
-                except ValueError as e:
-                    print(f"Error: {e}")
-                    continue
-
-                if unit == 'g':
-                    filament_used_grams = filament_value
-                elif unit == 'm':
-                    filament_used_grams = filament_value * mass_per_meter
-                else:
-                    print("Invalid unit. Please enter a valid value with 'g' for grams or 'm' for meters.")
-                    continue
-
-                if filament_used_grams > remaining_weight:
-                    print("Error: Filament used exceeds remaining spool weight.")
-                    continue
-
-                print_cost = calculate_cost(filament_used_grams, spool_weight, spool_cost)
-                print(f"Cost for this print: ${print_cost:.2f}")
-                total_cost += print_cost
-
-                # Add to summary
-                summary.append({
-                    'spool_name': spool_name,
-                    'filament_used': filament_value,
-                    'unit': unit,
-                    'cost': print_cost
-                })
-
-                another = input("\nDo you want to add another spool? (y/n): ")
-
-            # Display the summary
-            print("\nSummary of Filament Usage:")
-            print("{:<30} {:>15} {:>10} {:>15}".format('Spool Name', 'Filament Used', 'Unit', 'Cost'))
-            print("-" * 75)
-            for item in summary:
-                print("{:<30} {:>15.2f} {:>10} {:>15.2f}".format(
-                    item['spool_name'],
-                    item['filament_used'],
-                    item['unit'],
-                    item['cost']
-                ))
-            print("-" * 75)
-            print("{:<30} {:>40.2f}".format('Total Cost:', total_cost))
-
-        except Exception as e:
-            print(f"An error occurred: {e}")
+            with SnapshotStore(args.store) as store:
+                snapshot_utils.compare_stored_snapshots(store, args.snapshots, output=args.output, format=args.format)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+    if args.output:
+        print(f"Comparison written to {args.output}")
+
+def add_forecast_arguments(parser):
+    from forecast import DEFAULT_HALF_LIFE_DAYS, DEFAULT_HORIZON_DAYS
+
+    parser.add_argument(
+        "--within",
+        type=float,
+        default=DEFAULT_HORIZON_DAYS,
+        metavar='DAYS',
+        help=f"List the spools expected to run out within DAYS (default: {DEFAULT_HORIZON_DAYS:g})."
+    )
+    parser.add_argument(
+        "--half-life",
+        type=float,
+        metavar='DAYS',
+        help="Age in days at which usage counts half towards the consumption rate. Kept in the store for later "
+             f"snapshots; defaults to the stored value, or {DEFAULT_HALF_LIFE_DAYS:g} for a new store."
+    )
+    add_store_argument(parser)
+
+def run_forecast(args, parser):
+    from forecast import DepletionForecast, print_forecast
+    from snapshot_store import SnapshotStore
+
+    if args.half_life is not None and args.half_life <= 0:
+        parser.error("--half-life must be positive.")
+    if not os.path.exists(args.store):
+        print(f"Error: No snapshot store found at {args.store}.")
+        return
+    with SnapshotStore(args.store) as store:
+        forecast = DepletionForecast(store, half_life_days=args.half_life)
+        forecast.update()
+        print_forecast(forecast, within_days=args.within)
+
+def run_interactive(args, parser):
+    from cost_index import CostIndex
+    from filament_calculations import parse_filament_input
+    from report_output import Column, TableSink
+
+    try:
+        spools = fetch(args)
+
+        # Assign IDs to spools for easy selection
+        spool_dict = {}
+        print("Available Spools:")
+        for idx, spool in enumerate(spools, start=1):
+            spool_id = spool['id']
+            spool_name = spool['filament']['name']
+            spool_price = spool.get('price', 0.0)
+            spool_material = spool['filament'].get('material', 'Unknown')
+            spool_color = spool['filament'].get('color_hex', 'Unknown')
+            print(f"{idx}. {spool_name} (ID: {spool_id}) Price: ${spool_price:.2f} Material: {spool_material} Color: {spool_color}")
+            spool_dict[str(idx)] = spool # Mapping the selection number to the spool
+
+        if not spool_dict:
+            print("No spools found.")
+            return
+        index = CostIndex(spool_dict.values())
+
+        total_cost = 0.0
+        summary = []
+        another = 'y'
+
+        while another.lower() == 'y':
+            spool_choice = input("\nSelect a spool by number: ").strip()
+            selected_spool = spool_dict.get(spool_choice)
+            if not selected_spool:
+                print("Invalid selection. Please try again.")
+                continue
+
+            # Costing constants were computed once for all spools in the index
+            record = index[selected_spool['id']]
+            spool_name = record.name
+
+            print(f"\nSelected Spool: {spool_name}")
+            print(f"Spool Cost: ${record.price:.2f}")
+            print(f"Remaining Filament Weight: {record.remaining_grams:.2f} grams")
+            print(f"Material: {record.material}, Diameter: {record.diameter} mm, Density: {record.density} g/cm³")
+
+            # Prompt user for filament usage
+            filament_input = input("Enter filament used for the print (e.g., '100g' or '1.34m'): ").strip()
+            try:
+                filament_value, unit = parse_filament_input(filament_input)
+            except ValueError as e:
+                print(f"Error: {e}")
+                continue
+
+            filament_used_grams = record.grams(filament_value, unit)
+            if filament_used_grams > record.remaining_grams:
+                print("Error: Filament used exceeds remaining spool weight.")
+                continue
+
+            print_cost = record.cost(filament_used_grams)
+            print(f"Cost for this print: ${print_cost:.2f}")
+            total_cost += print_cost
+
+            # Add to summary
+            summary.append({
+                'spool_name': spool_name,
+                'filament_used': filament_value,
+                'unit': unit,
+                'cost': print_cost
+            })
+
+            another = input("\nDo you want to add another spool? (y/n): ")
+
+        # Display the summary
+        columns = [
+            Column("spool_name", "Spool Name", 30, ""),
+            Column("filament_used", "Filament Used", 15, ".2f"),
+            Column("unit", "Unit", 10, "s"),
+            Column("cost", "Cost", 15, ".2f"),
+        ]
+        with TableSink(columns, title="\nSummary of Filament Usage:") as table:
+            table.write_rows(summary)
+            table.footer({"spool_name": "Total Cost:", "cost": total_cost})
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+# Command name -> (help, add_arguments, run), in the order they are listed
+COMMANDS = {
+    "snapshot": ("Take a snapshot of all filaments and add it to the snapshot store.", add_snapshot_arguments, run_snapshot),
+    "daemon": ("Poll Spoolman on an interval, log usage and store a snapshot whenever something changed.",
+               add_daemon_arguments, run_daemon),
+    "serve": ("Run a local HTTP service answering POST /quote from an in-memory spool index.",
+              add_serve_arguments, run_serve),
+    "batch": ("Price every job in a CSV or JSON Lines job file.", add_batch_arguments, run_batch),
+    "recost": ("Re-price a large job archive in parallel on all CPU cores.", add_recost_arguments, run_recost),
+    "whatif": ("Compare the cost of a job history under what-if spool prices and substitutions.",
+               add_whatif_arguments, run_whatif),
+    "gcode": ("Price G-code files from the filament usage their slicer recorded.", add_gcode_arguments, run_gcode),
+    "convert": ("Convert a snapshot file between JSON (.json) and binary (.spsnap).", add_convert_arguments, run_convert),
+    "report": ("Report consumption and cost per spool and material over snapshots.", add_report_arguments, run_report),
+    "compare": ("Compare two snapshots and show the filament used and its cost.", add_compare_arguments, run_compare),
+    "forecast": ("Forecast when spools and materials run out, and the cost of reordering them.",
+                 add_forecast_arguments, run_forecast),
+}
+
+def legacy_argv(argv):
+    """
+    Rewrites the flag-style command line used before subcommands ('--compare a b',
+    '--snapshot --incremental') to the subcommand form ('compare a b', ...).
+
+    Options given before the old command flag are moved after the command's arguments.
+    """
+    for name in COMMANDS:
+        for position, arg in enumerate(argv):
+            flag, equals, value = arg.partition("=")
+            if flag == f"--{name}":
+                return [name] + ([value] if equals else []) + argv[position + 1:] + argv[:position]
+    return argv
+
+def command_name(argv):
+    """
+    Returns the command named on a command line, or None. The line is parsed the
+    way argparse will parse it, so an option value that happens to be a command
+    name (e.g. '--output batch') is not taken for the command.
+    """
+    # Help is left to the full parser, which knows the command's options
+    args, _ = build_parser().parse_known_args([arg for arg in argv if arg not in ("-h", "--help")])
+    return args.command
+
+def build_parser(command=None):
+    """
+    Builds the command line parser. Only the options of the given command are
+    added, so only that command's modules are imported to describe them.
+    """
+    parser = argparse.ArgumentParser(
+        description="Filament Cost Calculator. Without a command, prompts for the spools and filament used in a print."
+    )
+    add_common_arguments(parser)
+    add_offline_argument(parser)
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    for name, (help_text, add_arguments, _) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text, description=help_text)
+        if name == command:
+            add_arguments(subparser)
+            add_common_arguments(subparser, suppress=True)
+    return parser
+
+def main(argv=None):
+    # Load environment variables from .env file
+    load_env()
+
+    argv = legacy_argv(sys.argv[1:] if argv is None else list(argv))
+    command = command_name(argv)
+    parser = build_parser(command)
+    args = parser.parse_args(argv)
+    run = COMMANDS[args.command][2] if args.command else run_interactive
+
+    if not (args.profile or args.profile_file or args.metrics_file):
+        run(args, parser)
+        return
+
+    from instrumentation import metrics, print_breakdown, timer, write_prometheus_textfile
+
+    metrics.enable()
+    profiler = None
+    if args.profile_file:
+        import cProfile
+        profiler = cProfile.Profile()
+    try:
+        with timer(args.command or "interactive"):
+            if profiler is not None:
+                profiler.runcall(run, args, parser)
+            else:
+                run(args, parser)
+    finally:
+        if args.profile or args.profile_file:
+            print_breakdown()
+        if profiler is not None:
+            import pstats
+            profiler.dump_stats(args.profile_file)
+            print(f"\ncProfile statistics written to {args.profile_file}")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+        if args.metrics_file:
+            write_prometheus_textfile(args.metrics_file)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,236 @@
+# pricing.py
+
+import json
+from array import array
+from collections import namedtuple
+
+from batch import EMPTY_JOB_ERROR
+from cost_index import CostIndex
+from filament_calculations import SPOOL_WEIGHT_ZERO_ERROR, USAGE_CACHE_SIZE, parse_usage
+from report_output import Column, TableSink
+
+SCENARIO_FIELDS = ["scenario", "jobs_affected", "baseline_cost", "cost", "difference"]
+SCENARIO_JOB_FIELDS = ["scenario", "job_id", "baseline_cost", "cost", "difference"]
+SCENARIO_COLUMNS = [
+    Column("scenario", "Scenario", 30, ""),
+    Column("jobs_affected", "Jobs", 10, "d"),
+    Column("baseline_cost", "Baseline", 14, ".2f"),
+    Column("cost", "Cost", 14, ".2f"),
+    Column("difference", "Difference", 12, "s"),
+]
+
+ScenarioResult = namedtuple("ScenarioResult", ["name", "baseline_cost", "cost", "job_costs"])
+
+class Scenario:
+    """
+    A what-if change to the spools: new prices for some spools (prices, spool ID ->
+    price) and spools replaced by others of the same material and color
+    (substitutions, spool ID -> spool ID).
+    """
+
+    def __init__(self, name, prices=None, substitutions=None):
+        self.name = name
+        self.prices = {str(spool_id): float(price) for spool_id, price in (prices or {}).items()}
+        self.substitutions = {str(spool_id): str(other) for spool_id, other in (substitutions or {}).items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["name"], data.get("prices"), data.get("substitutions"))
+
+    def spools(self):
+        """
+        Returns the IDs of the spools whose jobs this scenario changes.
+        """
+        return set(self.prices) | set(self.substitutions)
+
+def read_scenarios(path):
+    """
+    Reads scenarios from a JSON file holding a list of objects such as
+        {"name": "PLA +10%", "prices": {"1": 22.0}, "substitutions": {"3": "7"}}
+    """
+    with open(path, "r") as scenario_file:
+        data = json.load(scenario_file)
+    if not isinstance(data, list):
+        raise ValueError(f"{path} must hold a list of scenarios.")
+    return [Scenario.from_dict(item) for item in data]
+
+class PricingEngine:
+    """
+    Prices a job history once and then re-prices it under what-if scenarios.
+
+    Usage strings are parsed once, and each spool's usage is kept as the jobs it
+    appears in with the grams and meters used there, plus its totals. A job's
+    cost is linear in each spool's cost per gram, so a scenario's total only needs
+    the totals of the spools it changes, and its per-job costs only touch the jobs
+    those spools appear in. Unit costs (cost per gram, grams per meter) are
+    memoized per spool and price.
+    """
+
+    def __init__(self, jobs, spools):
+        self.index = spools if isinstance(spools, CostIndex) else CostIndex(spools)
+        self.job_ids = []
+        self.errors = {}  # job ID -> why it could not be priced; such jobs are left out
+        self.baseline = array("d")  # Cost of each job, in job_ids order
+        # spool ID -> (job positions, grams, meters) per job line, and [grams, meters] over all jobs
+        self.usage = {}
+        self._unit_costs = {}
+
+        unit_costs = self._unit_costs
+        parsed = {}  # Usage string -> (grams, meters); job histories repeat the same few
+        for job in jobs:
+            job_id, items = job[0], job[1]
+            if len(job) > 2 and job[2]:
+                # A batch Job that could not be read
+                self.errors[job_id] = job[2]
+                continue
+            if not items:
+                self.errors[job_id] = EMPTY_JOB_ERROR
+                continue
+            lines = []
+            cost = 0.0
+            try:
+                for spool_id, usage in items:
+                    spool_id = str(spool_id)
+                    unit_cost = unit_costs.get((spool_id, None)) or self.unit_cost(spool_id)
+                    cost_per_gram, grams_per_meter = unit_cost
+                    amounts = parsed.get(usage) if usage.__class__ is str else None
+                    if amounts is None:
+                        amounts = parse_usage(usage)
+                        if usage.__class__ is str and len(parsed) < USAGE_CACHE_SIZE:
+                            parsed[usage] = amounts
+                    grams, meters = amounts
+                    cost += (grams + meters * grams_per_meter) * cost_per_gram
+                    lines.append((spool_id, grams, meters))
+            except ValueError as e:
+                self.errors[job_id] = str(e)
+                continue
+
+            position = len(self.job_ids)
+            self.job_ids.append(job_id)
+            self.baseline.append(cost)
+            for spool_id, grams, meters in lines:
+                usage = self.usage.get(spool_id)
+                if usage is None:
+                    usage = self.usage[spool_id] = (array("L"), array("d"), array("d"), [0.0, 0.0])
+                positions, spool_grams, spool_meters, totals = usage
+                positions.append(position)
+                spool_grams.append(grams)
+                spool_meters.append(meters)
+                totals[0] += grams
+                totals[1] += meters
+        self.baseline_cost = sum(self.baseline)
+
+    def unit_cost(self, spool_id, price=None):
+        """
+        Returns (cost per gram, grams per meter) of a spool, at its own price or at
+        price. Memoized, since scenarios keep asking for the same few spools.
+        """
+        key = (spool_id, price)
+        unit_cost = self._unit_costs.get(key)
+        if unit_cost is None:
+            record = self.index[spool_id]
+            if price is None:
+                cost_per_gram = record.cost_per_gram
+            else:
+                initial_weight = record.signature[1]
+                cost_per_gram = price / initial_weight if initial_weight != 0 else None
+            if cost_per_gram is None:
+                raise ValueError(f"Spool {spool_id}: {SPOOL_WEIGHT_ZERO_ERROR}")
+            unit_cost = self._unit_costs[key] = (cost_per_gram, record.grams_per_meter)
+        return unit_cost
+
+    def _line_cost(self, spool_id, grams, meters, price=None):
+        cost_per_gram, grams_per_meter = self.unit_cost(spool_id, price)
+        return (grams + meters * grams_per_meter) * cost_per_gram
+
+    def _replacement(self, scenario, spool_id):
+        # Returns (spool the usage is priced as, its scenario price or None)
+        priced_as = scenario.substitutions.get(spool_id, spool_id)
+        if priced_as != spool_id:
+            self._check_substitute(spool_id, priced_as)
+        return priced_as, scenario.prices.get(priced_as)
+
+    def _check_substitute(self, spool_id, other_id):
+        if other_id not in self.index:
+            raise ValueError(f"Unknown spool ID {other_id}.")
+        record, other = self.index[spool_id], self.index[other_id]
+        for field in ('material', 'color_hex'):
+            if getattr(record, field) != getattr(other, field):
+                raise ValueError(
+                    f"Spool {spool_id} cannot be replaced by spool {other_id}: its {field} differs."
+                )
+
+    def scenario_cost(self, scenario):
+        """
+        Returns the total cost of all jobs under a scenario, from the per-spool totals alone.
+        """
+        cost = self.baseline_cost
+        for spool_id in scenario.spools() & self.usage.keys():
+            grams, meters = self.usage[spool_id][3]
+            priced_as, price = self._replacement(scenario, spool_id)
+            cost += self._line_cost(priced_as, grams, meters, price)
+            cost -= self._line_cost(spool_id, grams, meters)
+        return cost
+
+    def evaluate(self, scenario):
+        """
+        Re-prices the jobs a scenario affects and returns a ScenarioResult with the
+        total baseline and scenario costs and job_costs, {job ID: (baseline cost,
+        scenario cost)} for the affected jobs only.
+        """
+        changes = {}
+        for spool_id in scenario.spools() & self.usage.keys():
+            priced_as, price = self._replacement(scenario, spool_id)
+            new_cost_per_gram, new_grams_per_meter = self.unit_cost(priced_as, price)
+            cost_per_gram, grams_per_meter = self.unit_cost(spool_id)
+            positions, grams_used, meters_used, _ = self.usage[spool_id]
+            for position, grams, meters in zip(positions, grams_used, meters_used):
+                changes[position] = changes.get(position, 0.0) + (
+                    (grams + meters * new_grams_per_meter) * new_cost_per_gram
+                    - (grams + meters * grams_per_meter) * cost_per_gram
+                )
+        job_costs = {
+            self.job_ids[position]: (self.baseline[position], self.baseline[position] + change)
+            for position, change in sorted(changes.items())
+        }
+        return ScenarioResult(
+            scenario.name, self.baseline_cost, self.baseline_cost + sum(changes.values()), job_costs
+        )
+
+    def compare(self, scenarios, write_job=None):
+        """
+        Evaluates each scenario and returns one row (a dict with SCENARIO_FIELDS) per
+        scenario. write_job, if given, receives a SCENARIO_JOB_FIELDS dict for every
+        job whose cost a scenario changes.
+        """
+        rows = []
+        for scenario in scenarios:
+            result = self.evaluate(scenario)
+            if write_job is not None:
+                for job_id, (baseline_cost, cost) in result.job_costs.items():
+                    write_job({
+                        "scenario": scenario.name,
+                        "job_id": job_id,
+                        "baseline_cost": baseline_cost,
+                        "cost": cost,
+                        "difference": cost - baseline_cost,
+                    })
+            rows.append({
+                "scenario": scenario.name,
+                "jobs_affected": len(result.job_costs),
+                "baseline_cost": result.baseline_cost,
+                "cost": result.cost,
+                "difference": result.cost - result.baseline_cost,
+            })
+        return rows
+
+def print_scenarios(rows, skipped=0):
+    """
+    Prints the scenario comparison table.
+    """
+    with TableSink(SCENARIO_COLUMNS) as table:
+        table.write_rows(
+            dict(row, scenario=row['scenario'][:30], difference=f"{row['difference']:+.2f}") for row in rows
+        )
+    if skipped:
+        print(f"\n{skipped} jobs could not be priced and were left out.")
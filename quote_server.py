@@ -0,0 +1,168 @@
+# quote_server.py
+
+import datetime
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from batch import price_job
+from cost_index import CostIndex
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7913
+DEFAULT_REFRESH_INTERVAL = 60  # Seconds between spool index refreshes
+MAX_REQUEST_SIZE = 1024 * 1024
+
+logger = logging.getLogger("quote_server")
+
+class SpoolIndex:
+    """
+    In-memory CostIndex of the spools, refreshed from Spoolman in the background.
+
+    A refresh only rebuilds the records of spools that changed, each replaced
+    with a single assignment, so request threads read the index without a lock.
+    """
+
+    def __init__(self, fetch, refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        self.fetch = fetch
+        self.refresh_interval = refresh_interval
+        self.costs = CostIndex()
+        self.refreshed_at = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def refresh(self):
+        # Fetch the whole list first so a failed fetch leaves the index untouched
+        spools = list(self.fetch())
+        changed = self.costs.update(spools)
+        self.refreshed_at = datetime.datetime.now()
+        logger.info("Spool index refreshed: %d spools, %d changed", len(self.costs), changed)
+
+    def start(self):
+        """
+        Loads the index once, then keeps refreshing it on a background thread.
+        """
+        self.refresh()
+        self.thread = threading.Thread(target=self._refresh_loop, name="spool-index", daemon=True)
+        self.thread.start()
+
+    def _refresh_loop(self):
+        while not self.stop_event.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep quoting from the last good index until Spoolman is back
+                logger.error("Spool index refresh failed: %s", e)
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+def quote(job, index):
+    """
+    Prices one quote request, a job in the batch JSON Lines format:
+        {"job_id": "benchy", "spools": [{"spool_id": 1, "usage": "12.5m"}]}
+    Returns the per-spool lines and totals. Raises ValueError for invalid requests.
+    """
+    if not isinstance(job, dict) or not isinstance(job.get("spools"), list) or not job["spools"]:
+        raise ValueError("Request must be a JSON object with a non-empty 'spools' list.")
+    try:
+        items = [(str(item["spool_id"]), str(item["usage"])) for item in job["spools"]]
+    except (KeyError, TypeError):
+        raise ValueError("Each spool needs a 'spool_id' and a 'usage' such as '100g' or '1.34m'.")
+
+    lines = price_job(items, index)
+    return {
+        "job_id": job.get("job_id"),
+        "spools": [
+            {"spool_id": spool_id, "grams": round(grams, 4), "cost": round(cost, 4)}
+            for spool_id, grams, cost in lines
+        ],
+        "grams": round(sum(grams for _, grams, _ in lines), 4),
+        "cost": round(sum(cost for _, _, cost in lines), 4),
+    }
+
+class QuoteHandler(BaseHTTPRequestHandler):
+    """
+    POST /quote prices a job against the spool index; GET /health reports the index state.
+    """
+
+    protocol_version = "HTTP/1.1"  # Keep connections alive between quotes
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/quote":
+            self._send_json(404, {"error": f"Unknown path {self.path}."})
+            return
+        header = self.headers.get("Content-Length")
+        if header is None:
+            self._send_json(411, {"error": "Content-Length is required."})
+            self.close_connection = True
+            return
+        try:
+            length = int(header)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # The end of the body is unknown, so the connection cannot be reused
+            self._send_json(400, {"error": f"Invalid Content-Length '{header}'."})
+            self.close_connection = True
+            return
+        if length > MAX_REQUEST_SIZE:
+            self._send_json(413, {"error": "Request too large."})
+            self.close_connection = True
+            return
+        try:
+            job = json.loads(self.rfile.read(length) or b"null")
+            self._send_json(200, quote(job, self.server.index.costs))
+        except (TypeError, ValueError) as e:  # Includes malformed JSON
+            self._send_json(400, {"error": str(e)})
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/health":
+            self._send_json(404, {"error": f"Unknown path {self.path}."})
+            return
+        index = self.server.index
+        self._send_json(200, {
+            "spools": len(index.costs),
+            "refreshed_at": index.refreshed_at.isoformat(sep=" ") if index.refreshed_at else None,
+        })
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+class QuoteServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering quote requests from a shared SpoolIndex.
+    """
+
+    daemon_threads = True
+    request_queue_size = 256  # Backlog for bursts of concurrent quote requests
+
+    def __init__(self, index, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.index = index
+        super().__init__((host, port), QuoteHandler)
+
+def serve_quotes(fetch, host=DEFAULT_HOST, port=DEFAULT_PORT, refresh_interval=DEFAULT_REFRESH_INTERVAL):
+    """
+    Loads the spool index and answers quote requests until interrupted.
+    """
+    index = SpoolIndex(fetch, refresh_interval)
+    index.start()
+    with QuoteServer(index, host, port) as server:
+        print(f"Quoting {len(index.costs)} spools on http://{host}:{server.server_port}/quote. Ctrl+C to stop.")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("Stopped.")
+        finally:
+            index.stop()
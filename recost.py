@@ -0,0 +1,117 @@
+# recost.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from batch import JOB_FIELDS, run_batch, write_summary
+from cost_index import CostIndex
+from report_output import Column, TableSink, open_sink
+
+DEFAULT_CHUNK_SIZE = 5000  # Jobs priced per task
+MATERIAL_FIELDS = ["material", "spools", "jobs", "grams", "cost"]
+MATERIAL_COLUMNS = [
+    Column("material", "Material", 20, ""),
+    Column("spools", "Spools", 8, "d"),
+    Column("jobs", "Jobs", 8, "d"),
+    Column("grams", "Grams", 12, ".2f"),
+    Column("cost", "Cost", 12, ".2f"),
+]
+
+# Spool table of a worker process, built once from the spools passed to the pool
+_worker_index = None
+
+def _init_worker(spools):
+    global _worker_index
+    _worker_index = CostIndex(spools)
+
+def _price_chunk(jobs):
+    rows = []
+    totals = run_batch(jobs, _worker_index, rows.append)
+    return rows, totals
+
+def iter_chunks(jobs, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Splits a stream of jobs into lists of at most chunk_size jobs.
+    """
+    jobs = iter(jobs)
+    while True:
+        chunk = list(islice(jobs, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def recost_chunks(jobs, spools, max_workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Prices a stream of jobs in chunks across a process pool, yielding (rows, totals)
+    per chunk in the order the jobs were read.
+
+    Each worker builds its own CostIndex once from the spool list. At most two chunks
+    per worker are in flight, so the archive is never held in memory as a whole.
+    """
+    spools = list(spools)
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(spools,)) as executor:
+        pending = []
+        for chunk in iter_chunks(jobs, chunk_size):
+            pending.append(executor.submit(_price_chunk, chunk))
+            if len(pending) >= 2 * max_workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+def merge_totals(merged, totals):
+    """
+    Adds one chunk's per-spool totals into the running totals. Chunks are merged in
+    archive order, so the sums come out the same whatever the number of workers.
+    """
+    for spool_id, total in totals.items():
+        current = merged.get(spool_id)
+        if current is None:
+            merged[spool_id] = dict(total)
+        else:
+            current["jobs"] += total["jobs"]
+            current["grams"] += total["grams"]
+            current["cost"] += total["cost"]
+    return merged
+
+def material_totals(totals):
+    """
+    Returns per-material rows (dicts with MATERIAL_FIELDS) from per-spool totals, sorted by material.
+    """
+    materials = {}
+    for spool_id in sorted(totals, key=str):
+        total = totals[spool_id]
+        row = materials.setdefault(
+            total["material"], {"material": total["material"], "spools": 0, "jobs": 0, "grams": 0.0, "cost": 0.0}
+        )
+        row["spools"] += 1
+        row["jobs"] += total["jobs"]
+        row["grams"] += total["grams"]
+        row["cost"] += total["cost"]
+    return [materials[material] for material in sorted(materials, key=str)]
+
+def recost(jobs, spools, output_path, summary_path=None, max_workers=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Re-prices a job archive against the current spools on all cores.
+
+    Per-job results are written to output_path in archive order and per-spool
+    totals to summary_path (or printed), followed by per-material totals.
+    progress, if given, is called with the number of jobs done after each chunk.
+    Returns the merged per-spool totals.
+    """
+    merged = {}
+    done = 0
+    with open_sink(output_path, JOB_FIELDS) as job_writer:
+        for rows, totals in recost_chunks(jobs, spools, max_workers, chunk_size):
+            job_writer.write_rows(rows)
+            merge_totals(merged, totals)
+            done += len(rows)
+            if progress is not None:
+                progress(done)
+    print(f"Re-costed {done} jobs. Job costs written to {output_path}")
+    write_summary(merged, summary_path)
+
+    with TableSink(MATERIAL_COLUMNS, title="\nTotals by Material:") as table:
+        table.write_rows(material_totals(merged))
+    return merged
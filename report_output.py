@@ -0,0 +1,273 @@
+# report_output.py
+
+import csv
+import json
+import math
+import os
+import sys
+import tempfile
+from collections import namedtuple
+from operator import itemgetter
+
+FORMATS = ("table", "csv", "jsonl", "parquet")
+# Rows are encoded into a buffer and written this many at a time
+BUFFER_ROWS = 4096
+# Rows per Parquet row group
+ROW_GROUP_ROWS = 65536
+# Size of the write buffer of report files
+FILE_BUFFER_SIZE = 1 << 20
+
+# One table column: the row field, its header, its width and its format spec.
+# Numbers and text with the 's' spec are right-aligned, other text left-aligned.
+Column = namedtuple("Column", ["field", "header", "width", "format"])
+
+class Sink:
+    """
+    Writes report rows (dicts) to a stream. Rows are encoded as they come and
+    written in batches of BUFFER_ROWS, so a report of any size is streamed with
+    one write call per batch rather than per row.
+
+    A sink opened on a file by open_sink writes to a temporary file next to it,
+    which replaces the file when the sink is closed. If the with block raises,
+    the temporary file is removed and a previous report is left as it was.
+    """
+
+    buffer_rows = BUFFER_ROWS
+
+    def __init__(self, stream, close_stream=False):
+        self.stream = stream
+        self.close_stream = close_stream
+        self.buffer = []
+        self.path = self.temp_path = None
+
+    def encode(self, row):
+        raise NotImplementedError
+
+    def write(self, row):
+        self.buffer.append(self.encode(row))
+        if len(self.buffer) >= self.buffer_rows:
+            self.flush()
+
+    def write_rows(self, rows):
+        buffer = self.buffer
+        encode = self.encode
+        buffer_rows = self.buffer_rows
+        for row in rows:
+            buffer.append(encode(row))
+            if len(buffer) >= buffer_rows:
+                self.flush()
+
+    def footer(self, row):
+        """
+        Writes a closing summary row, such as totals. Only tables show it; in the
+        other formats it could not be told apart from the rows.
+        """
+
+    def flush(self):
+        if self.buffer:
+            self.stream.write("\n".join(self.buffer) + "\n")
+            self.buffer.clear()
+
+    def close(self):
+        self.flush()
+        self._close_stream()
+        if self.temp_path is not None:
+            os.chmod(self.temp_path, 0o644)
+            os.replace(self.temp_path, self.path)
+            self.temp_path = None
+
+    def abort(self):
+        """
+        Closes the sink after an error without publishing the file being written.
+        """
+        # Rows still buffered are dropped rather than written after the error
+        self.buffer.clear()
+        self._close_stream()
+        if self.temp_path is not None:
+            os.remove(self.temp_path)
+            self.temp_path = None
+
+    def _close_stream(self):
+        if self.close_stream:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+class TableSink(Sink):
+    """
+    Writes rows as a fixed-width text table, with an optional title line above
+    the header and the footer below a closing rule.
+    """
+
+    def __init__(self, columns, stream=None, title=None, close_stream=False):
+        super().__init__(stream or sys.stdout, close_stream)
+        self.columns = columns
+        self.specs = [("<" if column.format == "" else ">") + str(column.width) + column.format for column in columns]
+        self.row_format = " ".join(f"{{{column.field}:{spec}}}" for column, spec in zip(columns, self.specs))
+        self.rule = "-" * (sum(column.width for column in columns) + len(columns) - 1)
+        if title is not None:
+            self.buffer.append(title)
+        self.buffer.append(" ".join(
+            format(column.header, spec[0] + str(column.width)) for column, spec in zip(columns, self.specs)
+        ).rstrip())
+        self.buffer.append(self.rule)
+
+    def encode(self, row):
+        return self.row_format.format_map(row).rstrip()
+
+    def footer(self, row):
+        self.buffer.append(self.rule)
+        self.buffer.append(" ".join(
+            format(row[column.field], spec) if column.field in row else " " * column.width
+            for column, spec in zip(self.columns, self.specs)
+        ).rstrip())
+
+class CsvSink(Sink):
+    """
+    Writes rows as CSV with a header line.
+    """
+
+    def __init__(self, stream, fields, close_stream=False):
+        super().__init__(stream, close_stream)
+        self.csv_writer = csv.writer(stream)
+        self.csv_writer.writerow(fields)
+        getter = itemgetter(*fields)
+        self.encode = getter if len(fields) > 1 else lambda row: (getter(row),)
+
+    def flush(self):
+        if self.buffer:
+            self.csv_writer.writerows(self.buffer)
+            self.buffer.clear()
+
+class JsonLinesSink(Sink):
+    """
+    Writes rows as JSON Lines, one object per row. NaN and infinite numbers, such
+    as the cost of a row that could not be priced, are written as null.
+    """
+
+    def __init__(self, stream, close_stream=False):
+        super().__init__(stream, close_stream)
+        self.json_encode = json.JSONEncoder(allow_nan=False).encode
+
+    def encode(self, row):
+        try:
+            return self.json_encode(row)
+        except ValueError:
+            # Only rows holding NaN pay for the copy
+            return self.json_encode(_finite(row))
+
+def _finite(value):
+    # Returns value with NaN and infinite floats replaced by None
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+class ParquetSink(Sink):
+    """
+    Writes rows to a Parquet file, one row group per ROW_GROUP_ROWS rows, with the
+    column types of the first row group. Needs the pyarrow package.
+    """
+
+    buffer_rows = ROW_GROUP_ROWS
+
+    def __init__(self, path, fields):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("Writing Parquet files needs the pyarrow package (pip install pyarrow).") from None
+        super().__init__(None)
+        self.file_path = path
+        self.fields = fields
+        self.pyarrow = pyarrow
+        self.parquet = pyarrow.parquet
+        self.writer = None
+        self.encode = itemgetter(*fields) if len(fields) > 1 else lambda row: (row[fields[0]],)
+
+    def flush(self):
+        if not self.buffer and self.writer is not None:
+            return
+        columns = zip(*self.buffer) if self.buffer else [()] * len(self.fields)
+        table = self.pyarrow.table(dict(zip(self.fields, map(list, columns))))
+        if self.writer is None:
+            self.writer = self.parquet.ParquetWriter(self.file_path, table.schema)
+        else:
+            table = table.cast(self.writer.schema)
+        self.writer.write_table(table)
+        self.buffer.clear()
+
+    def close(self):
+        # An empty report still gets a file with the columns
+        self.flush()
+        super().close()
+
+    def _close_stream(self):
+        if self.writer is not None:
+            self.writer.close()
+
+def sink_format(path=None, format=None):
+    """
+    Returns the format a report is written in: format if given, otherwise a table
+    on stdout, or by the extension of path (.csv, .parquet, anything else JSON Lines).
+    """
+    if format is not None:
+        return format
+    if path is None or path == "-":
+        return "table"
+    lower = path.lower()
+    if lower.endswith(".csv"):
+        return "csv"
+    if lower.endswith(".parquet"):
+        return "parquet"
+    return "jsonl"
+
+def open_sink(path, fields, format=None, columns=None, title=None):
+    """
+    Opens a sink writing rows with the given fields to path, or to stdout if path
+    is None or '-'. columns lays out the table format; by default every field is
+    a text column. Raises ValueError for an unknown format. A file is only
+    replaced once the sink is closed (see Sink).
+    """
+    format = sink_format(path, format)
+    if format not in FORMATS:
+        raise ValueError(f"Unknown report format '{format}'; use one of {', '.join(FORMATS)}.")
+    if path is None or path == "-":
+        if format == "parquet":
+            raise ValueError("Parquet reports need an output file.")
+        return _make_sink(format, sys.stdout, fields, columns, title, False)
+
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".report-", suffix=".tmp")
+    try:
+        if format == "parquet":
+            os.close(handle)
+            sink = ParquetSink(temp_path, fields)
+        else:
+            stream = os.fdopen(handle, "w", newline="", buffering=FILE_BUFFER_SIZE)
+            sink = _make_sink(format, stream, fields, columns, title, True)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    sink.path, sink.temp_path = path, temp_path
+    return sink
+
+def _make_sink(format, stream, fields, columns, title, close_stream):
+    if format == "csv":
+        return CsvSink(stream, fields, close_stream=close_stream)
+    if format == "jsonl":
+        return JsonLinesSink(stream, close_stream=close_stream)
+    if columns is None:
+        columns = [Column(field, field, max(len(field), 12), "") for field in fields]
+    return TableSink(columns, stream, title, close_stream=close_stream)
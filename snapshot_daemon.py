@@ -0,0 +1,140 @@
+# snapshot_daemon.py
+
+import datetime
+import logging
+import threading
+import time
+
+from instrumentation import count, timer
+from snapshot_store import id_sort_key, state_record
+from snapshot_utils import snapshot_record, spool_usage
+
+DEFAULT_POLL_INTERVAL = 300  # Seconds between polls of Spoolman
+
+logger = logging.getLogger("snapshot_daemon")
+
+def interval_usage(previous, current):
+    """
+    Computes usage between two in-memory states ({spool_id: snapshot record}) the way
+    compare_snapshots does. Returns (rows, total_weight_used, total_cost_used, added, removed)
+    where rows lists (spool_id, name, weight_diff, cost_used) for the spools that changed.
+    """
+    rows = []
+    total_weight_used = 0.0
+    total_cost_used = 0.0
+    for spool_id in sorted(current, key=id_sort_key):
+        spool1 = previous.get(spool_id)
+        if spool1 is None:
+            continue
+        spool2 = current[spool_id]
+        weight_diff, cost_used = spool_usage(spool1, spool2)
+        if weight_diff != 0:
+            rows.append((spool_id, spool2['filament'].get('name') or 'Unknown', weight_diff, cost_used))
+            total_weight_used += abs(weight_diff)
+            total_cost_used += cost_used
+    added = [spool_id for spool_id in current if spool_id not in previous]
+    removed = [spool_id for spool_id in previous if spool_id not in current]
+    return rows, total_weight_used, total_cost_used, added, removed
+
+class SnapshotDaemon:
+    """
+    Polls Spoolman on a fixed interval inside one long-running process.
+
+    The previous spool state is kept in memory (seeded from the latest stored
+    snapshot), a snapshot is written to the store only when something changed,
+    and the usage and cost of every interval are logged.
+    """
+
+    def __init__(self, fetch, store, interval=DEFAULT_POLL_INTERVAL, incremental=True, keyframe_interval=None, after_poll=None):
+        self.fetch = fetch
+        self.after_poll = after_poll
+        self.store = store
+        self.interval = interval
+        self.incremental = incremental
+        self.keyframe_interval = keyframe_interval
+        self.previous = self._latest_stored_state()
+        self.previous_time = None
+        self.stop_event = threading.Event()
+
+    def _latest_stored_state(self):
+        snapshots = self.store.list_snapshots()
+        if not snapshots:
+            return None
+        state = self.store.state_at(snapshots[-1][0])
+        return {spool_id: state_record(spool_id, fields) for spool_id, fields in state.items()}
+
+    def poll_once(self, now=None):
+        """
+        Fetches the current spools and stores a snapshot if anything changed, then logs
+        the usage since the previous stored state. Returns True if a snapshot was written.
+        """
+        now = now or datetime.datetime.now()
+        current = {}
+        for spool in self.fetch():
+            record = snapshot_record(spool)
+            current[record["id"]] = record
+
+        previous, previous_time = self.previous, self.previous_time
+        if previous == current:
+            self._log_usage(previous, current, previous_time, now)
+            self.previous_time = now
+            return False
+
+        options = {"incremental": self.incremental}
+        if self.keyframe_interval:
+            options["keyframe_interval"] = self.keyframe_interval
+        taken_at = self.store.append(current.values(), taken_at=now, **options)
+        # Only a stored state becomes the previous one, so a failed append is retried,
+        # and its usage is logged once, by the poll that stores it
+        if previous is not None:
+            self._log_usage(previous, current, previous_time, now)
+        self.previous, self.previous_time = current, now
+        count("snapshots_stored")
+        logger.info("Snapshot %s stored with %d spools", taken_at, len(current))
+        return True
+
+    def _log_usage(self, previous, current, previous_time, now):
+        rows, weight_used, cost_used, added, removed = interval_usage(previous, current)
+        since = f"{previous_time:%H:%M:%S}" if previous_time else "last snapshot"
+        for spool_id, name, weight_diff, spool_cost in rows:
+            logger.info("  %-10s %-30s %10.2f g %10.2f $", spool_id, name, weight_diff, spool_cost)
+        logger.info(
+            "Usage %s - %s: %d spools changed, %.2f g used, $%.2f (%d added, %d removed)",
+            since, f"{now:%H:%M:%S}", len(rows), weight_used, cost_used, len(added), len(removed),
+        )
+
+    def run(self, iterations=None):
+        """
+        Polls until stop() is called (or for a number of iterations), keeping a
+        fixed schedule regardless of how long each poll takes. Polls missed
+        because one overran are skipped, not caught up.
+        """
+        next_run = time.monotonic()
+        polls = 0
+        while not self.stop_event.is_set():
+            try:
+                with timer("poll"):
+                    self.poll_once()
+                count("polls")
+            except Exception as e:
+                # A failed poll keeps the previous state; the next one compares against it
+                logger.error("Poll failed: %s", e)
+                count("poll_errors")
+            if self.after_poll is not None:
+                try:
+                    self.after_poll()
+                except Exception as e:
+                    # E.g. the metrics file cannot be written; the daemon keeps polling
+                    logger.error("After-poll hook failed: %s", e)
+            polls += 1
+            if iterations is not None and polls >= iterations:
+                return
+            next_run += self.interval
+            now = time.monotonic()
+            if next_run < now:
+                # A poll overran: skip the missed runs instead of polling in a burst
+                next_run = now + self.interval
+            self.stop_event.wait(max(0.0, next_run - now))
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,369 @@
+# snapshot_store.py
+
+import datetime
+import json
+import re
+import sqlite3
+
+from instrumentation import timer
+
+DEFAULT_STORE_PATH = "snapshots.db"
+DEFAULT_KEYFRAME_INTERVAL = 288  # Incremental snapshots per full keyframe (one day at 5-minute intervals)
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    taken_at TEXT PRIMARY KEY,
+    spool_count INTEGER NOT NULL,
+    kind TEXT NOT NULL DEFAULT 'full'
+);
+CREATE TABLE IF NOT EXISTS spool_states (
+    taken_at TEXT NOT NULL,
+    spool_id NOT NULL,
+    price REAL,
+    initial_weight REAL,
+    remaining_weight REAL,
+    name TEXT,
+    material TEXT,
+    color_hex TEXT,
+    PRIMARY KEY (taken_at, spool_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS spool_deltas (
+    taken_at TEXT NOT NULL,
+    spool_id NOT NULL,
+    changes TEXT,
+    PRIMARY KEY (taken_at, spool_id)
+) WITHOUT ROWID;
+"""
+
+# Snapshot kinds: 'full' snapshots store every spool, 'keyframe' snapshots store
+# every spool plus a delta from the previous snapshot, and 'delta' snapshots
+# store only the delta. A delta holds the changed fields of each spool as JSON,
+# or NULL for a spool that disappeared.
+FULL, KEYFRAME, DELTA = "full", "keyframe", "delta"
+STATE_FIELDS = ("price", "initial_weight", "remaining_weight", "name", "material", "color_hex")
+
+RELATIVE_PATTERN = re.compile(r'^-?(\d+(?:\.\d+)?)\s*(s|min|h|d|w)$')
+RELATIVE_UNITS = {"s": 1, "min": 60, "h": 3600, "d": 86400, "w": 604800}
+TIMESTAMP_FORMATS = (
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d_%H-%M-%S",  # The format used in snapshot file names
+    "%Y-%m-%d",
+)
+
+def parse_time_ref(text, now=None):
+    """
+    Parses a point in time given as 'now', a relative age such as '2h', '7d' or
+    '-1w' (units s, min, h, d, w), or a local timestamp such as '2025-02-08 10:00'.
+    """
+    now = now or datetime.datetime.now()
+    text = text.strip().lower()
+    if text in ("now", "latest"):
+        return now
+
+    match = RELATIVE_PATTERN.match(text)
+    if match:
+        amount, unit = match.groups()
+        return now - datetime.timedelta(seconds=float(amount) * RELATIVE_UNITS[unit])
+
+    for timestamp_format in TIMESTAMP_FORMATS:
+        try:
+            return datetime.datetime.strptime(text.upper(), timestamp_format)
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid time '{text}'. Use 'now', a relative age like '7d', or a timestamp like '2025-02-08 10:00'.")
+
+def parse_time_range(text, now=None):
+    """
+    Parses a range given as '<start>..<end>' or as a single start such as '7d',
+    which runs until now. Returns (start, end) datetimes.
+    """
+    if ".." in text:
+        start, end = text.split("..", 1)
+        return parse_time_ref(start, now), parse_time_ref(end or "now", now)
+    return parse_time_ref(text, now), parse_time_ref("now", now)
+
+class SnapshotStore:
+    """
+    SQLite store for spool snapshots.
+
+    Each snapshot is a row in 'snapshots', and the spools it captured are rows in
+    'spool_states' keyed by (taken_at, spool_id), so a snapshot is found by an
+    indexed lookup on its timestamp rather than by scanning files. Incremental
+    snapshots store per-spool deltas in 'spool_deltas' under the same key.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(snapshots)")]
+        if "kind" not in columns:
+            # Stores created before incremental snapshots only hold full snapshots
+            with self.connection:
+                self.connection.execute("ALTER TABLE snapshots ADD COLUMN kind TEXT NOT NULL DEFAULT 'full'")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def append(self, spools, taken_at=None, incremental=False, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+        """
+        Stores the current state of all spools as a new snapshot and returns its timestamp.
+
+        By default every spool is stored, inserted as it is read so a streamed
+        iterable is never held in memory. With incremental=True only the fields
+        that changed since the previous snapshot are stored, plus a full keyframe
+        every keyframe_interval snapshots to bound reconstruction cost. An
+        incremental snapshot must be newer than the latest stored one, or
+        ValueError is raised.
+        """
+        with timer("store_write"):
+            if incremental:
+                return self._append_incremental(spools, taken_at, keyframe_interval)
+            return self._append_full(spools, (taken_at or datetime.datetime.now()).strftime(TIMESTAMP_FORMAT))
+
+    def _append_full(self, spools, taken_at):
+        counter = {"spools": 0}
+
+        def rows():
+            for spool in spools:
+                counter["spools"] += 1
+                yield (taken_at, spool.get("id")) + _spool_state(spool)
+
+        with self.connection:
+            self.connection.execute("INSERT INTO snapshots (taken_at, spool_count, kind) VALUES (?, 0, ?)", (taken_at, FULL))
+            self.connection.executemany("INSERT INTO spool_states VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows())
+            self.connection.execute(
+                "UPDATE snapshots SET spool_count = ? WHERE taken_at = ?", (counter["spools"], taken_at)
+            )
+        return taken_at
+
+    def _append_incremental(self, spools, taken_at, keyframe_interval):
+        current = {spool.get("id"): _spool_state(spool) for spool in spools}
+
+        # The delta is computed and stored in one write transaction, so a second
+        # process appending at the same time waits and diffs against this snapshot
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            taken_at = (taken_at or datetime.datetime.now()).strftime(TIMESTAMP_FORMAT)
+            previous_row = self.connection.execute(
+                "SELECT taken_at FROM snapshots ORDER BY taken_at DESC LIMIT 1"
+            ).fetchone()
+            if previous_row is None:
+                kind, delta = KEYFRAME, []
+            else:
+                if taken_at <= previous_row[0]:
+                    raise ValueError(
+                        f"Cannot store a snapshot taken at {display_time(taken_at)}: "
+                        f"it is not after the latest snapshot ({display_time(previous_row[0])})."
+                    )
+                previous = self.state_at(previous_row[0])
+                delta = list(_diff_states(previous, current))
+                since_keyframe = self.connection.execute(
+                    "SELECT COUNT(*) FROM snapshots WHERE taken_at > "
+                    "(SELECT COALESCE(MAX(taken_at), '') FROM snapshots WHERE kind != ?)",
+                    (DELTA,),
+                ).fetchone()[0]
+                kind = KEYFRAME if since_keyframe + 1 >= keyframe_interval else DELTA
+
+            self.connection.execute(
+                "INSERT INTO snapshots (taken_at, spool_count, kind) VALUES (?, ?, ?)", (taken_at, len(current), kind)
+            )
+            self.connection.executemany(
+                "INSERT INTO spool_deltas VALUES (?, ?, ?)",
+                ((taken_at, spool_id, changes) for spool_id, changes in delta),
+            )
+            if kind == KEYFRAME:
+                self.connection.executemany(
+                    "INSERT INTO spool_states VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((taken_at, spool_id) + state for spool_id, state in current.items()),
+                )
+        return taken_at
+
+    def state_at(self, taken_at, spool_ids=None):
+        """
+        Reconstructs a stored snapshot as a dict of spool ID to its STATE_FIELDS tuple.
+
+        Starts from the latest keyframe (or full snapshot) at or before taken_at and
+        replays the deltas up to it. spool_ids limits the result to those spools.
+        """
+        base_row = self.connection.execute(
+            "SELECT taken_at FROM snapshots WHERE taken_at <= ? AND kind != ? ORDER BY taken_at DESC LIMIT 1",
+            (taken_at, DELTA),
+        ).fetchone()
+        if base_row is None:
+            raise ValueError(f"No keyframe found at or before {display_time(taken_at)}.")
+        base = base_row[0]
+
+        query = (
+            "SELECT spool_id, price, initial_weight, remaining_weight, name, material, color_hex "
+            "FROM spool_states WHERE taken_at = ?"
+        )
+        params = [base]
+        if spool_ids is not None:
+            query += " AND spool_id IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(list(spool_ids)))
+        state = {row[0]: row[1:] for row in self.connection.execute(query, params)}
+
+        query = "SELECT spool_id, changes FROM spool_deltas WHERE taken_at > ? AND taken_at <= ?"
+        params = [base, taken_at]
+        if spool_ids is not None:
+            query += " AND spool_id IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(list(spool_ids)))
+        for spool_id, changes in self.connection.execute(query + " ORDER BY taken_at", params):
+            _apply_change(state, spool_id, changes)
+        return state
+
+    def iter_states(self, start=None, end=None):
+        """
+        Yields (taken_at, state) for the stored snapshots between two datetimes, oldest
+        first, in one pass: each delta snapshot is rebuilt from the previous state
+        instead of from its keyframe.
+        """
+        state = None
+        for taken_at, _, kind in self.list_snapshots(start, end, with_kind=True):
+            if state is None or kind != DELTA:
+                state = self.state_at(taken_at)
+            else:
+                state = dict(state)
+                rows = self.connection.execute(
+                    "SELECT spool_id, changes FROM spool_deltas WHERE taken_at = ?", (taken_at,)
+                )
+                for spool_id, changes in rows:
+                    _apply_change(state, spool_id, changes)
+            yield taken_at, state
+
+    def changed_spools(self, taken_at1, taken_at2):
+        """
+        Returns the IDs of spools that changed between two snapshots using only the
+        deltas stored between them, or None if a full snapshot without a delta lies
+        in between and the two states have to be compared in full. The snapshots
+        may be given in either order.
+        """
+        taken_at1, taken_at2 = min(taken_at1, taken_at2), max(taken_at1, taken_at2)
+        kinds = self.connection.execute(
+            "SELECT DISTINCT kind FROM snapshots WHERE taken_at > ? AND taken_at <= ?", (taken_at1, taken_at2)
+        ).fetchall()
+        if (FULL,) in kinds:
+            return None
+        rows = self.connection.execute(
+            "SELECT DISTINCT spool_id FROM spool_deltas WHERE taken_at > ? AND taken_at <= ?", (taken_at1, taken_at2)
+        )
+        return [row[0] for row in rows]
+
+    def list_snapshots(self, start=None, end=None, with_kind=False):
+        """
+        Returns (taken_at, spool_count) for the snapshots between two datetimes, oldest first.
+        With with_kind, the snapshot kind is added as a third element.
+        """
+        columns = "taken_at, spool_count, kind" if with_kind else "taken_at, spool_count"
+        query = f"SELECT {columns} FROM snapshots WHERE taken_at >= ? AND taken_at <= ? ORDER BY taken_at"
+        low = start.strftime(TIMESTAMP_FORMAT) if start else ""
+        high = end.strftime(TIMESTAMP_FORMAT) if end else "9999"
+        return self.connection.execute(query, (low, high)).fetchall()
+
+    def resolve(self, when, fallback_to_first=False):
+        """
+        Returns the timestamp of the latest snapshot taken at or before a datetime.
+
+        With fallback_to_first, a time before the first snapshot resolves to the
+        first snapshot instead of raising.
+        """
+        row = self.connection.execute(
+            "SELECT taken_at FROM snapshots WHERE taken_at <= ? ORDER BY taken_at DESC LIMIT 1",
+            (when.strftime(TIMESTAMP_FORMAT),),
+        ).fetchone()
+        if row is None and fallback_to_first:
+            row = self.connection.execute("SELECT taken_at FROM snapshots ORDER BY taken_at LIMIT 1").fetchone()
+        if row is None:
+            raise ValueError(f"No snapshot found at or before {when:%Y-%m-%d %H:%M:%S}.")
+        return row[0]
+
+    def load(self, taken_at, spool_ids=None):
+        """
+        Yields the spools of one snapshot, ordered by ID, in the snapshot file record format.
+        spool_ids limits the result to those spools.
+        """
+        state = self.state_at(taken_at, spool_ids)
+        for spool_id in sorted(state, key=id_sort_key):
+            yield state_record(spool_id, state[spool_id])
+
+def _spool_state(spool):
+    filament = spool["filament"]
+    return (
+        spool.get("price"),
+        spool.get("initial_weight"),
+        spool.get("remaining_weight"),
+        filament.get("name"),
+        filament.get("material"),
+        filament.get("color_hex"),
+    )
+
+def state_record(spool_id, state):
+    """
+    Converts a STATE_FIELDS tuple back to the snapshot file record format.
+    """
+    price, initial_weight, remaining_weight, name, material, color_hex = state
+    return {
+        "id": spool_id,
+        "price": price,
+        "initial_weight": initial_weight,
+        "remaining_weight": remaining_weight,
+        "filament": {
+            "name": name,
+            "material": material,
+            "color_hex": color_hex,
+        },
+    }
+
+def _diff_states(previous, current):
+    # Yields (spool_id, changes) with changes as JSON of the changed fields, or None if removed
+    for spool_id, state in current.items():
+        old_state = previous.get(spool_id)
+        if old_state is None:
+            yield spool_id, json.dumps(dict(zip(STATE_FIELDS, state)))
+        elif old_state != state:
+            changed = {field: new for field, old, new in zip(STATE_FIELDS, old_state, state) if old != new}
+            yield spool_id, json.dumps(changed)
+    for spool_id in previous.keys() - current.keys():
+        yield spool_id, None
+
+def _apply_change(state, spool_id, changes):
+    if changes is None:
+        state.pop(spool_id, None)
+        return
+    fields = dict(zip(STATE_FIELDS, state.get(spool_id, (None,) * len(STATE_FIELDS))))
+    fields.update(json.loads(changes))
+    state[spool_id] = tuple(fields[field] for field in STATE_FIELDS)
+
+def id_sort_key(spool_id):
+    """
+    Sort key that keeps numeric spool IDs in numeric order even if some IDs are
+    strings. Namespaced IDs such as 'farm1:12' sort by instance, then numerically.
+    """
+    if not isinstance(spool_id, str):
+        return (0, "", spool_id)
+    if spool_id.isdecimal():
+        # IDs read from CSV files are strings of digits
+        return (0, "", int(spool_id))
+    instance, _, local_id = spool_id.rpartition(":")
+    if instance and local_id.isdigit():
+        return (1, instance, int(local_id))
+    return (2, spool_id, 0)
+
+def display_time(taken_at):
+    """
+    Formats a stored snapshot timestamp for display, e.g. '2025-02-08 10:00:00'.
+    """
+    return datetime.datetime.strptime(taken_at, TIMESTAMP_FORMAT).strftime("%Y-%m-%d %H:%M:%S")
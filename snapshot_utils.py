@@ -1,95 +1,491 @@
 # snapshot_utils.py
 import json
 import datetime
+import gzip
+import io
+import itertools
+import os
+import tempfile
 
-def save_snapshot(spools):
-    """
-    Saves the current state of all spools to a file named snapshot_<timestamp>.json.
+from binary_snapshot import (
+    BINARY_EXTENSION,
+    BinarySnapshot,
+    binary_comparison_pairs,
+    is_binary_snapshot,
+    iter_binary_records,
+    write_binary_snapshot,
+)
+from instrumentation import timer
+from report_output import Column, open_sink
+from snapshot_store import display_time, id_sort_key, parse_time_range, parse_time_ref
+
+# Compression of JSON snapshot files -> extension; zstd needs the zstandard package
+COMPRESSIONS = {"gzip": ".json.gz", "zstd": ".json.zst"}
+SNAPSHOT_EXTENSIONS = (".json", BINARY_EXTENSION) + tuple(COMPRESSIONS.values())
+FILE_TIMESTAMP_FORMAT = "%Y-%m-%d_%H-%M-%S"
+
+COMPARE_FIELDS = ["spool_id", "name", "weight_diff", "cost_used", "status"]
+COMPARE_COLUMNS = [
+    Column("spool_id", "Spool ID", 10, ""),
+    Column("name", "Name", 30, ""),
+    Column("weight_diff", "Weight Diff (g)", 15, ".2f"),
+    Column("cost_used", "Cost Used($)", 12, ".2f"),
+    Column("status", "Status", 7, ""),
+]
+
+def save_snapshot(spools, binary=False, directory=None, compression=None):
     """
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"snapshot_{timestamp}.json"
+    Saves the current state of all spools to a file named snapshot_<timestamp>.json
+    in directory (default: SNAPSHOT_DIR, or the current directory), or
+    snapshot_<timestamp>.spsnap in the binary format if binary is set. compression
+    ('gzip' or 'zstd') compresses a JSON snapshot. Returns the path written.
 
-    snapshot_data = []
-    for spool in spools:
-        snapshot_data.append({
-            "id": spool.get("id"),
-            "price": spool.get("price"),
-            "initial_weight": spool.get("initial_weight"), 
-            "remaining_weight": spool.get("remaining_weight"),
-            "filament": {
-                "name": spool["filament"].get("name"),
-                "material": spool["filament"].get("material"),
-                "color_hex": spool["filament"].get("color_hex"),
-            },
-        })
+    The file is written under a temporary name and only appears under its own
+    name once complete, so a crash never leaves a truncated snapshot. Runs that
+    start within the same second each get their own file (snapshot_<timestamp>_1.json,
+    ...) without waiting for one another.
+    """
+    if binary and compression:
+        raise ValueError("Binary snapshots cannot be compressed; they are read through a memory map.")
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression '{compression}'. Use one of: {', '.join(COMPRESSIONS)}.")
+    directory = directory or os.getenv("SNAPSHOT_DIR") or "."
+    os.makedirs(directory, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime(FILE_TIMESTAMP_FORMAT)
+    extension = BINARY_EXTENSION if binary else COMPRESSIONS.get(compression, ".json")
+    records = (snapshot_record(spool) for spool in spools)
 
-    with open(filename, "w") as snapshot_file:
-        json.dump(snapshot_data, snapshot_file, indent=2)
+    with timer("snapshot_write"):
+        filename = write_snapshot_file(records, os.path.join(directory, f"snapshot_{timestamp}{extension}"), exclusive=True)
 
     print(f"Snapshot saved to {filename}")
+    return filename
+
+
+def write_snapshot_file(records, path, exclusive=False):
+    """
+    Writes snapshot records to path atomically, in the format its extension names
+    (.spsnap, .json.gz, .json.zst or JSON), and returns the path written.
+
+    The records go to a temporary file in the same directory, which is flushed to
+    disk and then renamed to path. With exclusive=True an existing file is never
+    replaced: the first free name of path, path_1, path_2, ... is taken instead.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-", suffix=".tmp")
+    try:
+        try:
+            if is_binary_snapshot(path):
+                write_binary_snapshot(records, temp_path)
+            else:
+                with open_snapshot(temp_path, "w", _snapshot_extension(path)) as snapshot_file:
+                    write_snapshot_json(records, snapshot_file)
+            os.fsync(handle)
+            os.chmod(temp_path, 0o644)
+        finally:
+            os.close(handle)
+        path = _publish(temp_path, path, exclusive)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    _fsync_directory(directory)
+    return path
+
+
+def _publish(temp_path, path, exclusive):
+    # Moves a finished temporary file to path, or to the first free numbered name
+    if not exclusive:
+        os.replace(temp_path, path)
+        return path
+    extension = _snapshot_extension(path)
+    base = path[:len(path) - len(extension)]
+    for attempt in itertools.count():
+        candidate = path if attempt == 0 else f"{base}_{attempt}{extension}"
+        try:
+            # A hard link claims the name only if it is free, and never shows a partial file
+            os.link(temp_path, candidate)
+        except FileExistsError:
+            continue
+        except OSError:
+            # File systems without hard links: reserve the name, then replace it
+            try:
+                os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            except FileExistsError:
+                continue
+            os.replace(temp_path, candidate)
+            return candidate
+        os.remove(temp_path)
+        return candidate
+
+
+def _fsync_directory(directory):
+    # Makes a rename durable; not possible (nor needed) on every platform
+    try:
+        handle = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(handle)
+    except OSError:
+        pass
+    finally:
+        os.close(handle)
+
+
+def _snapshot_extension(path):
+    lower = path.lower()
+    for extension in sorted(SNAPSHOT_EXTENSIONS, key=len, reverse=True):
+        if lower.endswith(extension):
+            return path[len(path) - len(extension):]
+    return os.path.splitext(path)[1]
+
+
+def open_snapshot(path, mode="r", extension=None):
+    """
+    Opens a JSON snapshot file as text for reading ('r') or writing ('w'),
+    decompressing or compressing it if its extension is .json.gz or .json.zst.
+    extension overrides the extension of path.
+    """
+    extension = (extension or _snapshot_extension(path)).lower()
+    if extension == COMPRESSIONS["gzip"]:
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if extension == COMPRESSIONS["zstd"]:
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd snapshots need the zstandard package (pip install zstandard).") from None
+        raw = open(path, mode + "b")
+        if mode == "w":
+            stream = zstandard.ZstdCompressor().stream_writer(raw)
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, mode)
+
+
+def snapshot_record(spool):
+    """
+    Returns the part of a Spoolman spool that is kept in snapshots.
+    """
+    return {
+        "id": spool.get("id"),
+        "price": spool.get("price"),
+        "initial_weight": spool.get("initial_weight"), 
+        "remaining_weight": spool.get("remaining_weight"),
+        "filament": {
+            "name": spool["filament"].get("name"),
+            "material": spool["filament"].get("material"),
+            "color_hex": spool["filament"].get("color_hex"),
+        },
+    }
 
 
-def compare_snapshots(snapshot1_path, snapshot2_path, show_zero_diff=False):
+def write_snapshot_json(records, snapshot_file):
     """
-    Compares two snapshot files and prints the differences in remaining_weight (grams) 
-    and the approximate usage cost. By default, it only shows spools that changed. 
-    Set 'show_zero_diff=True' to list all spools, even those with no changes.
+    Writes snapshot records to an open file as a JSON array and returns how many were written.
+
+    Records are written one at a time so a streamed iterable never has to be held
+    in memory; the output matches json.dump(..., indent=2).
+    """
+    snapshot_file.write("[")
+    written = 0
+    for record in records:
+        snapshot_file.write(",\n  " if written else "\n  ")
+        snapshot_file.write(json.dumps(record, indent=2).replace("\n", "\n  "))
+        written += 1
+    snapshot_file.write("\n]" if written else "]")
+    return written
+
+
+def load_snapshot_records(path):
+    """
+    Yields the records of a snapshot file, reading the JSON or binary format by extension.
+    """
+    if is_binary_snapshot(path):
+        return iter_binary_records(path)
+    return iter_snapshot_records(path)
+
+
+def convert_snapshot(source_path, target_path):
+    """
+    Converts a snapshot file between the JSON and binary formats, choosing each
+    format by its extension. Returns the number of spools converted.
+    """
+    counter = {"spools": 0}
+
+    def records():
+        for record in load_snapshot_records(source_path):
+            counter["spools"] += 1
+            yield record
+
+    write_snapshot_file(records(), target_path)
+    return counter["spools"]
+
+
+def is_snapshot_file(ref):
+    """
+    Tells whether a --compare argument names a snapshot file rather than a point in time.
+    """
+    return ref.lower().endswith(SNAPSHOT_EXTENSIONS) or os.path.isfile(ref)
+
+
+def stored_comparison_rows(store, refs, show_zero_diff=False):
+    """
+    Compares two snapshots from a SnapshotStore. refs is either one range such as
+    '7d' or '2025-02-01..2025-02-08', or two points in time such as ['1d', 'now'].
+    Each point resolves to the latest snapshot taken at or before it.
+
+    Returns (label1, label2, rows) with labels naming the two snapshots and rows
+    an iterator of comparison rows, as comparison_rows yields them.
     """
-    with open(snapshot1_path, 'r') as f1:
-        snapshot1_data = json.load(f1)
-    with open(snapshot2_path, 'r') as f2:
-        snapshot2_data = json.load(f2)
+    if len(refs) == 1:
+        start, end = parse_time_range(refs[0])
+    else:
+        start, end = parse_time_ref(refs[0]), parse_time_ref(refs[1])
+
+    taken_at1 = store.resolve(start, fallback_to_first=True)
+    taken_at2 = store.resolve(end)
+    # With incremental snapshots only the spools touched by the deltas in
+    # between need to be reconstructed on either side
+    changed = None if show_zero_diff else store.changed_spools(taken_at1, taken_at2)
+    pairs = comparison_pairs(store.load(taken_at1, changed), store.load(taken_at2, changed))
+    return (
+        f"snapshot {display_time(taken_at1)}",
+        f"snapshot {display_time(taken_at2)}",
+        comparison_rows(pairs, show_zero_diff),
+    )
+
+
+def compare_stored_snapshots(store, refs, show_zero_diff=False, output=None, format=None):
+    """
+    Compares two snapshots from a SnapshotStore (see stored_comparison_rows) and
+    writes the comparison to output in format (see open_comparison).
+    """
+    label1, label2, rows = stored_comparison_rows(store, refs, show_zero_diff)
+    _write_comparison(rows, label1, label2, output, format)
+
 
+def file_comparison_rows(snapshot1_path, snapshot2_path, show_zero_diff=False, stream=False):
+    """
+    Yields the comparison rows of two snapshot files. Binary snapshots (.spsnap)
+    are compared column-wise on their memory maps. With stream=True, JSON files
+    are merge-joined with bounded memory (see compare_snapshots_streaming).
+    """
+    if stream:
+        pairs = _merge_join(
+            _check_sorted(load_snapshot_records(snapshot1_path), snapshot1_path),
+            _check_sorted(load_snapshot_records(snapshot2_path), snapshot2_path),
+        )
+        yield from comparison_rows(pairs, show_zero_diff)
+    elif is_binary_snapshot(snapshot1_path) and is_binary_snapshot(snapshot2_path):
+        with BinarySnapshot(snapshot1_path) as snapshot1, BinarySnapshot(snapshot2_path) as snapshot2:
+            yield from comparison_rows(binary_comparison_pairs(snapshot1, snapshot2, show_zero_diff), show_zero_diff)
+    else:
+        pairs = comparison_pairs(_load_snapshot(snapshot1_path), _load_snapshot(snapshot2_path))
+        yield from comparison_rows(pairs, show_zero_diff)
+
+
+def compare_snapshots(snapshot1_path, snapshot2_path, show_zero_diff=False, output=None, format=None):
+    """
+    Compares two snapshot files and writes the differences in remaining_weight (grams)
+    and the approximate usage cost to output in format (see open_comparison). By default,
+    it only shows spools that changed. Set 'show_zero_diff=True' to list all spools,
+    even those with no changes.
+    """
+    rows = file_comparison_rows(snapshot1_path, snapshot2_path, show_zero_diff)
+    _write_comparison(rows, snapshot1_path, snapshot2_path, output, format)
+
+
+def _load_snapshot(path):
+    if is_binary_snapshot(path):
+        return list(iter_binary_records(path))
+    with open_snapshot(path) as snapshot_file:
+        return json.load(snapshot_file)
+
+
+def comparison_pairs(snapshot1_data, snapshot2_data):
+    """
+    Matches the spool records of two snapshots by ID and returns (spool_id, spool1,
+    spool2) pairs, with None for a spool missing on one side.
+    """
     # Convert snapshots to dicts keyed by spool ID
     snapshot1_dict = {item['id']: item for item in snapshot1_data}
     snapshot2_dict = {item['id']: item for item in snapshot2_data}
 
-    print(f"\nComparing {snapshot1_path} and {snapshot2_path}...\n")
-    print(f"{'Spool ID':<10} {'Name':<30} {'Weight Diff (g)':>15} {'Cost Used($)':>12}")
-    print("-" * 70)
-
-    total_weight_used = 0.0
-    total_cost_used = 0.0
-
-    # Gather results, then print them
-    results = []
-
-    # For each spool in snapshot2 (the 'end' state), compare to snapshot1 (the 'start' state)
-    for spool_id, spool2 in snapshot2_dict.items():
-        spool1 = snapshot1_dict.get(spool_id)
-        if spool1:
-            name = spool2['filament'].get('name', 'Unknown')
-            rem_weight_1 = spool1.get('remaining_weight', 0.0)
-            rem_weight_2 = spool2.get('remaining_weight', 0.0)
-            weight_diff = rem_weight_1 - rem_weight_2
-
-            if weight_diff != 0:
-                spool_price = spool1.get('price', 0.0)
-                spool_initial_weight = spool1.get('initial_weight', 1000.0)
-                cost_used = 0.0
-                if spool_initial_weight > 0:
-                    # Approximate usage cost proportionally to used weight
-                    cost_used = spool_price * (abs(weight_diff) / spool_initial_weight)
-                results.append((spool_id, name, weight_diff, cost_used))
-
-                total_weight_used += abs(weight_diff)
-                total_cost_used += cost_used
-            else:
-                # If 'show_zero_diff' is True, also include spools with weight_diff = 0
-                if show_zero_diff:
-                    results.append((spool_id, name, 0.0, 0.0))
+    # For each spool in snapshot2 (the 'end' state), compare to snapshot1 (the 'start' state),
+    # then list the spools that are gone from snapshot2
+    pairs = [(spool_id, snapshot1_dict.get(spool_id), spool2) for spool_id, spool2 in snapshot2_dict.items()]
+    pairs.extend(
+        (spool_id, spool1, None) for spool_id, spool1 in snapshot1_dict.items() if spool_id not in snapshot2_dict
+    )
+    return pairs
+
+
+def print_comparison(snapshot1_data, snapshot2_data, label1, label2, show_zero_diff=False):
+    """
+    Prints the differences between two snapshots given as iterables of spool records
+    (as stored in snapshot files). label1 and label2 name the snapshots in the header.
+    """
+    rows = comparison_rows(comparison_pairs(snapshot1_data, snapshot2_data), show_zero_diff)
+    _write_comparison(rows, label1, label2)
+
+
+def compare_snapshots_streaming(snapshot1_path, snapshot2_path, show_zero_diff=False, output=None, format=None):
+    """
+    Compares two snapshot files like compare_snapshots, but with bounded memory.
+
+    Both files are parsed incrementally and merge-joined on spool ID, so they must
+    be sorted by ID (snapshots taken from the API are). Rows are written as soon
+    as they are matched; a ValueError is raised if a file turns out not to be sorted.
+    """
+    rows = file_comparison_rows(snapshot1_path, snapshot2_path, show_zero_diff, stream=True)
+    _write_comparison(rows, snapshot1_path, snapshot2_path, output, format)
+
+
+def iter_snapshot_records(path, chunk_size=1 << 16):
+    """
+    Yields the spool records of a JSON snapshot file one at a time, reading it in
+    chunks instead of loading the whole array.
+    """
+    decoder = json.JSONDecoder()
+    with open_snapshot(path) as snapshot_file:
+        buffer = snapshot_file.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} is not a JSON snapshot array.")
+        position = 1
+        eof = False
+        while True:
+            # Skip whitespace and the comma between records
+            while True:
+                while position < len(buffer) and buffer[position] in " \t\r\n,":
+                    position += 1
+                if position < len(buffer) or eof:
+                    break
+                buffer, position = snapshot_file.read(chunk_size), 0
+                eof = not buffer
+
+            if position >= len(buffer):
+                raise ValueError(f"{path} ends before the snapshot array is closed.")
+            if buffer[position] == "]":
+                return
+
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # The record is cut off at the end of the buffer, read more
+                chunk = snapshot_file.read(chunk_size)
+                eof = not chunk
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            yield record
+            position = end
+
+
+def _check_sorted(records, path):
+    previous_key = None
+    for record in records:
+        key = id_sort_key(record['id'])
+        if previous_key is not None and key <= previous_key:
+            raise ValueError(f"{path} is not sorted by spool ID; use the regular comparison instead.")
+        previous_key = key
+        yield record
+
+
+def _merge_join(records1, records2):
+    # Yields (spool_id, spool1, spool2) for two record streams sorted by ID, with None for a missing side
+    spool1 = next(records1, None)
+    spool2 = next(records2, None)
+    while spool1 is not None or spool2 is not None:
+        key1 = id_sort_key(spool1['id']) if spool1 is not None else None
+        key2 = id_sort_key(spool2['id']) if spool2 is not None else None
+        if spool2 is None or (spool1 is not None and key1 < key2):
+            yield spool1['id'], spool1, None
+            spool1 = next(records1, None)
+        elif spool1 is None or key2 < key1:
+            yield spool2['id'], None, spool2
+            spool2 = next(records2, None)
         else:
-            # This spool wasn't in snapshot1—could print or ignore
-            if show_zero_diff:
-                name2 = spool2['filament'].get('name', 'Unknown')
-                results.append((spool_id, name2, 0.0, 0.0))
+            yield spool2['id'], spool1, spool2
+            spool1 = next(records1, None)
+            spool2 = next(records2, None)
+
+
+def spool_usage(spool1, spool2):
+    """
+    Returns (weight_diff, cost_used) for one spool between a start and an end record.
+    The cost is approximated proportionally to the used weight.
+    """
+    rem_weight_1 = spool1.get('remaining_weight', 0.0)
+    rem_weight_2 = spool2.get('remaining_weight', 0.0)
+    weight_diff = rem_weight_1 - rem_weight_2
+
+    cost_used = 0.0
+    if weight_diff != 0:
+        spool_price = spool1.get('price', 0.0)
+        spool_initial_weight = spool1.get('initial_weight', 1000.0)
+        if spool_initial_weight > 0:
+            # Approximate usage cost proportionally to used weight
+            cost_used = spool_price * (abs(weight_diff) / spool_initial_weight)
+    return weight_diff, cost_used
+
+
+def comparison_rows(pairs, show_zero_diff=False):
+    """
+    Yields a comparison row (a dict with COMPARE_FIELDS) for each reported spool of
+    (spool_id, spool1, spool2) pairs: spools whose remaining weight changed, spools
+    only on one side (status 'added' or 'removed'), and with show_zero_diff all others.
+    """
+    for spool_id, spool1, spool2 in pairs:
+        if spool1 is None or spool2 is None:
+            # Spools that only exist on one side are always reported
+            spool = spool2 if spool1 is None else spool1
+            yield {
+                "spool_id": spool_id,
+                "name": spool['filament'].get('name', 'Unknown'),
+                "weight_diff": 0.0,
+                "cost_used": 0.0,
+                "status": "added" if spool1 is None else "removed",
+            }
+            continue
+
+        weight_diff, cost_used = spool_usage(spool1, spool2)
+        if weight_diff != 0 or show_zero_diff:
+            yield {
+                "spool_id": spool_id,
+                "name": spool2['filament'].get('name', 'Unknown'),
+                "weight_diff": weight_diff,
+                "cost_used": cost_used,
+                "status": "",
+            }
+
+
+def open_comparison(label1, label2, path=None, format=None):
+    """
+    Opens the sink a comparison of two snapshots is written to: a table on stdout
+    by default, otherwise a file (see report_output.open_sink).
+    """
+    return open_sink(path, COMPARE_FIELDS, format, COMPARE_COLUMNS, f"\nComparing {label1} and {label2}...\n")
+
+
+def write_comparison(rows, sink):
+    """
+    Writes comparison rows to a sink, followed by the total weight used and its cost.
+    """
+    totals = {"spool_id": "TOTAL", "weight_diff": 0.0, "cost_used": 0.0}
+
+    def counted(rows):
+        for row in rows:
+            totals["weight_diff"] += abs(row["weight_diff"])
+            totals["cost_used"] += row["cost_used"]
+            yield row
 
-    # Optionally, sort results by spool_id or weight diff
-    # results.sort(key=lambda x: x[0])  # by spool_id
+    sink.write_rows(counted(rows))
+    sink.footer(totals)
 
-    for spool_id, name, weight_diff, cost_used in results:
-        print(f"{spool_id:<10} {name:<30} {weight_diff:>15.2f} {cost_used:>12.2f}")
 
-    # Print a final summary line
-    print("-" * 70)
-    print(f"{'TOTAL':<10} {'':<30} {total_weight_used:>15.2f} {total_cost_used:>12.2f}")
\ No newline at end of file
+def _write_comparison(rows, label1, label2, output=None, format=None):
+    with open_comparison(label1, label2, output, format) as sink:
+        write_comparison(rows, sink)
@@ -0,0 +1,223 @@
+# spool_cache.py
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: entries are written without a lock
+    fcntl = None
+
+from filament_calculations import page_repeats
+from instrumentation import count, timer
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "spoolman-cost")
+DEFAULT_CACHE_TTL = 300  # Seconds a cached spool list is served without asking Spoolman
+
+class CacheMissError(Exception):
+    """
+    Raised when offline mode is requested but nothing has been cached yet.
+    """
+
+class SpoolCache:
+    """
+    On-disk cache of the spool list, one JSON spool per line plus a metadata file.
+
+    Within the TTL spools are served straight from disk. After that each page is
+    revalidated with If-None-Match/If-Modified-Since, so pages the server answers
+    with 304 Not Modified are copied from the previous cache instead of downloaded.
+
+    The data and metadata files of an entry are replaced together under an
+    exclusive lock and read together under a shared one, so concurrent runs never
+    pair one run's page validators with another run's spools.
+    """
+
+    def __init__(self, directory=None, ttl=DEFAULT_CACHE_TTL):
+        self.directory = directory or DEFAULT_CACHE_DIR
+        self.ttl = ttl
+
+    @classmethod
+    def from_env(cls):
+        """
+        Creates a cache configured from SPOOLMAN_CACHE_DIR and SPOOLMAN_CACHE_TTL.
+        """
+        ttl = os.getenv("SPOOLMAN_CACHE_TTL")
+        return cls(
+            directory=os.getenv("SPOOLMAN_CACHE_DIR"),
+            ttl=float(ttl) if ttl else DEFAULT_CACHE_TTL,
+        )
+
+    def _paths(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        base = os.path.join(self.directory, f"spools_{digest}")
+        return f"{base}.jsonl", f"{base}.meta.json"
+
+    @contextmanager
+    def _lock(self, key, exclusive=False):
+        data_path, _ = self._paths(key)
+        try:
+            lock_file = open(os.path.splitext(data_path)[0] + ".lock", "a")
+        except FileNotFoundError:
+            # No cache directory yet, so nothing to read or replace concurrently
+            yield
+            return
+        with lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def read_meta(self, key):
+        """
+        Returns the metadata of the cached entry for a key, or None if there is none.
+        """
+        data_path, meta_path = self._paths(key)
+        if not os.path.exists(data_path):
+            return None
+        try:
+            with open(meta_path, "r") as meta_file:
+                return json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+
+    def _open_entry(self, key):
+        # Returns (metadata, open data file) of the cached entry, or (None, None)
+        data_path, _ = self._paths(key)
+        with self._lock(key):
+            meta = self.read_meta(key)
+            if meta is None:
+                return None, None
+            try:
+                return meta, open(data_path, "r")
+            except OSError:
+                return None, None
+
+    def iter_cached(self, key):
+        """
+        Yields the cached spools for a key without contacting the server.
+        """
+        meta, data_file = self._open_entry(key)
+        if meta is None:
+            raise CacheMissError("No cached spool data available for offline use.")
+        with data_file:
+            for line in data_file:
+                yield json.loads(line)
+
+    def iter_spools(self, key, fetch_page, page_size, keep=None, offline=False):
+        """
+        Yields spools for a key, from disk when fresh and from the server otherwise.
+
+        fetch_page(offset, headers) must return the response for one page of
+        page_size spools; keep(spool) decides which spools are cached and yielded.
+        """
+        if offline:
+            yield from self.iter_cached(key)
+            return
+
+        meta, data_file = self._open_entry(key)
+        if meta is not None and time.time() - meta.get("fetched_at", 0) < self.ttl:
+            count("cache_hits")
+            with data_file:
+                for line in data_file:
+                    yield json.loads(line)
+            return
+
+        yield from self._revalidate(key, meta, data_file, fetch_page, page_size, keep)
+
+    def _revalidate(self, key, meta, data_file, fetch_page, page_size, keep):
+        data_path, meta_path = self._paths(key)
+        old_pages = meta["pages"] if meta is not None and meta.get("page_size") == page_size else []
+        old_file = data_file
+        if old_file is not None and not old_pages:
+            old_file.close()
+            old_file = None
+        os.makedirs(self.directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        new_pages = []
+        complete = False
+        try:
+            with os.fdopen(fd, "w") as new_file:
+                offset = 0
+                last_id = None
+                while True:
+                    old_page = old_pages[len(new_pages)] if len(new_pages) < len(old_pages) else None
+                    response = fetch_page(offset, _conditional_headers(old_page))
+                    if response.status_code == 304 and old_page is None:
+                        # Nothing cached to reuse for this page: ask again unconditionally
+                        response = fetch_page(offset, {})
+                        if response.status_code == 304:
+                            raise Exception(f"Failed to fetch spools: 304 Not Modified for uncached offset {offset}")
+
+                    if response.status_code == 304:
+                        count("pages_not_modified")
+                        # Unchanged page: copy it over from the previous cache file
+                        for _ in range(old_page["stored"]):
+                            line = old_file.readline()
+                            new_file.write(line)
+                            spool = json.loads(line)
+                            last_id = spool.get("id", last_id)
+                            yield spool
+                        new_pages.append(old_page)
+                        page_length = old_page["count"]
+                    else:
+                        if old_page is not None:
+                            for _ in range(old_page["stored"]):
+                                old_file.readline()
+                        with timer("decode"):
+                            page = response.json()
+                        if page_repeats(page, last_id):
+                            # The server ignores limit/offset and has exactly page_size spools
+                            break
+                        if page:
+                            last_id = page[-1].get("id", last_id)
+                        stored = 0
+                        for spool in page:
+                            if keep is None or keep(spool):
+                                new_file.write(json.dumps(spool) + "\n")
+                                stored += 1
+                                yield spool
+                        new_pages.append({
+                            "count": len(page),
+                            "stored": stored,
+                            "etag": response.headers.get("ETag"),
+                            "last_modified": response.headers.get("Last-Modified"),
+                        })
+                        page_length = len(page)
+
+                    if page_length != page_size:
+                        break
+                    offset += page_size
+            complete = True
+        finally:
+            if old_file is not None:
+                old_file.close()
+            if complete:
+                with self._lock(key, exclusive=True):
+                    os.replace(tmp_path, data_path)
+                    _write_json_atomic(meta_path, {
+                        "key": key,
+                        "fetched_at": time.time(),
+                        "page_size": page_size,
+                        "pages": new_pages,
+                    })
+            else:
+                os.remove(tmp_path)
+
+def _conditional_headers(page):
+    headers = {}
+    if page is not None:
+        if page.get("etag"):
+            headers["If-None-Match"] = page["etag"]
+        if page.get("last_modified"):
+            headers["If-Modified-Since"] = page["last_modified"]
+    return headers
+
+def _write_json_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as tmp_file:
+        json.dump(data, tmp_file)
+    os.replace(tmp_path, path)
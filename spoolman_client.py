@@ -0,0 +1,109 @@
+# spoolman_client.py
+
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_TIMEOUT = (5.0, 30.0)  # (connect, read) timeouts in seconds
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+DEFAULT_POOL_SIZE = 10
+
+# Shared clients keyed by API URL so every fetch path reuses one pooled session
+_clients = {}
+_clients_lock = threading.Lock()
+
+class SpoolmanClient:
+    """
+    HTTP client for the Spoolman API backed by a pooled, keep-alive requests.Session.
+
+    Connections are reused across calls, failed GETs are retried with exponential
+    backoff, and the API key (if any) is sent as a bearer token on every request.
+    """
+
+    def __init__(
+        self,
+        base_url,
+        api_key=None,
+        timeout=DEFAULT_TIMEOUT,
+        retries=DEFAULT_RETRIES,
+        backoff_factor=DEFAULT_BACKOFF_FACTOR,
+        pool_size=DEFAULT_POOL_SIZE,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update(build_headers(api_key))
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_env(cls, base_url):
+        """
+        Creates a client configured from SPOOLMAN_API_KEY, SPOOLMAN_TIMEOUT and SPOOLMAN_RETRIES.
+        """
+        timeout = os.getenv("SPOOLMAN_TIMEOUT")
+        retries = os.getenv("SPOOLMAN_RETRIES")
+        return cls(
+            base_url,
+            api_key=os.getenv("SPOOLMAN_API_KEY"),
+            timeout=float(timeout) if timeout else DEFAULT_TIMEOUT,
+            retries=int(retries) if retries else DEFAULT_RETRIES,
+        )
+
+    def get(self, path, params=None, headers=None):
+        """
+        Sends a GET request for a path relative to the API URL and returns the response.
+        """
+        return self.session.get(f"{self.base_url}{path}", params=params, headers=headers, timeout=self.timeout)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def build_headers(api_key=None):
+    """
+    Builds the default request headers, adding a bearer token when an API key is set.
+    """
+    headers = {"Content-Type": "application/json"}
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    return headers
+
+def get_client(base_url):
+    """
+    Returns the shared client for an API URL, creating it from the environment on first use.
+    """
+    key = base_url.rstrip("/")
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = SpoolmanClient.from_env(key)
+        return client
+
+def close_clients():
+    """
+    Closes and forgets all shared clients.
+    """
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
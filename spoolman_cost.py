@@ -0,0 +1,63 @@
+# spoolman_cost.py
+
+# The stable API for using the calculator from other programs. Everything named
+# in __all__ keeps its signature across releases; the modules it comes from are
+# free to change. None of these functions print or prompt, and none keep state
+# between calls beyond the objects they return, so they can be used from
+# threads and servers.
+#
+#     from spoolman_cost import fetch_spools, instances_from_env, price_batch
+#
+#     result = price_batch(jobs, fetch_spools(instances_from_env()))
+#     for job in result.jobs:
+#         print(job.job_id, job.cost, job.error)
+
+from batch import BatchResult, Job, JobCost, add_totals, cost_jobs, price_batch, price_job, read_jobs
+from cost_index import CostIndex, SpoolCosts
+from filament_calculations import (
+    CostResult,
+    UsageResult,
+    calculate_cost,
+    calculate_costs,
+    calculate_mass_per_meter,
+    calculate_masses_per_meter,
+    parse_filament_input,
+    parse_filament_inputs,
+    parse_usage,
+)
+from forecast import DepletionForecast
+from pricing import PricingEngine, Scenario, ScenarioResult
+from snapshot_store import SnapshotStore
+from spoolman_instances import fetch_spools, instances_from_env
+
+__all__ = [
+    # Costing
+    "calculate_cost",
+    "calculate_costs",
+    "calculate_mass_per_meter",
+    "calculate_masses_per_meter",
+    "CostResult",
+    "parse_filament_input",
+    "parse_usage",
+    "parse_filament_inputs",
+    "UsageResult",
+    "CostIndex",
+    "SpoolCosts",
+    # Batch pricing
+    "read_jobs",
+    "Job",
+    "price_job",
+    "cost_jobs",
+    "add_totals",
+    "price_batch",
+    "JobCost",
+    "BatchResult",
+    "PricingEngine",
+    "Scenario",
+    "ScenarioResult",
+    # Spoolman and snapshots
+    "fetch_spools",
+    "instances_from_env",
+    "SnapshotStore",
+    "DepletionForecast",
+]
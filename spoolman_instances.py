@@ -0,0 +1,78 @@
+# spoolman_instances.py
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from filament_calculations import get_spools, iter_spools
+
+DEFAULT_API_URL = "http://localhost:7912/api/v1"
+DEFAULT_MAX_WORKERS = 8  # Spoolman instances fetched at the same time
+
+def parse_instances(value):
+    """
+    Parses a comma-separated list of Spoolman API URLs into (name, url) pairs.
+
+    Each entry is either 'name=url' or a bare URL, which is named after its
+    host (and port), e.g. 'farm1=http://10.0.0.5:7912/api/v1, http://farm2:7912/api/v1'.
+    """
+    instances = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, separator, url = entry.partition("=")
+        if not separator or "://" in name:
+            url = entry
+            name = urlparse(url).netloc or url
+        instances.append((name.strip(), url.strip()))
+
+    names = [name for name, _ in instances]
+    if len(set(names)) != len(names):
+        raise ValueError("Spoolman instance names must be unique; name them as 'name=url'.")
+    return instances
+
+def instances_from_env():
+    """
+    Returns the configured Spoolman instances: SPOOLMAN_API_URLS if set, otherwise
+    the single SPOOLMAN_API_URL (or the default local URL).
+    """
+    urls = os.getenv("SPOOLMAN_API_URLS")
+    if urls:
+        return parse_instances(urls)
+    url = os.getenv("SPOOLMAN_API_URL", DEFAULT_API_URL)
+    return [(urlparse(url).netloc or url, url)]
+
+def namespaced_id(instance, spool_id):
+    """
+    Returns the ID of a spool from one of several instances, e.g. 'farm1:12'.
+    """
+    return f"{instance}:{spool_id}"
+
+def fetch_spools(instances, cache=None, offline=False, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Yields the active spools of every configured Spoolman instance.
+
+    A single instance is streamed page by page exactly like iter_spools. Several
+    instances are fetched concurrently on a bounded thread pool, so the total wait
+    is that of the slowest instance, and their spools are merged with IDs
+    namespaced per instance ('farm1:12') and an 'instance' field. Instances are
+    yielded in name order, each sorted by spool ID.
+    """
+    if len(instances) == 1:
+        _, url = instances[0]
+        yield from iter_spools(url, cache=cache, offline=offline)
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(instances))) as executor:
+        futures = {
+            name: executor.submit(get_spools, url, cache=cache, offline=offline)
+            for name, url in instances
+        }
+        for name in sorted(futures):
+            try:
+                spools = futures[name].result()
+            except Exception as e:
+                raise Exception(f"Spoolman instance '{name}': {e}") from e
+            for spool in spools:
+                yield dict(spool, id=namespaced_id(name, spool['id']), instance=name)
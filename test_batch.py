@@ -0,0 +1,89 @@
+# test_batch.py
+
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from batch import EMPTY_JOB_ERROR, Job, batch_costs, cost_jobs, price_job, read_jobs
+from cost_index import CostIndex
+
+SPOOLS = [
+    {'id': 1, 'filament': {'name': 'PLA Red', 'material': 'PLA', 'diameter': 1.75, 'density': 1.24}, 'price': 20.0, 'initial_weight': 1000},
+    {'id': 2, 'filament': {'name': 'PETG Black', 'material': 'PETG'}, 'price': 30.0, 'initial_weight': 1000},
+]
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_read_csv_groups_consecutive_rows(self):
+        with open(self.path('jobs.csv'), 'w') as f:
+            f.write("job_id,spool_id,usage\na,1,100g\na,2,2m\nb,1,50\n")
+        jobs = list(read_jobs(self.path('jobs.csv')))
+        self.assertEqual(jobs, [Job('a', [('1', '100g'), ('2', '2m')]), Job('b', [('1', '50')])])
+
+    def test_read_jobs_reports_malformed_lines(self):
+        with open(self.path('jobs.csv'), 'w') as f:
+            f.write("job_id,spool_id,usage\na,1,100g\nb,1\nb,2,5g\nc,1,50\n")
+        jobs = list(read_jobs(self.path('jobs.csv')))
+        self.assertEqual([(job.job_id, job.items) for job in jobs], [('a', [('1', '100g')]), ('b', []), ('c', [('1', '50')])])
+        self.assertTrue(jobs[1].error.startswith("Line 3:"))
+
+        with open(self.path('jobs.jsonl'), 'w') as f:
+            f.write('{"job_id": "a", "spools": [{"spool_id": 1, "usage": "100g"}]}\n')
+            f.write('{"job_id": "b", "spools": [{"spool_id": 1}]}\n')
+            f.write('{"job_id": "c", "spools": [\n')
+            f.write('[1, 2]\n')
+            f.write('{"job_id": "e", "spools": [{"spool_id": 2, "usage": "5g"}]}\n')
+        jobs = list(read_jobs(self.path('jobs.jsonl')))
+        self.assertEqual([job.job_id for job in jobs], ['a', 'b', '3', '4', 'e'])
+        self.assertEqual([bool(job.error) for job in jobs], [False, True, True, True, False])
+        self.assertEqual(jobs[1].error, "Line 2: invalid job (missing 'usage').")
+        self.assertTrue(jobs[2].error.startswith("Line 3: invalid job ("))
+
+    def test_price_job_converts_meters(self):
+        lines = price_job([('1', '100g'), ('2', '1m')], CostIndex(SPOOLS))
+        self.assertAlmostEqual(lines[0][2], 2.0)
+        self.assertAlmostEqual(lines[1][1], 2.9825, places=4)  # 1 m of 1.75 mm PLA-density filament
+
+    def test_price_job_extended_units(self):
+        lines = price_job([('1', '1m+0,5kg')], CostIndex(SPOOLS))
+        self.assertAlmostEqual(lines[0][1], 502.9825, places=4)
+
+    def test_job_without_spools_is_an_error(self):
+        jobs = list(cost_jobs([Job('empty', []), Job('a', [('1', '10g')])], CostIndex(SPOOLS)))
+        self.assertEqual((jobs[0].cost, jobs[0].error), (0.0, EMPTY_JOB_ERROR))
+        self.assertEqual(jobs[1].error, "")
+
+    def test_batch_costs_writes_jobs_and_summary(self):
+        with open(self.path('jobs.jsonl'), 'w') as f:
+            f.write(json.dumps({'job_id': 'a', 'spools': [{'spool_id': 1, 'usage': '100g'}]}) + "\n")
+            f.write(json.dumps({'job_id': 'b', 'spools': [{'spool_id': 9, 'usage': '1g'}]}) + "\n")
+            f.write(json.dumps({'job_id': 'c', 'spools': [{'spool_id': 1, 'usage': '50g'}, {'spool_id': 2, 'usage': '10g'}]}) + "\n")
+
+        batch_costs(self.path('jobs.jsonl'), iter(SPOOLS), summary_path=self.path('summary.csv'))
+
+        with open(self.path('jobs_costs.jsonl')) as f:
+            results = [json.loads(line) for line in f]
+        self.assertEqual([r['job_id'] for r in results], ['a', 'b', 'c'])
+        self.assertAlmostEqual(results[0]['cost'], 2.0)
+        self.assertIn('Unknown spool ID 9', results[1]['error'])
+        self.assertAlmostEqual(results[2]['cost'], 1.3)
+
+        with open(self.path('summary.csv')) as f:
+            summary = list(csv.DictReader(f))
+        self.assertEqual([row['spool_id'] for row in summary], ['1', '2'])
+        self.assertAlmostEqual(float(summary[0]['grams']), 150.0)
+        self.assertEqual(summary[0]['jobs'], '2')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+# test_benchmark.py
+
+import os
+import tempfile
+import unittest
+
+from benchmark import FakeSpoolman, run_benchmarks, scenarios, synthetic_spool, synthetic_spools
+from filament_calculations import get_spools
+from spoolman_client import SpoolmanClient
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_synthetic_spools_are_deterministic(self):
+        spools = list(synthetic_spools(5, seed=3))
+        self.assertEqual([spool["id"] for spool in spools], [1, 2, 3, 4, 5])
+        self.assertEqual(spools[2], synthetic_spool(3, seed=3))
+        self.assertNotEqual(spools[2], synthetic_spool(3, seed=4))
+        self.assertLessEqual(spools[0]["remaining_weight"], spools[0]["initial_weight"])
+
+    def test_fake_spoolman_paginates(self):
+        with FakeSpoolman(1234) as fake, SpoolmanClient(fake.url, retries=0) as client:
+            spools = get_spools(fake.url, page_size=500, client=client)
+        self.assertEqual(len(spools), 1234)
+        self.assertEqual(spools[-1], synthetic_spool(1234))
+        self.assertEqual(fake.requests, 3)
+
+    def test_run_benchmarks(self):
+        only = ["fetch", "compare_streaming", "batch_costing"]
+        document = run_benchmarks([50], only=only, report=lambda line: None)
+        self.assertEqual([result["scenario"] for result in document["results"]], only)
+        for result in document["results"]:
+            self.assertEqual(result["size"], 50)
+            self.assertGreater(result["seconds"], 0)
+            self.assertGreater(result["peak_memory_bytes"], 0)
+
+    def test_only_selected_fixtures_are_written(self):
+        with tempfile.TemporaryDirectory() as directory:
+            selected = scenarios(20, directory, "http://localhost:1/api/v1", only=["compare_binary", "parse_filament_inputs"])
+            self.assertEqual([name for name, _, _ in selected], ["parse_filament_inputs", "compare_binary"])
+            self.assertEqual(sorted(os.listdir(directory)), ["spools_20.spsnap", "used_20.spsnap"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+# test_binary_snapshot.py
+
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from contextlib import redirect_stdout
+from binary_snapshot import BinarySnapshot, binary_comparison_pairs, write_binary_snapshot
+from snapshot_utils import compare_snapshots, convert_snapshot, load_snapshot_records
+from test_helpers import spool as snapshot_spool
+
+def spool(spool_id, remaining_weight, **fields):
+    # Without a color, so missing strings round-trip through the binary format too
+    return snapshot_spool(spool_id, remaining_weight, color_hex=None, **fields)
+
+class TestBinarySnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_round_trip_through_json(self):
+        records = [spool(1, 900.0, name="Grün PLA"), spool(2, 450.5, price=None), spool(3, 0.0)]
+        with open(self.path("a.json"), "w") as f:
+            json.dump(records, f)
+
+        self.assertEqual(convert_snapshot(self.path("a.json"), self.path("a.spsnap")), 3)
+        self.assertEqual(list(load_snapshot_records(self.path("a.spsnap"))), records)
+
+        convert_snapshot(self.path("a.spsnap"), self.path("b.json"))
+        with open(self.path("b.json")) as f:
+            self.assertEqual(json.load(f), records)
+
+    def test_namespaced_ids(self):
+        before = [spool("farm1:2", 500.0), spool("farm2:2", 800.0)]
+        after = [spool("farm1:2", 450.0), spool("farm2:2", 800.0), spool("farm2:3", 1000.0)]
+        write_binary_snapshot(before, self.path("a.spsnap"))
+        write_binary_snapshot(after, self.path("b.spsnap"))
+        self.assertEqual(list(load_snapshot_records(self.path("b.spsnap"))), after)
+
+        with BinarySnapshot(self.path("a.spsnap")) as snapshot1, BinarySnapshot(self.path("b.spsnap")) as snapshot2:
+            pairs = [(spool_id, spool1 is not None, spool2 is not None)
+                     for spool_id, spool1, spool2 in binary_comparison_pairs(snapshot1, snapshot2)]
+        self.assertEqual(pairs, [("farm1:2", True, True), ("farm2:3", False, True)])
+
+        with self.assertRaises(ValueError):
+            write_binary_snapshot([spool("farm1:abc", 1.0)], self.path("c.spsnap"))
+
+    def test_columns_are_memory_mapped(self):
+        write_binary_snapshot([spool(5, 100.0), spool(7, 200.0)], self.path("a.spsnap"))
+        with BinarySnapshot(self.path("a.spsnap")) as snapshot:
+            self.assertEqual(snapshot.ids.tolist(), [5, 7])
+            self.assertFalse(snapshot.columns["remaining_weight"].flags.owndata)
+            self.assertEqual(snapshot.columns["remaining_weight"].tolist(), [100.0, 200.0])
+
+    def test_binary_comparison_matches_json(self):
+        before = [spool(1, 900.0), spool(2, 500.0), spool(4, 300.0)]
+        after = [spool(4, 250.0), spool(1, 700.0), spool(3, 1000.0)]
+        write_binary_snapshot(before, self.path("a.spsnap"))
+        write_binary_snapshot(after, self.path("b.spsnap"))
+
+        with BinarySnapshot(self.path("a.spsnap")) as snapshot1, BinarySnapshot(self.path("b.spsnap")) as snapshot2:
+            pairs = [(spool_id, spool1 is not None, spool2 is not None)
+                     for spool_id, spool1, spool2 in binary_comparison_pairs(snapshot1, snapshot2)]
+        self.assertEqual(pairs, [(1, True, True), (2, True, False), (3, False, True), (4, True, True)])
+
+        with open(self.path("a.json"), "w") as f:
+            json.dump(before, f)
+        with open(self.path("b.json"), "w") as f:
+            json.dump(after, f)
+        binary_output, json_output = io.StringIO(), io.StringIO()
+        with redirect_stdout(binary_output):
+            compare_snapshots(self.path("a.spsnap"), self.path("b.spsnap"))
+        with redirect_stdout(json_output):
+            compare_snapshots(self.path("a.json"), self.path("b.json"))
+        self.assertEqual(
+            sorted(binary_output.getvalue().splitlines()[3:]),
+            sorted(json_output.getvalue().splitlines()[3:]),
+        )
+
+if __name__ == '__main__':
+    unittest.main()
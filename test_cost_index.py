@@ -0,0 +1,45 @@
+# test_cost_index.py
+
+import unittest
+
+from cost_index import CostIndex
+from filament_calculations import calculate_cost, calculate_mass_per_meter
+from test_helpers import spool
+
+class TestCostIndex(unittest.TestCase):
+
+    def test_records_match_calculations(self):
+        index = CostIndex([spool(1, 800.0, price=23.5, initial_weight=750.0, diameter=2.85, density=1.27)])
+        record = index["1"]
+        self.assertEqual(record.cost(123.4), calculate_cost(123.4, 750.0, 23.5))
+        self.assertEqual(record.grams(2.0, 'm'), 2.0 * calculate_mass_per_meter(2.85, 1.27))
+        self.assertEqual(record.grams(2.0, 'g'), 2.0)
+        self.assertEqual(record.remaining_grams, 800.0)
+        self.assertIs(index.get(1), record)
+
+    def test_defaults_and_errors(self):
+        index = CostIndex([spool(1, 800.0, initial_weight=0), spool(2, 800.0)])
+        self.assertEqual(index["2"].grams(1.0, 'm'), calculate_mass_per_meter(1.75, 1.24))
+        with self.assertRaises(ValueError):
+            index["1"].cost(10.0)
+        with self.assertRaises(ValueError):
+            index["2"].cost(-1.0)
+        with self.assertRaises(ValueError):
+            index["3"]
+
+    def test_update_rebuilds_only_changed_spools(self):
+        index = CostIndex([spool(1, 800.0), spool(2, 800.0), spool(3, 800.0)])
+        unchanged = index["1"]
+        changed = index.update([spool(1, 800.0), spool(2, 800.0, price=25.0), spool(4, 800.0)])
+        self.assertEqual(changed, 3)  # spool 2 rebuilt, spool 4 added, spool 3 removed
+        self.assertIs(index["1"], unchanged)
+        self.assertEqual(index["2"].price, 25.0)
+        self.assertNotIn("3", index)
+        self.assertEqual(index.update([spool(1, 800.0)], complete=False), 0)
+        self.assertEqual(len(index), 3)
+        # The color is kept on the record for substitution checks, so it is rebuilt too
+        self.assertEqual(index.update([spool(1, 800.0, color_hex="000000")], complete=False), 1)
+        self.assertEqual(index["1"].color_hex, "000000")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,12 +3,19 @@
 import math
 import unittest
 
-from unittest.mock import patch
+import numpy as np
+
+from unittest.mock import MagicMock, patch
 from filament_calculations import (
     calculate_cost,
+    calculate_costs,
     calculate_mass_per_meter,
+    calculate_masses_per_meter,
     get_spools,
+    iter_spools,
     parse_filament_input,
+    parse_filament_inputs,
+    parse_usage,
 )
 
 class TestFilamentCalculations(unittest.TestCase):
@@ -27,6 +34,32 @@ class TestFilamentCalculations(unittest.TestCase):
         with self.assertRaises(ValueError):
             calculate_cost(-50, 1000, 30)
 
+        # Arrays go to calculate_costs
+        with self.assertRaises(TypeError):
+            calculate_cost(np.array([50.0, 10.0]), 1000, 30)
+        with self.assertRaises(TypeError):
+            calculate_mass_per_meter([1.75], 1.24)
+        self.assertEqual(calculate_cost(50.0, 1000.0, 30.0), float(calculate_costs(50.0, 1000.0, 30.0).costs[0]))
+
+    def test_calculate_costs_reports_bad_rows(self):
+        used = np.array([50.0, 10.0, -5.0, 20.0])
+        weight = np.array([1000.0, 0.0, 1000.0, 500.0])
+        price = np.array([30.0, 30.0, 30.0, 10.0])
+        costs, errors = calculate_costs(used, weight, price)
+
+        self.assertAlmostEqual(costs[0], 1.5)
+        self.assertAlmostEqual(costs[3], 0.4)
+        self.assertTrue(np.isnan(costs[1]) and np.isnan(costs[2]))
+        self.assertEqual([index for index, _ in errors], [1, 2])
+        self.assertIn('zero', errors[0][1])
+        self.assertIn('negative', errors[1][1])
+
+    def test_calculate_masses_per_meter(self):
+        masses = calculate_masses_per_meter(np.array([1.75, 0.0, 2.85]), np.array([1.24, 1.24, 1.27]))
+        for mass, (diameter_mm, density) in zip(masses, [(1.75, 1.24), (1.75, 1.24), (2.85, 1.27)]):
+            self.assertAlmostEqual(mass, calculate_mass_per_meter(diameter_mm, density))
+        self.assertAlmostEqual(masses[0], math.pi * ((1.75 / 10 / 2) ** 2) * 1.24 * 100)
+
     def test_calculate_mass_per_meter(self):
         # Test with standard PLA values
         diameter_mm = 1.75
@@ -70,17 +103,88 @@ class TestFilamentCalculations(unittest.TestCase):
         with self.assertRaises(ValueError):
             parse_filament_input('100kg')
 
-    @patch('filament_calculations.requests.get')
-    def test_get_spools(self, mock_get):
-        mock_response = mock_get.return_value
+    def test_parse_usage(self):
+        self.assertEqual(parse_usage('100'), (100.0, 0.0))
+        self.assertEqual(parse_usage('1,5kg'), (1500.0, 0.0))
+        self.assertEqual(parse_usage('12.3m + 4g'), (4.0, 12.3))
+        self.assertEqual(parse_usage('250mm+50cm'), (0.0, 0.75))
+        self.assertAlmostEqual(parse_usage('10ft')[1], 3.048)
+        self.assertEqual(parse_usage(100), (100.0, 0.0))
+        self.assertEqual(parse_usage(12.5), (12.5, 0.0))
+        for text in ('', 'abc', '1.2.3m', '5lb', '1g+', None, -5, float('nan'), True, ['100g']):
+            with self.assertRaises(ValueError):
+                parse_usage(text)
+
+    def test_parse_filament_inputs_reports_bad_rows(self):
+        grams, meters, errors = parse_filament_inputs(['100g', 'abc', '2m+1g', '100g', None])
+        np.testing.assert_array_equal(grams[[0, 2, 3]], [100.0, 1.0, 100.0])
+        np.testing.assert_array_equal(meters[[0, 2, 3]], [0.0, 2.0, 0.0])
+        self.assertTrue(np.isnan(grams[1]) and np.isnan(meters[4]))
+        self.assertEqual([index for index, _ in errors], [1, 4])
+        self.assertIn("'abc'", errors[0][1])
+
+        # Unhashable rows are reported like any other bad row, and True is not read as 1
+        grams, meters, errors = parse_filament_inputs([1, True, ['100g'], {'g': 1}, '5g'])
+        np.testing.assert_array_equal(grams[[0, 4]], [1.0, 5.0])
+        self.assertEqual([index for index, _ in errors], [1, 2, 3])
+
+    def test_get_spools(self):
+        mock_client = MagicMock()
+        mock_response = mock_client.get.return_value
         mock_response.status_code = 200
         mock_response.json.return_value = [
             {'id': 1, 'filament': {'name': 'PLA Red', 'material': 'PLA', 'color_hex': 'ff0000'}, 'price': 16.49, 'initial_weight': 1000, 'remaining_weight': 912.13, 'archived': False},
             {'id': 2, 'filament': {'name': 'PLA White', 'material': 'PLA', 'color_hex': 'ffffff'}, 'price': 10.99, 'initial_weight': 1000, 'remaining_weight': 440.00, 'archived': False}
         ]
-        spools = get_spools("http://localhost:7912/api/v1")
+        spools = get_spools("http://localhost:7912/api/v1", client=mock_client)
         self.assertEqual(len(spools), 2)
         self.assertEqual(spools[0]['filament']['name'], 'PLA Red')
 
+    def test_iter_spools_paginates(self):
+        mock_client = MagicMock()
+        page1 = MagicMock()
+        page1.status_code = 200
+        page1.json.return_value = [
+            {'id': 1, 'filament': {'name': 'PLA Red'}, 'archived': False},
+            {'id': 2, 'filament': {'name': 'PLA Old'}, 'archived': True},
+        ]
+        page2 = MagicMock()
+        page2.status_code = 200
+        page2.json.return_value = [
+            {'id': 3, 'filament': {'name': 'PETG Black'}},
+        ]
+        mock_client.get.side_effect = [page1, page2]
+
+        spools = list(iter_spools("http://localhost:7912/api/v1", page_size=2, client=mock_client))
+
+        # Archived spools are dropped even if the server returns them
+        self.assertEqual([spool['id'] for spool in spools], [1, 3])
+        self.assertEqual(mock_client.get.call_count, 2)
+        first_params = mock_client.get.call_args_list[0].kwargs['params']
+        second_params = mock_client.get.call_args_list[1].kwargs['params']
+        self.assertEqual(first_params['allow_archived'], 'false')
+        self.assertEqual((first_params['limit'], first_params['offset']), (2, 0))
+        self.assertEqual((second_params['limit'], second_params['offset']), (2, 2))
+
+    def test_iter_spools_stops_when_server_ignores_offset(self):
+        mock_client = MagicMock()
+        page = MagicMock()
+        page.status_code = 200
+        page.json.return_value = [{'id': 1, 'filament': {'name': 'PLA Red'}}, {'id': 2, 'filament': {'name': 'PLA Blue'}}]
+        mock_client.get.return_value = page
+
+        spools = list(iter_spools("http://localhost:7912/api/v1", page_size=2, client=mock_client))
+
+        self.assertEqual([spool['id'] for spool in spools], [1, 2])
+        self.assertEqual(mock_client.get.call_count, 2)
+
+    def test_iter_spools_from_cache_creates_no_client(self):
+        cache = MagicMock()
+        cache.iter_spools.return_value = iter([{'id': 1}])
+        with patch('spoolman_client.get_client') as get_client:
+            spools = list(iter_spools("http://localhost:7912/api/v1", cache=cache, offline=True))
+        self.assertEqual(spools, [{'id': 1}])
+        get_client.assert_not_called()
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
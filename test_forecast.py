@@ -0,0 +1,116 @@
+# test_forecast.py
+
+import contextlib
+import datetime
+import io
+import unittest
+
+from forecast import DepletionForecast, print_forecast
+from snapshot_store import SnapshotStore
+from test_helpers import spool
+
+START = datetime.datetime(2025, 2, 1)
+
+class TestDepletionForecast(unittest.TestCase):
+
+    def setUp(self):
+        self.store = SnapshotStore(":memory:")
+
+    def tearDown(self):
+        self.store.close()
+
+    def append(self, day, spools, incremental=False):
+        self.store.append(spools, taken_at=START + datetime.timedelta(days=day), incremental=incremental)
+
+    def history(self, incremental=False):
+        # Spool 1 uses 100 g a day, spool 2 20 g a day, spool 3 (PETG) nothing
+        for day in range(4):
+            self.append(day, [spool(1, 1000.0 - 100 * day), spool(2, 900.0 - 20 * day), spool(3, 500.0, "PETG")],
+                        incremental=incremental)
+
+    def test_update_is_incremental(self):
+        forecast = DepletionForecast(self.store)
+        self.history()
+        self.assertEqual(forecast.update(), 4)
+        self.assertEqual(forecast.update(), 0)
+        self.append(4, [spool(1, 600.0), spool(2, 820.0), spool(3, 500.0, "PETG")])
+        self.assertEqual(forecast.update(), 1)
+
+    def test_half_life_is_kept(self):
+        self.history()
+        self.assertEqual(DepletionForecast(self.store, half_life_days=7).update(), 4)
+        # Later updates without a half-life keep the model instead of rebuilding it
+        self.append(4, [spool(1, 600.0), spool(2, 820.0), spool(3, 500.0, "PETG")])
+        forecast = DepletionForecast(self.store)
+        self.assertEqual(forecast.half_life, 7 * 86400)
+        self.assertEqual(forecast.update(), 1)
+        self.assertEqual(DepletionForecast(self.store, half_life_days=7).update(), 0)
+
+    def test_running_out(self):
+        self.history()
+        forecast = DepletionForecast(self.store)
+        forecast.update()
+        now = START + datetime.timedelta(days=3)
+        spools = forecast.running_out(within_days=7, now=now)
+        self.assertEqual([row["spool_id"] for row in spools], [1])
+        self.assertAlmostEqual(spools[0]["grams_per_day"], 100.0)
+        self.assertAlmostEqual(spools[0]["days_left"], 7.0)
+        self.assertEqual(spools[0]["empty_at"], now + datetime.timedelta(days=7))
+        self.assertEqual(spools[0]["reorder_cost"], 20.0)
+        self.assertEqual(forecast.running_out(within_days=6, now=now), [])
+
+    def test_idle_time_lowers_the_rate(self):
+        self.history()
+        forecast = DepletionForecast(self.store)
+        forecast.update()
+        later = forecast.running_out(within_days=100, now=START + datetime.timedelta(days=20))
+        self.assertLess(later[0]["grams_per_day"], 100.0)
+        self.assertGreater(later[0]["days_left"], 7.0)
+
+    def test_refill_is_not_usage(self):
+        self.history()
+        self.append(4, [spool(1, 1000.0), spool(2, 820.0), spool(3, 500.0, "PETG")])
+        forecast = DepletionForecast(self.store)
+        forecast.update()
+        rows = forecast.running_out(within_days=1000, now=START + datetime.timedelta(days=4))
+        self.assertLess(rows[-1]["grams_per_day"], 100.0)
+
+    def test_material_forecast(self):
+        self.history()
+        forecast = DepletionForecast(self.store)
+        forecast.update()
+        rows = forecast.material_forecast(within_days=7, now=START + datetime.timedelta(days=3))
+        self.assertEqual([row["material"] for row in rows], ["PETG", "PLA"])
+        petg, pla = rows
+        self.assertEqual((petg["spools"], petg["grams_per_day"], petg["days_left"], petg["reorders"]), (1, 0.0, None, 0))
+        self.assertEqual(pla["spools"], 2)
+        self.assertAlmostEqual(pla["remaining_grams"], 1540.0)
+        self.assertAlmostEqual(pla["grams_per_day"], 120.0)
+        self.assertEqual((pla["reorders"], pla["reorder_cost"]), (1, 20.0))
+
+    def test_print_forecast(self):
+        self.history()
+        forecast = DepletionForecast(self.store)
+        forecast.update()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            print_forecast(forecast, within_days=7, now=START + datetime.timedelta(days=3))
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], "Spools running out within 7 days:")
+        self.assertTrue(lines[3].startswith("1            Spool 1"))
+        self.assertEqual(lines[-1].split(), ["Total", "reorder", "cost:", "20.00"])
+        self.assertIn("PETG", lines[-4])
+        self.assertEqual(lines[-4].split()[4], "-")
+
+    def test_incremental_store_matches_full(self):
+        self.history(incremental=True)
+        self.append(4, [spool(1, 600.0), spool(3, 500.0, "PETG")], incremental=True)
+        forecast = DepletionForecast(self.store)
+        forecast.update()
+        now = START + datetime.timedelta(days=4)
+        rows = forecast.material_forecast(within_days=7, now=now)
+        self.assertEqual([(row["material"], row["spools"]) for row in rows], [("PETG", 1), ("PLA", 1)])
+        self.assertAlmostEqual(forecast.running_out(within_days=7, now=now)[0]["grams_per_day"], 100.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+# test_gcode_import.py
+
+import os
+import tempfile
+import unittest
+
+import gcode_import
+from batch import run_batch
+from cost_index import CostIndex
+from gcode_import import gcode_jobs, gcode_paths, parse_tool_map, read_gcode_usage
+
+PRUSA_FOOTER = """; filament used [mm] = 1234.56, 0.00, 500.00
+; filament used [cm3] = 2.97, 0.00, 1.20
+; filament used [g] = 3.68, 0.00, 1.49
+; total filament used [g] = 5.17
+"""
+CURA_HEADER = """;FLAVOR:Marlin
+;TIME:1234
+;Filament used: 1.5m, 0.25m
+;Layer height: 0.2
+"""
+SPOOLS = CostIndex([
+    {"id": 12, "price": 20.0, "initial_weight": 1000.0, "filament": {"diameter": 1.75, "density": 1.24}},
+    {"id": 7, "price": 30.0, "initial_weight": 1000.0, "filament": {"diameter": 1.75, "density": 1.24}},
+])
+
+class TestGcodeImport(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as gcode_file:
+            gcode_file.write(text)
+        return path
+
+    def test_prusa_footer_prefers_grams(self):
+        path = self.write("part.gcode", "G1 X0 Y0\n" * 100 + PRUSA_FOOTER + "; prusaslicer_config = begin\n")
+        self.assertEqual(read_gcode_usage(path), {0: (3.68, "g"), 2: (1.49, "g")})
+
+    def test_millimeters_become_meters(self):
+        path = self.write("part.gcode", "; filament used [mm] = 1500.0\n")
+        self.assertEqual(read_gcode_usage(path), {0: (1.5, "m")})
+
+    def test_cura_header_outside_tail(self):
+        original = gcode_import.TAIL_SIZE
+        gcode_import.TAIL_SIZE = 1024
+        try:
+            path = self.write("part.gcode", CURA_HEADER + "G1 X1 Y1 E0.1\n" * 1000)
+            self.assertEqual(read_gcode_usage(path), {0: (1.5, "m"), 1: (0.25, "m")})
+        finally:
+            gcode_import.TAIL_SIZE = original
+
+    def test_missing_metadata(self):
+        with self.assertRaises(ValueError):
+            read_gcode_usage(self.write("plain.gcode", "G28\nG1 X10\n"))
+        with self.assertRaises(ValueError):
+            read_gcode_usage(self.write("empty.gcode", ""))
+
+    def test_parse_tool_map(self):
+        self.assertEqual(parse_tool_map("0=12, T1=7"), {0: "12", 1: "7"})
+        with self.assertRaises(ValueError):
+            parse_tool_map(" , ")
+        with self.assertRaises(ValueError):
+            parse_tool_map("red=12")
+
+    def test_price_directory(self):
+        self.write("a.gcode", "; filament used [g] = 100.0, 50.0\n")
+        self.write("b.gcode", "; filament used [g] = 0.0, 0.0, 10.0\n")
+        self.write("notes.txt", "not G-code")
+        paths = gcode_paths(self.directory.name)
+        self.assertEqual([os.path.basename(path) for path in paths], ["a.gcode", "b.gcode"])
+
+        results = []
+        totals = run_batch(gcode_jobs(paths, {0: "12", 1: "7"}, max_workers=2), SPOOLS, results.append)
+        self.assertEqual(results[0]["job_id"], "a.gcode")
+        self.assertAlmostEqual(results[0]["cost"], 2.0 + 1.5)
+        self.assertIn("T2", results[1]["error"])
+        self.assertEqual(totals["7"]["grams"], 50.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,16 @@
+# test_helpers.py
+
+# Shared fixtures for the snapshot, store, report, forecast and cost index tests
+
+def spool(spool_id, remaining_weight, material="PLA", name=None, price=20.0, color_hex="ffffff", initial_weight=1000.0, **filament):
+    """
+    Returns a spool record as stored in snapshots, by default of a 1000 g spool.
+    Extra keyword arguments such as diameter or density go into the filament.
+    """
+    return {
+        "id": spool_id,
+        "price": price,
+        "initial_weight": initial_weight,
+        "remaining_weight": remaining_weight,
+        "filament": dict({"name": name or f"Spool {spool_id}", "material": material, "color_hex": color_hex}, **filament),
+    }
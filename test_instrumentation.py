@@ -0,0 +1,54 @@
+# test_instrumentation.py
+
+import os
+import tempfile
+import time
+import unittest
+
+from instrumentation import Metrics, format_breakdown, write_prometheus_textfile
+
+class TestMetrics(unittest.TestCase):
+
+    def test_disabled_metrics_record_nothing(self):
+        metrics = Metrics()
+        with metrics.timer("fetch"):
+            metrics.count("pages_fetched")
+        self.assertEqual(metrics.timers, {})
+        self.assertEqual(metrics.counters, {})
+
+    def test_nested_timers_split_own_time(self):
+        metrics = Metrics()
+        metrics.enable()
+        with metrics.timer("snapshot_write"):
+            time.sleep(0.01)
+            for _ in range(2):
+                with metrics.timer("fetch"):
+                    time.sleep(0.01)
+        metrics.count("pages_fetched", 2)
+
+        calls, total, own = metrics.timers["snapshot_write"]
+        fetch_calls, fetch_total, fetch_own = metrics.timers["fetch"]
+        self.assertEqual((calls, fetch_calls), (1, 2))
+        self.assertAlmostEqual(own, total - fetch_total, places=6)
+        self.assertEqual(fetch_own, fetch_total)
+        self.assertEqual(metrics.counters, {"pages_fetched": 2})
+        self.assertTrue(any(line.startswith("fetch") for line in format_breakdown(metrics)))
+
+    def test_prometheus_textfile(self):
+        metrics = Metrics()
+        metrics.enable()
+        with metrics.timer("decode"):
+            pass
+        metrics.count("spools_fetched", 42)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "spoolman.prom")
+            write_prometheus_textfile(path, metrics)
+            with open(path) as metrics_file:
+                text = metrics_file.read()
+            self.assertEqual(os.listdir(directory), ["spoolman.prom"])
+        self.assertIn('spoolman_cost_phase_calls_total{phase="decode"} 1\n', text)
+        self.assertIn('spoolman_cost_events_total{event="spools_fetched"} 42\n', text)
+        self.assertIn("# TYPE spoolman_cost_phase_seconds_total counter\n", text)
+
+if __name__ == "__main__":
+    unittest.main()
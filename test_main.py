@@ -1,27 +1,34 @@
 # test_main.py
 
+import io
+import os
+import subprocess
+import tempfile
 import unittest
+from contextlib import redirect_stderr, redirect_stdout
 from unittest.mock import patch
 import sys
 
 import main
 
+SPOOLS = [
+    {
+        "id": 1,
+        "price": 16.49,
+        "remaining_weight": 912.13,
+        "filament": {
+            "name": "PLA Red",
+            "material": "PLA",
+            "color_hex": "ff0000",
+        },
+    }
+]
+
 class TestMainSnapshot(unittest.TestCase):
-    @patch('main.save_snapshot')
-    @patch('main.get_spools')
-    def test_snapshot_flag(self, mock_get_spools, mock_save_snapshot):
-        mock_get_spools.return_value = [
-            {
-                "id": 1,
-                "price": 16.49,
-                "remaining_weight": 912.13,
-                "filament": {
-                    "name": "PLA Red",
-                    "material": "PLA",
-                    "color_hex": "ff0000",
-                },
-            }
-        ]
+    @patch('snapshot_store.SnapshotStore')
+    @patch('spoolman_instances.fetch_spools')
+    def test_snapshot_flag(self, mock_fetch_spools, mock_store):
+        mock_fetch_spools.return_value = iter(SPOOLS)
         # Preserve original argv
         original_argv = sys.argv
         # Mock sys.argv to simulate calling: python main.py --snapshot
@@ -32,11 +39,39 @@ class TestMainSnapshot(unittest.TestCase):
         # Restore original argv
         sys.argv = original_argv
 
-        mock_get_spools.assert_called_once()
+        mock_fetch_spools.assert_called_once()
+        mock_store.return_value.__enter__.return_value.append.assert_called_once()
+
+    @patch('forecast.DepletionForecast.update', side_effect=RuntimeError("forecast broke"))
+    @patch('spoolman_instances.fetch_spools')
+    def test_failed_forecast_update_keeps_snapshot(self, mock_fetch_spools, mock_update):
+        mock_fetch_spools.return_value = iter(SPOOLS)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'snapshots.db')
+            with redirect_stdout(io.StringIO()) as printed, self.assertLogs(level='ERROR') as logs:
+                main.main(['snapshot', '--store', path])
+            self.assertIn(f"saved to {path}", printed.getvalue())
+            self.assertNotIn("An error occurred", printed.getvalue())
+            self.assertIn("forecast broke", logs.output[0])
+            from snapshot_store import SnapshotStore
+            with SnapshotStore(path) as store:
+                self.assertEqual(len(store.list_snapshots()), 1)
+
+    @patch('snapshot_utils.save_snapshot')
+    @patch('spoolman_instances.fetch_spools')
+    def test_snapshot_file_flag(self, mock_fetch_spools, mock_save_snapshot):
+        mock_fetch_spools.return_value = iter(SPOOLS)
+        original_argv = sys.argv
+        sys.argv = ['main.py', '--snapshot', '--snapshot-file']
+
+        main.main()
+
+        sys.argv = original_argv
+
         mock_save_snapshot.assert_called_once()
 
 class TestMainCompare(unittest.TestCase):
-    @patch('main.compare_snapshots')
+    @patch('snapshot_utils.compare_snapshots')
     def test_compare_snapshots(self, mock_compare_snapshots):
         # Save original argv
         original_argv = sys.argv
@@ -49,7 +84,90 @@ class TestMainCompare(unittest.TestCase):
         # Restore original argv
         sys.argv = original_argv
 
-        mock_compare_snapshots.assert_called_once_with('snapshot1.json', 'snapshot2.json')
+        mock_compare_snapshots.assert_called_once_with('snapshot1.json', 'snapshot2.json', output=None, format=None)
+
+    @patch('os.path.exists', return_value=True)
+    @patch('snapshot_utils.compare_stored_snapshots')
+    @patch('snapshot_store.SnapshotStore')
+    def test_compare_stored_range(self, mock_store, mock_compare_stored, mock_exists):
+        original_argv = sys.argv
+        sys.argv = ['main.py', '--compare', '7d', '--store', 'farm.db']
+
+        main.main()
+
+        sys.argv = original_argv
+
+        mock_store.assert_called_once_with('farm.db')
+        mock_compare_stored.assert_called_once_with(
+            mock_store.return_value.__enter__.return_value, ['7d'], output=None, format=None
+        )
+
+    @patch('snapshot_utils.compare_snapshots')
+    def test_compare_command(self, mock_compare_snapshots):
+        main.main(['compare', 'snapshot1.json', 'snapshot2.json'])
+
+        mock_compare_snapshots.assert_called_once_with('snapshot1.json', 'snapshot2.json', output=None, format=None)
+
+class TestMainReport(unittest.TestCase):
+    def test_bad_source_keeps_previous_report(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = os.path.join(tmpdir, "usage_report.csv")
+            with open(output, "w") as f:
+                f.write("previous report\n")
+            with redirect_stdout(io.StringIO()) as printed:
+                main.main(['report', os.path.join(tmpdir, 'missing'), '--output', output,
+                           '--store', os.path.join(tmpdir, 'none.db')])
+            self.assertIn("Error:", printed.getvalue())
+            with open(output) as f:
+                self.assertEqual(f.read(), "previous report\n")
+            self.assertEqual(os.listdir(tmpdir), ["usage_report.csv"])
+
+class TestProfileOptions(unittest.TestCase):
+    def test_profile_before_command_is_a_flag(self):
+        for argv in (['--profile', 'compare', '7d'], ['compare', '7d', '--profile']):
+            args = main.build_parser('compare').parse_args(argv)
+            self.assertEqual((args.command, args.snapshots, args.profile, args.profile_file), ('compare', ['7d'], True, None))
+        args = main.build_parser('compare').parse_args(['--profile-file', 'compare.prof', 'compare', '7d'])
+        self.assertEqual((args.command, args.profile_file), ('compare', 'compare.prof'))
+
+class TestCommandName(unittest.TestCase):
+    def test_option_values_are_not_commands(self):
+        self.assertEqual(main.command_name(['report', '30d', '--output', 'batch']), 'report')
+        self.assertEqual(main.command_name(['--metrics-file', 'batch', 'compare', '7d', '--help']), 'compare')
+        self.assertIsNone(main.command_name(['--profile']))
+
+class TestGcodeCommand(unittest.TestCase):
+    def test_tools_are_required(self):
+        with redirect_stderr(io.StringIO()) as errors, self.assertRaises(SystemExit):
+            main.main(['gcode', 'prints'])
+        self.assertIn("--tools", errors.getvalue())
+
+class TestLegacyArgv(unittest.TestCase):
+    def test_flags_become_commands(self):
+        self.assertEqual(main.legacy_argv(['--compare', 'a.json', 'b.json']), ['compare', 'a.json', 'b.json'])
+        self.assertEqual(main.legacy_argv(['--batch=jobs.csv', '--offline']), ['batch', 'jobs.csv', '--offline'])
+        self.assertEqual(main.legacy_argv(['--profile', '--report', '30d']), ['report', '30d', '--profile'])
+
+    def test_snapshot_file_is_not_snapshot(self):
+        self.assertEqual(main.legacy_argv(['--snapshot', '--snapshot-file']), ['snapshot', '--snapshot-file'])
+
+    def test_commands_unchanged(self):
+        self.assertEqual(main.legacy_argv(['compare', '7d']), ['compare', '7d'])
+
+class TestStartupImports(unittest.TestCase):
+    # Modules an offline compare must never load: NumPy and the network stack
+    HEAVY_MODULES = {"numpy", "requests", "urllib3", "http.client", "ssl", "dotenv"}
+
+    def test_compare_does_not_import_network_stack(self):
+        directory = os.path.dirname(os.path.abspath(__file__))
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", os.path.join(directory, "main.py"), "compare", "missing1.json", "missing2.json"],
+            capture_output=True, text=True, cwd=directory, timeout=60,
+        )
+        # -X importtime writes 'import time: self | cumulative | module' lines to stderr
+        imported = {line.rsplit("|", 1)[-1].strip() for line in result.stderr.splitlines() if line.startswith("import time:")}
+        self.assertIn("snapshot_utils", imported)
+        self.assertEqual(imported & self.HEAVY_MODULES, set())
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
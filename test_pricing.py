@@ -0,0 +1,89 @@
+# test_pricing.py
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from pricing import PricingEngine, Scenario, print_scenarios, read_scenarios
+
+SPOOLS = [
+    {'id': 1, 'filament': {'name': 'PLA Red', 'material': 'PLA', 'color_hex': 'ff0000', 'diameter': 1.75, 'density': 1.24}, 'price': 20.0, 'initial_weight': 1000},
+    {'id': 2, 'filament': {'name': 'PETG Black', 'material': 'PETG', 'color_hex': '000000'}, 'price': 30.0, 'initial_weight': 1000},
+    {'id': 3, 'filament': {'name': 'PLA Red (cheap)', 'material': 'PLA', 'color_hex': 'ff0000', 'diameter': 1.75, 'density': 1.24}, 'price': 10.0, 'initial_weight': 1000},
+]
+
+JOBS = [
+    ('a', [('1', '100g'), ('2', '50g')]),
+    ('b', [('2', '200g')]),
+    ('c', [('1', '1m+0,1kg')]),
+    ('broken', [('9', '10g')]),
+    ('empty', []),
+]
+
+class TestPricingEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = PricingEngine(JOBS, SPOOLS)
+
+    def test_baseline(self):
+        self.assertEqual(self.engine.job_ids, ['a', 'b', 'c'])
+        self.assertIn('broken', self.engine.errors)
+        self.assertIn('empty', self.engine.errors)
+        self.assertAlmostEqual(self.engine.baseline[0], 3.5)
+        self.assertAlmostEqual(self.engine.baseline[2], 102.9825 * 0.02, places=5)
+
+    def test_price_change_touches_only_affected_jobs(self):
+        result = self.engine.evaluate(Scenario("PETG up", prices={2: 60.0}))
+        self.assertEqual(sorted(result.job_costs), ['a', 'b'])
+        self.assertAlmostEqual(result.job_costs['a'][1], 5.0)
+        self.assertAlmostEqual(result.job_costs['b'][1], 12.0)
+        self.assertAlmostEqual(result.cost - result.baseline_cost, 7.5)
+        self.assertAlmostEqual(self.engine.scenario_cost(Scenario("PETG up", prices={2: 60.0})), result.cost)
+
+    def test_substitution(self):
+        scenario = Scenario("cheap red", substitutions={1: 3})
+        result = self.engine.evaluate(scenario)
+        self.assertEqual(sorted(result.job_costs), ['a', 'c'])
+        self.assertAlmostEqual(result.job_costs['a'][1], 2.5)
+        self.assertAlmostEqual(result.cost, self.engine.scenario_cost(scenario))
+
+        # A substitute's scenario price applies to the usage moved onto it
+        result = self.engine.evaluate(Scenario("cheap red, dearer", prices={3: 40.0}, substitutions={1: 3}))
+        self.assertAlmostEqual(result.job_costs['a'][1], 5.5)
+
+    def test_substitution_needs_same_material_and_color(self):
+        with self.assertRaises(ValueError):
+            self.engine.evaluate(Scenario("wrong", substitutions={1: 2}))
+
+    def test_compare_and_write_jobs(self):
+        written = []
+        rows = self.engine.compare([Scenario("none"), Scenario("PETG up", prices={2: 60.0})], written.append)
+        self.assertEqual([(row['scenario'], row['jobs_affected']) for row in rows], [("none", 0), ("PETG up", 2)])
+        self.assertAlmostEqual(rows[0]['difference'], 0.0)
+        self.assertEqual([row['job_id'] for row in written], ['a', 'b'])
+
+    def test_print_scenarios(self):
+        rows = self.engine.compare([Scenario("PETG up", prices={2: 60.0})])
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            print_scenarios(rows, skipped=1)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0].split(), ["Scenario", "Jobs", "Baseline", "Cost", "Difference"])
+        self.assertEqual(lines[2].split()[:3], ["PETG", "up", "2"])
+        self.assertTrue(lines[2].endswith("+7.50"))
+        self.assertEqual(lines[-1], "1 jobs could not be priced and were left out.")
+
+    def test_read_scenarios(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "scenarios.json")
+            with open(path, "w") as f:
+                json.dump([{"name": "PLA +10%", "prices": {"1": 22.0}}], f)
+            scenarios = read_scenarios(path)
+        self.assertEqual(scenarios[0].name, "PLA +10%")
+        self.assertEqual(scenarios[0].prices, {"1": 22.0})
+
+if __name__ == '__main__':
+    unittest.main()
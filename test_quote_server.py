@@ -0,0 +1,102 @@
+# test_quote_server.py
+
+import http.client
+import json
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from cost_index import CostIndex
+from quote_server import QuoteServer, SpoolIndex, quote
+
+SPOOLS = [
+    {"id": 1, "price": 20.0, "initial_weight": 1000.0, "remaining_weight": 800.0,
+     "filament": {"name": "PLA Red", "material": "PLA", "diameter": 1.75, "density": 1.24}},
+    {"id": 2, "price": 30.0, "initial_weight": 750.0, "remaining_weight": 500.0,
+     "filament": {"name": "PETG Blue", "material": "PETG", "diameter": 1.75, "density": 1.27}},
+]
+
+class TestQuote(unittest.TestCase):
+
+    def setUp(self):
+        self.index = CostIndex(SPOOLS)
+
+    def test_quote(self):
+        result = quote({"job_id": "benchy", "spools": [
+            {"spool_id": 1, "usage": "100g"},
+            {"spool_id": "2", "usage": "75 g"},
+        ]}, self.index)
+        self.assertEqual(result["job_id"], "benchy")
+        self.assertEqual([line["cost"] for line in result["spools"]], [2.0, 3.0])
+        self.assertEqual(result["grams"], 175.0)
+        self.assertEqual(result["cost"], 5.0)
+
+    def test_invalid_requests(self):
+        with self.assertRaises(ValueError):
+            quote({"spools": []}, self.index)
+        with self.assertRaises(ValueError):
+            quote({"spools": [{"spool_id": 1}]}, self.index)
+        with self.assertRaises(ValueError):
+            quote({"spools": [{"spool_id": 9, "usage": "10g"}]}, self.index)
+
+class TestQuoteServer(unittest.TestCase):
+
+    def setUp(self):
+        self.fetches = 0
+
+        def fetch():
+            self.fetches += 1
+            return iter(SPOOLS)
+
+        self.index = SpoolIndex(fetch, refresh_interval=3600)
+        self.index.refresh()
+        self.server = QuoteServer(self.index, "127.0.0.1", 0)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_quote_endpoint(self):
+        response = requests.post(f"{self.url}/quote", json={"spools": [{"spool_id": 1, "usage": "50g"}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["cost"], 1.0)
+
+        response = requests.post(f"{self.url}/quote", data="not json")
+        self.assertEqual(response.status_code, 400)
+        response = requests.post(f"{self.url}/quote", json={"spools": [{"spool_id": 9, "usage": "1g"}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Unknown spool ID 9", response.json()["error"])
+
+        health = requests.get(f"{self.url}/health").json()
+        self.assertEqual(health["spools"], 2)
+
+    def test_bad_content_length(self):
+        for length, status in ((None, 411), ("abc", 400), ("-5", 400)):
+            connection = http.client.HTTPConnection("127.0.0.1", self.server.server_port, timeout=5)
+            connection.putrequest("POST", "/quote")
+            if length is not None:
+                connection.putheader("Content-Length", length)
+            connection.endheaders()
+            response = connection.getresponse()
+            self.assertEqual(response.status, status)
+            self.assertIn("Content-Length", json.loads(response.read())["error"])
+            connection.close()
+
+    def test_concurrent_quotes_use_the_index(self):
+        body = json.dumps({"spools": [{"spool_id": 2, "usage": "1.5m"}]})
+
+        def post(_):
+            return requests.post(f"{self.url}/quote", data=body).json()["cost"]
+
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            costs = list(executor.map(post, range(200)))
+        self.assertEqual(len(set(costs)), 1)
+        self.assertEqual(self.fetches, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+# test_recost.py
+
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from batch import run_batch
+from cost_index import CostIndex
+from recost import iter_chunks, material_totals, merge_totals, recost
+
+SPOOLS = [
+    {"id": 1, "price": 20.0, "initial_weight": 1000.0, "filament": {"name": "PLA Red", "material": "PLA"}},
+    {"id": 2, "price": 30.0, "initial_weight": 750.0, "filament": {"name": "PETG Blue", "material": "PETG"}},
+    {"id": 3, "price": 25.0, "initial_weight": 1000.0, "filament": {"name": "PLA White", "material": "PLA"}},
+]
+
+def make_jobs(count):
+    for number in range(count):
+        items = [(str(number % 3 + 1), f"{number % 50 + 1}g")]
+        if number % 4 == 0:
+            items.append(("2", "1.5m"))
+        if number % 97 == 0:
+            items.append(("9", "1g"))  # Unknown spool
+        yield f"job{number}", items
+
+class TestRecost(unittest.TestCase):
+
+    def test_iter_chunks(self):
+        self.assertEqual([len(chunk) for chunk in iter_chunks(range(7), 3)], [3, 3, 1])
+
+    def test_merge_and_material_totals(self):
+        merged = merge_totals({}, {"1": {"spool_id": "1", "spool_name": "A", "material": "PLA", "jobs": 1, "grams": 10.0, "cost": 0.2}})
+        merge_totals(merged, {
+            "1": {"spool_id": "1", "spool_name": "A", "material": "PLA", "jobs": 2, "grams": 5.0, "cost": 0.1},
+            "3": {"spool_id": "3", "spool_name": "B", "material": "PLA", "jobs": 1, "grams": 1.0, "cost": 0.05},
+        })
+        self.assertEqual(merged["1"]["jobs"], 3)
+        (pla,) = material_totals(merged)
+        self.assertEqual((pla["material"], pla["spools"], pla["jobs"], pla["grams"]), ("PLA", 2, 4, 16.0))
+        self.assertAlmostEqual(pla["cost"], 0.35)
+
+    def test_parallel_matches_sequential(self):
+        rows = []
+        expected = run_batch(make_jobs(1000), CostIndex(SPOOLS), rows.append)
+
+        with tempfile.TemporaryDirectory() as directory:
+            output_path = os.path.join(directory, "recosted.jsonl")
+            progress = []
+            with redirect_stdout(io.StringIO()):
+                totals = recost(make_jobs(1000), SPOOLS, output_path, max_workers=2, chunk_size=64, progress=progress.append)
+            with open(output_path) as output_file:
+                self.assertEqual(sum(1 for _ in output_file), len(rows))
+
+        self.assertEqual(progress[-1], 1000)
+        self.assertEqual(sorted(totals), sorted(expected))
+        for spool_id, total in expected.items():
+            self.assertEqual(totals[spool_id]["jobs"], total["jobs"])
+            self.assertAlmostEqual(totals[spool_id]["cost"], total["cost"])
+
+if __name__ == "__main__":
+    unittest.main()
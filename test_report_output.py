@@ -0,0 +1,118 @@
+# test_report_output.py
+
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from report_output import Column, TableSink, open_sink, sink_format
+
+FIELDS = ["spool_id", "name", "grams"]
+COLUMNS = [Column("spool_id", "Spool ID", 10, ""), Column("name", "Name", 12, ""), Column("grams", "Grams", 10, ".2f")]
+
+def rows(count):
+    return ({"spool_id": i, "name": f"Spool {i}", "grams": i / 4} for i in range(count))
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+class TestReportOutput(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_table(self):
+        stream = io.StringIO()
+        with TableSink(COLUMNS, stream, title="Usage:") as table:
+            table.write_rows(rows(2))
+            table.footer({"spool_id": "TOTAL", "grams": 0.25})
+        self.assertEqual(stream.getvalue().splitlines(), [
+            "Usage:",
+            "Spool ID   Name              Grams",
+            "-" * 34,
+            "0          Spool 0            0.00",
+            "1          Spool 1            0.25",
+            "-" * 34,
+            "TOTAL                         0.25",
+        ])
+
+    def test_rows_are_written_in_batches(self):
+        stream = io.StringIO()
+        writes = []
+        stream.write = lambda text, write=stream.write: writes.append(text) or write(text)
+        with TableSink(COLUMNS, stream) as table:
+            table.buffer_rows = 100
+            table.write_rows(rows(1000))
+        self.assertEqual(len(writes), 11)  # The header and rule go with the first batch
+        self.assertEqual(len(stream.getvalue().splitlines()), 1002)
+
+    def test_csv_and_json_lines(self):
+        for name in ("rows.csv", "rows.jsonl"):
+            with open_sink(self.path(name), FIELDS) as sink:
+                sink.write_rows(rows(5000))
+                sink.footer({"spool_id": "TOTAL"})
+        with open(self.path("rows.csv"), newline="") as csv_file:
+            csv_rows = list(csv.DictReader(csv_file))
+        with open(self.path("rows.jsonl")) as jsonl_file:
+            json_rows = [json.loads(line) for line in jsonl_file]
+        self.assertEqual(len(csv_rows), 5000)
+        self.assertEqual(csv_rows[4999], {"spool_id": "4999", "name": "Spool 4999", "grams": "1249.75"})
+        self.assertEqual(json_rows, list(rows(5000)))
+
+    def test_json_lines_write_nan_as_null(self):
+        with open_sink(self.path("rows.jsonl"), FIELDS) as sink:
+            sink.write({"spool_id": 1, "name": "Spool 1", "grams": float("nan")})
+            sink.write({"spool_id": 2, "name": "Spool 2", "grams": 2.5})
+        with open(self.path("rows.jsonl")) as jsonl_file:
+            lines = jsonl_file.read().splitlines()
+        self.assertEqual(lines[0], '{"spool_id": 1, "name": "Spool 1", "grams": null}')
+        self.assertEqual(json.loads(lines[1])["grams"], 2.5)
+
+    def test_failed_report_keeps_the_previous_file(self):
+        with open_sink(self.path("rows.csv"), FIELDS) as sink:
+            sink.write_rows(rows(3))
+        with self.assertRaises(ValueError):
+            with open_sink(self.path("rows.csv"), FIELDS) as sink:
+                sink.write_rows(rows(2))
+                raise ValueError("No snapshots in range.")
+        with open(self.path("rows.csv"), newline="") as csv_file:
+            self.assertEqual(len(list(csv.DictReader(csv_file))), 3)
+        self.assertEqual(os.listdir(self.tmpdir.name), ["rows.csv"])
+
+    def test_format(self):
+        self.assertEqual(sink_format(None), "table")
+        self.assertEqual(sink_format("out.CSV"), "csv")
+        self.assertEqual(sink_format("out.parquet"), "parquet")
+        self.assertEqual(sink_format("out.txt"), "jsonl")
+        self.assertEqual(sink_format("out.txt", "table"), "table")
+        with self.assertRaises(ValueError):
+            open_sink(self.path("out.txt"), FIELDS, "xml")
+        with self.assertRaises(ValueError):
+            open_sink(None, FIELDS, "parquet")
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet(self):
+        with open_sink(self.path("rows.parquet"), FIELDS) as sink:
+            sink.buffer_rows = 1000
+            sink.write_rows(rows(2500))
+        table = pyarrow.parquet.read_table(self.path("rows.parquet"))
+        self.assertEqual(table.to_pylist(), list(rows(2500)))
+
+    @unittest.skipIf(pyarrow is not None, "pyarrow is installed")
+    def test_parquet_needs_pyarrow(self):
+        with self.assertRaises(ValueError):
+            open_sink(self.path("rows.parquet"), FIELDS)
+        self.assertFalse(os.path.exists(self.path("rows.parquet")))
+
+if __name__ == '__main__':
+    unittest.main()
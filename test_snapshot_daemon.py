@@ -0,0 +1,113 @@
+# test_snapshot_daemon.py
+
+import datetime
+import sqlite3
+import time
+import unittest
+from unittest.mock import patch
+
+from snapshot_daemon import SnapshotDaemon, interval_usage
+from snapshot_store import SnapshotStore
+from test_helpers import spool
+
+class TestIntervalUsage(unittest.TestCase):
+
+    def test_interval_usage(self):
+        previous = {1: spool(1, 800.0), 2: spool(2, 500.0), 3: spool(3, 100.0)}
+        current = {1: spool(1, 750.0), 2: spool(2, 500.0), 4: spool(4, 1000.0)}
+        rows, weight_used, cost_used, added, removed = interval_usage(previous, current)
+        self.assertEqual(rows, [(1, "Spool 1", 50.0, 1.0)])
+        self.assertEqual(weight_used, 50.0)
+        self.assertAlmostEqual(cost_used, 1.0)
+        self.assertEqual(added, [4])
+        self.assertEqual(removed, [3])
+
+class TestSnapshotDaemon(unittest.TestCase):
+
+    def setUp(self):
+        self.store = SnapshotStore(":memory:")
+        self.polls = []
+        self.now = datetime.datetime(2025, 2, 8, 10, 0, 0)
+
+    def tearDown(self):
+        self.store.close()
+
+    def poll(self, daemon, spools):
+        self.polls.append(spools)
+        self.now += datetime.timedelta(minutes=5)
+        return daemon.poll_once(now=self.now)
+
+    def make_daemon(self):
+        return SnapshotDaemon(lambda: iter(self.polls[-1]), self.store, interval=0.01, incremental=True)
+
+    def test_stores_only_changes(self):
+        daemon = self.make_daemon()
+        self.assertTrue(self.poll(daemon, [spool(1, 800.0), spool(2, 500.0)]))
+        self.assertFalse(self.poll(daemon, [spool(1, 800.0), spool(2, 500.0)]))
+        with self.assertLogs("snapshot_daemon", level="INFO") as logs:
+            self.assertTrue(self.poll(daemon, [spool(1, 700.0), spool(2, 500.0)]))
+        self.assertIn("100.00 g used, $2.00", "\n".join(logs.output))
+        self.assertEqual(len(self.store.list_snapshots()), 2)
+        self.assertEqual(self.store.state_at(self.store.list_snapshots()[-1][0])[1][2], 700.0)
+
+    def test_resumes_from_store(self):
+        self.store.append([spool(1, 800.0)], taken_at=self.now)
+        daemon = self.make_daemon()
+        self.assertFalse(self.poll(daemon, [spool(1, 800.0)]))
+        self.assertEqual(len(self.store.list_snapshots()), 1)
+
+    def test_failed_append_is_retried(self):
+        daemon = self.make_daemon()
+        self.assertTrue(self.poll(daemon, [spool(1, 1000.0)]))
+        with patch.object(self.store, "append", side_effect=sqlite3.OperationalError("database is locked")):
+            with self.assertRaises(sqlite3.OperationalError), self.assertNoLogs("snapshot_daemon", level="INFO"):
+                self.poll(daemon, [spool(1, 900.0)])
+        with self.assertLogs("snapshot_daemon", level="INFO") as logs:
+            self.assertTrue(self.poll(daemon, [spool(1, 900.0)]))
+        # The usage of the failed interval is logged once, with the retry that stored it
+        usage = [line for line in logs.output if "g used" in line]
+        self.assertEqual(len(usage), 1)
+        self.assertIn("10:05:00 - 10:15:00", usage[0])
+        self.assertEqual(len(self.store.list_snapshots()), 2)
+        self.assertEqual(self.store.state_at(self.store.list_snapshots()[-1][0])[1][2], 900.0)
+
+    def test_run_survives_failed_poll(self):
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            if len(calls) == 1:
+                raise Exception("Spoolman unreachable")
+            return iter([spool(1, 800.0)])
+
+        daemon = SnapshotDaemon(fetch, self.store, interval=0.01)
+        with self.assertLogs("snapshot_daemon", level="ERROR"):
+            daemon.run(iterations=2)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(len(self.store.list_snapshots()), 1)
+
+    def test_run_survives_failed_after_poll(self):
+        def after_poll():
+            raise OSError("No such directory")
+
+        daemon = SnapshotDaemon(lambda: iter([spool(1, 800.0)]), self.store, interval=0.01, after_poll=after_poll)
+        with self.assertLogs("snapshot_daemon", level="ERROR"):
+            daemon.run(iterations=2)
+        self.assertEqual(len(self.store.list_snapshots()), 1)
+
+    def test_overrun_skips_missed_polls(self):
+        polled = []
+
+        def fetch():
+            polled.append(time.monotonic())
+            if len(polled) == 1:
+                time.sleep(0.35)  # Overruns three intervals
+            return iter([spool(1, 800.0)])
+
+        daemon = SnapshotDaemon(fetch, self.store, interval=0.1)
+        daemon.run(iterations=3)
+        # The polls after the overrun keep their interval instead of running back to back
+        self.assertGreaterEqual(polled[2] - polled[1], 0.09)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+# test_snapshot_store.py
+
+import datetime
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from snapshot_store import DELTA, FULL, KEYFRAME, SnapshotStore, id_sort_key, parse_time_range, parse_time_ref
+from snapshot_utils import stored_comparison_rows
+from test_helpers import spool
+
+NOW = datetime.datetime(2025, 2, 8, 15, 0, 0)
+
+class TestTimeRefs(unittest.TestCase):
+
+    def test_parse_time_ref(self):
+        self.assertEqual(parse_time_ref("now", NOW), NOW)
+        self.assertEqual(parse_time_ref("2h", NOW), datetime.datetime(2025, 2, 8, 13, 0, 0))
+        self.assertEqual(parse_time_ref("-1d", NOW), datetime.datetime(2025, 2, 7, 15, 0, 0))
+        self.assertEqual(parse_time_ref("2025-02-08 10:00", NOW), datetime.datetime(2025, 2, 8, 10, 0, 0))
+        self.assertEqual(parse_time_ref("2025-02-08_10-00-00", NOW), datetime.datetime(2025, 2, 8, 10, 0, 0))
+        with self.assertRaises(ValueError):
+            parse_time_ref("yesterday-ish", NOW)
+
+    def test_parse_time_range(self):
+        self.assertEqual(parse_time_range("1w", NOW), (datetime.datetime(2025, 2, 1, 15, 0, 0), NOW))
+        self.assertEqual(
+            parse_time_range("2025-02-01..2025-02-02", NOW),
+            (datetime.datetime(2025, 2, 1), datetime.datetime(2025, 2, 2)),
+        )
+
+class TestSnapshotStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = SnapshotStore(":memory:")
+        self.store.append(iter([spool(2, 500.0), spool(1, 900.0)]), taken_at=datetime.datetime(2025, 2, 8, 10, 0))
+        self.store.append(iter([spool(1, 700.0), spool(2, 500.0)]), taken_at=datetime.datetime(2025, 2, 8, 15, 0))
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_list_and_resolve(self):
+        snapshots = self.store.list_snapshots()
+        self.assertEqual([count for _, count in snapshots], [2, 2])
+        self.assertEqual(self.store.resolve(datetime.datetime(2025, 2, 8, 12, 0)), snapshots[0][0])
+        self.assertEqual(self.store.resolve(NOW), snapshots[1][0])
+        with self.assertRaises(ValueError):
+            self.store.resolve(datetime.datetime(2025, 1, 1))
+        self.assertEqual(self.store.resolve(datetime.datetime(2025, 1, 1), fallback_to_first=True), snapshots[0][0])
+
+    def test_load_returns_snapshot_records(self):
+        taken_at = self.store.resolve(NOW)
+        records = list(self.store.load(taken_at))
+        self.assertEqual([record["id"] for record in records], [1, 2])
+        self.assertEqual(records[0], spool(1, 700.0))
+
+    def test_id_sort_key(self):
+        ids = ["farm1:10", "10", "b", 2, "farm1:9", "9"]
+        self.assertEqual(sorted(ids, key=id_sort_key), [2, "9", "10", "farm1:9", "farm1:10", "b"])
+
+class TestIncrementalSnapshots(unittest.TestCase):
+
+    def setUp(self):
+        self.store = SnapshotStore(":memory:")
+        self.states = [
+            [spool(1, 900.0), spool(2, 500.0)],
+            [spool(1, 850.0), spool(2, 500.0)],
+            [spool(1, 850.0), spool(2, 450.0), spool(3, 1000.0)],
+            [spool(2, 400.0), spool(3, 990.0)],
+        ]
+        self.taken = [
+            self.store.append(iter(spools), taken_at=datetime.datetime(2025, 2, 8, hour), incremental=True, keyframe_interval=3)
+            for hour, spools in zip(range(10, 14), self.states)
+        ]
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_keyframes_and_deltas(self):
+        kinds = [row[0] for row in self.store.connection.execute("SELECT kind FROM snapshots ORDER BY taken_at")]
+        self.assertEqual(kinds, [KEYFRAME, DELTA, DELTA, KEYFRAME])
+        # The second snapshot only stores the one changed field of spool 1
+        deltas = self.store.connection.execute(
+            "SELECT spool_id, changes FROM spool_deltas WHERE taken_at = ?", (self.taken[1],)
+        ).fetchall()
+        self.assertEqual(deltas, [(1, '{"remaining_weight": 850.0}')])
+
+    def test_reconstructs_every_point(self):
+        for taken_at, spools in zip(self.taken, self.states):
+            self.assertEqual(list(self.store.load(taken_at)), spools)
+
+    def test_changed_spools_reads_deltas(self):
+        self.assertEqual(sorted(self.store.changed_spools(self.taken[0], self.taken[1])), [1])
+        self.assertEqual(sorted(self.store.changed_spools(self.taken[1], self.taken[3])), [1, 2, 3])
+        self.assertEqual(list(self.store.load(self.taken[3], [1, 2])), [spool(2, 400.0)])
+
+    def test_reversed_refs_compare_backwards(self):
+        self.assertEqual(sorted(self.store.changed_spools(self.taken[1], self.taken[0])), [1])
+        _, _, rows = stored_comparison_rows(self.store, ["2025-02-08 11:00", "2025-02-08 10:00"])
+        rows = list(rows)
+        self.assertEqual([(row["spool_id"], row["weight_diff"]) for row in rows], [(1, -50.0)])
+
+    def test_full_snapshot_in_range_disables_delta_compare(self):
+        taken_at = self.store.append(iter([spool(2, 300.0)]), taken_at=datetime.datetime(2025, 2, 8, 14))
+        self.assertIsNone(self.store.changed_spools(self.taken[3], taken_at))
+        self.assertEqual(
+            self.store.connection.execute("SELECT kind FROM snapshots WHERE taken_at = ?", (taken_at,)).fetchone()[0],
+            FULL,
+        )
+
+    def test_rejects_snapshot_older_than_latest(self):
+        with self.assertRaises(ValueError):
+            self.store.append(iter([spool(1, 100.0)]), taken_at=datetime.datetime(2025, 2, 8, 12, 30), incremental=True)
+        self.assertEqual(len(self.store.list_snapshots()), 4)
+
+    def test_overlapping_appends_diff_against_each_other(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "snapshots.db")
+            errors = []
+
+            def append_b():
+                try:
+                    with SnapshotStore(path) as store_b:
+                        store_b.append(
+                            iter([spool(1, 800.0), spool(2, 500.0)]), taken_at=datetime.datetime(2025, 2, 8, 12), incremental=True
+                        )
+                except Exception as e:
+                    errors.append(e)
+
+            with SnapshotStore(path) as store_a:
+                store_a.append(iter([spool(1, 900.0), spool(2, 500.0)]), taken_at=datetime.datetime(2025, 2, 8, 10), incremental=True)
+                thread = threading.Thread(target=append_b)
+                state_at = store_a.state_at
+
+                def slow_state_at(*args, **kwargs):
+                    # A second process starts appending while this one computes its delta
+                    if thread.ident is None:
+                        thread.start()
+                        time.sleep(0.2)
+                    return state_at(*args, **kwargs)
+
+                store_a.state_at = slow_state_at
+                store_a.append(iter([spool(1, 800.0)]), taken_at=datetime.datetime(2025, 2, 8, 11), incremental=True)
+                store_a.state_at = state_at
+                thread.join()
+
+                self.assertEqual(errors, [])
+                taken = [taken_at for taken_at, _ in store_a.list_snapshots()]
+                self.assertEqual(list(store_a.load(taken[1])), [spool(1, 800.0)])
+                self.assertEqual(list(store_a.load(taken[2])), [spool(1, 800.0), spool(2, 500.0)])
+
+    def test_upgrades_store_without_kind_column(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "old.db")
+            connection = sqlite3.connect(path)
+            connection.execute("CREATE TABLE snapshots (taken_at TEXT PRIMARY KEY, spool_count INTEGER NOT NULL)")
+            connection.close()
+
+            with SnapshotStore(path) as store:
+                columns = [row[1] for row in store.connection.execute("PRAGMA table_info(snapshots)")]
+            self.assertIn("kind", columns)
+
+if __name__ == '__main__':
+    unittest.main()
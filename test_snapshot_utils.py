@@ -0,0 +1,139 @@
+# test_snapshot_utils.py
+
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from contextlib import redirect_stdout
+from unittest.mock import patch
+from snapshot_utils import (
+    compare_snapshots,
+    compare_snapshots_streaming,
+    convert_snapshot,
+    iter_snapshot_records,
+    save_snapshot,
+    write_snapshot_file,
+)
+from test_helpers import spool
+
+class TestSnapshotUtils(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_snapshot(self, name, records):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w") as f:
+            json.dump(records, f, indent=2)
+        return path
+
+    def test_iter_snapshot_records_small_chunks(self):
+        records = [spool(i, 1000.0 - i, name="Name, with [brackets] and \"quotes\"") for i in range(20)]
+        path = self.write_snapshot("a.json", records)
+        self.assertEqual(list(iter_snapshot_records(path, chunk_size=7)), records)
+        self.assertEqual(list(iter_snapshot_records(self.write_snapshot("empty.json", []))), [])
+
+    def test_streaming_compare_matches_and_reports_added_removed(self):
+        path1 = self.write_snapshot("a.json", [spool(1, 900.0), spool(2, 500.0), spool(3, 300.0)])
+        path2 = self.write_snapshot("b.json", [spool(1, 700.0), spool(3, 300.0), spool(4, 1000.0)])
+
+        streamed = io.StringIO()
+        with redirect_stdout(streamed):
+            compare_snapshots_streaming(path1, path2)
+        loaded = io.StringIO()
+        with redirect_stdout(loaded):
+            compare_snapshots(path1, path2)
+
+        lines = streamed.getvalue().splitlines()
+        self.assertTrue(any(line.startswith("1 ") and "200.00" in line and "4.00" in line for line in lines))
+        self.assertTrue(any(line.startswith("2 ") and line.endswith(" removed") for line in lines))
+        self.assertTrue(any(line.startswith("4 ") and line.endswith(" added") for line in lines))
+        self.assertEqual(sorted(lines), sorted(loaded.getvalue().splitlines()))
+
+    def test_compare_writes_rows_to_a_file(self):
+        path1 = self.write_snapshot("a.json", [spool(1, 900.0), spool(2, 500.0), spool(3, 300.0)])
+        path2 = self.write_snapshot("b.json", [spool(1, 700.0), spool(3, 300.0), spool(4, 1000.0)])
+        output = os.path.join(self.tmpdir.name, "diff.jsonl")
+        compare_snapshots(path1, path2, output=output)
+        with open(output) as diff_file:
+            rows = [json.loads(line) for line in diff_file]
+        self.assertEqual([(row["spool_id"], row["status"]) for row in rows], [(1, ""), (4, "added"), (2, "removed")])
+        self.assertAlmostEqual(rows[0]["weight_diff"], 200.0)
+        self.assertAlmostEqual(rows[0]["cost_used"], 4.0)
+
+    def test_streaming_compare_rejects_unsorted_file(self):
+        path1 = self.write_snapshot("a.json", [spool(2, 900.0), spool(1, 500.0)])
+        path2 = self.write_snapshot("b.json", [spool(1, 500.0), spool(2, 800.0)])
+        with redirect_stdout(io.StringIO()), self.assertRaises(ValueError):
+            compare_snapshots_streaming(path1, path2)
+
+class TestSnapshotFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def save(self, spools, **options):
+        with redirect_stdout(io.StringIO()):
+            return save_snapshot(spools, directory=self.tmpdir.name, **options)
+
+    def test_runs_in_the_same_second_get_their_own_files(self):
+        with patch("snapshot_utils.datetime") as mock_datetime:
+            mock_datetime.datetime.now.return_value.strftime.return_value = "2025-02-08_10-00-00"
+            first = self.save([spool(1, 900.0)])
+            second = self.save([spool(1, 800.0)])
+        self.assertEqual(os.path.basename(first), "snapshot_2025-02-08_10-00-00.json")
+        self.assertEqual(os.path.basename(second), "snapshot_2025-02-08_10-00-00_1.json")
+        self.assertEqual(list(iter_snapshot_records(first)), [spool(1, 900.0)])
+        self.assertEqual(list(iter_snapshot_records(second)), [spool(1, 800.0)])
+
+    def test_failed_write_leaves_no_file(self):
+        def spools():
+            yield spool(1, 900.0)
+            raise RuntimeError("Spoolman went away")
+
+        with self.assertRaises(RuntimeError):
+            self.save(spools())
+        self.assertEqual(os.listdir(self.tmpdir.name), [])
+
+    def test_gzip_snapshot(self):
+        path = self.save([spool(1, 900.0), spool(2, 500.0)], compression="gzip")
+        self.assertTrue(path.endswith(".json.gz"))
+        self.assertEqual([record["id"] for record in iter_snapshot_records(path)], [1, 2])
+
+        target = os.path.join(self.tmpdir.name, "plain.json")
+        self.assertEqual(convert_snapshot(path, target), 2)
+        with open(target) as f:
+            self.assertEqual(len(json.load(f)), 2)
+
+    def test_zstd_snapshot(self):
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            with self.assertRaises(ValueError):
+                self.save([spool(1, 900.0)], compression="zstd")
+            self.assertEqual(os.listdir(self.tmpdir.name), [])
+            return
+        path = self.save([spool(1, 900.0)], compression="zstd")
+        self.assertEqual(list(iter_snapshot_records(path)), [spool(1, 900.0)])
+
+    def test_write_replaces_unless_exclusive(self):
+        path = os.path.join(self.tmpdir.name, "a.json")
+        write_snapshot_file([spool(1, 900.0)], path)
+        self.assertEqual(write_snapshot_file([spool(1, 800.0)], path), path)
+        self.assertEqual(list(iter_snapshot_records(path)), [spool(1, 800.0)])
+        self.assertEqual(write_snapshot_file([spool(1, 700.0)], path, exclusive=True), path[:-5] + "_1.json")
+
+    def test_binary_snapshots_are_not_compressed(self):
+        with self.assertRaises(ValueError):
+            self.save([spool(1, 900.0)], binary=True, compression="gzip")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# test_spool_cache.py
+
+import tempfile
+import threading
+import time
+import unittest
+
+from unittest.mock import MagicMock
+from spool_cache import CacheMissError, SpoolCache
+
+def make_response(status_code, spools=None, etag=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = spools
+    response.headers = {"ETag": etag} if etag else {}
+    return response
+
+class TestSpoolCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = SpoolCache(directory=self.tmpdir.name, ttl=0)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_offline_without_cache_raises(self):
+        with self.assertRaises(CacheMissError):
+            list(self.cache.iter_spools("spools", MagicMock(), page_size=2, offline=True))
+
+    def test_revalidation_reuses_unchanged_pages(self):
+        fetch_page = MagicMock(side_effect=[
+            make_response(200, [{"id": 1}, {"id": 2, "archived": True}], etag='"p0"'),
+            make_response(200, [{"id": 3}], etag='"p1"'),
+        ])
+        keep = lambda spool: not spool.get("archived", False)
+        first = list(self.cache.iter_spools("spools", fetch_page, page_size=2, keep=keep))
+        self.assertEqual([spool["id"] for spool in first], [1, 3])
+
+        # First page unchanged, second page changed on the server
+        fetch_page = MagicMock(side_effect=[
+            make_response(304),
+            make_response(200, [{"id": 3, "remaining_weight": 10}], etag='"p1b"'),
+        ])
+        second = list(self.cache.iter_spools("spools", fetch_page, page_size=2, keep=keep))
+        self.assertEqual(second, [{"id": 1}, {"id": 3, "remaining_weight": 10}])
+        self.assertEqual(fetch_page.call_args_list[0].args, (0, {"If-None-Match": '"p0"'}))
+        self.assertEqual(fetch_page.call_args_list[1].args, (2, {"If-None-Match": '"p1"'}))
+
+        # Offline mode serves the latest cached copy
+        offline = list(self.cache.iter_spools("spools", MagicMock(), page_size=2, offline=True))
+        self.assertEqual(offline, second)
+
+    def test_stops_when_server_ignores_offset(self):
+        fetch_page = MagicMock(return_value=make_response(200, [{"id": 1}, {"id": 2}]))
+        spools = list(self.cache.iter_spools("spools", fetch_page, page_size=2))
+        self.assertEqual([spool["id"] for spool in spools], [1, 2])
+        self.assertEqual(fetch_page.call_count, 2)
+
+    def test_fresh_cache_skips_server(self):
+        self.cache.ttl = 3600
+        fetch_page = MagicMock(return_value=make_response(200, [{"id": 1}]))
+        list(self.cache.iter_spools("spools", fetch_page, page_size=2))
+        list(self.cache.iter_spools("spools", fetch_page, page_size=2))
+        fetch_page.assert_called_once()
+
+    def test_abandoned_fetch_keeps_previous_cache(self):
+        fetch_page = MagicMock(return_value=make_response(200, [{"id": 1}]))
+        list(self.cache.iter_spools("spools", fetch_page, page_size=2))
+
+        fetch_page = MagicMock(return_value=make_response(200, [{"id": 7}, {"id": 8}]))
+        spools = self.cache.iter_spools("spools", fetch_page, page_size=2)
+        next(spools)
+        spools.close()
+
+        self.assertEqual(list(self.cache.iter_cached("spools")), [{"id": 1}])
+
+    def test_not_modified_without_cached_page_refetches(self):
+        fetch_page = MagicMock(side_effect=[make_response(304), make_response(200, [{"id": 1}])])
+        spools = list(self.cache.iter_spools("spools", fetch_page, page_size=2))
+        self.assertEqual(spools, [{"id": 1}])
+        self.assertEqual(fetch_page.call_args_list[1].args, (0, {}))
+
+    def test_readers_wait_for_a_replace_in_progress(self):
+        list(self.cache.iter_spools("spools", MagicMock(return_value=make_response(200, [{"id": 1}])), page_size=2))
+        read = []
+        reader = threading.Thread(target=lambda: read.extend(self.cache.iter_cached("spools")))
+        with self.cache._lock("spools", exclusive=True):
+            reader.start()
+            time.sleep(0.1)
+            self.assertTrue(reader.is_alive())
+            self.assertEqual(read, [])
+        reader.join()
+        self.assertEqual(read, [{"id": 1}])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+# test_spoolman_client.py
+
+import unittest
+
+from unittest.mock import patch
+from spoolman_client import SpoolmanClient, build_headers, close_clients, get_client
+
+class TestSpoolmanClient(unittest.TestCase):
+
+    def tearDown(self):
+        close_clients()
+
+    def test_build_headers(self):
+        self.assertNotIn("Authorization", build_headers())
+        self.assertEqual(build_headers("secret")["Authorization"], "Bearer secret")
+
+    def test_session_is_pooled_with_retries(self):
+        client = SpoolmanClient("http://localhost:7912/api/v1/", api_key="secret", retries=5, pool_size=4)
+        adapter = client.session.get_adapter("http://localhost:7912/api/v1/spool")
+        self.assertEqual(adapter.max_retries.total, 5)
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertEqual(client.session.headers["Authorization"], "Bearer secret")
+
+    def test_get_uses_base_url_and_timeout(self):
+        client = SpoolmanClient("http://localhost:7912/api/v1", timeout=7.5)
+        with patch.object(client.session, "get") as mock_get:
+            client.get("/spool", params={"limit": 10})
+        mock_get.assert_called_once_with(
+            "http://localhost:7912/api/v1/spool", params={"limit": 10}, headers=None, timeout=7.5
+        )
+
+    @patch.dict("os.environ", {"SPOOLMAN_API_KEY": "from-env", "SPOOLMAN_TIMEOUT": "3"})
+    def test_get_client_is_shared_per_url(self):
+        client = get_client("http://localhost:7912/api/v1")
+        self.assertIs(client, get_client("http://localhost:7912/api/v1/"))
+        self.assertIsNot(client, get_client("http://farm2:7912/api/v1"))
+        self.assertEqual(client.session.headers["Authorization"], "Bearer from-env")
+        self.assertEqual(client.timeout, 3.0)
+
+if __name__ == '__main__':
+    unittest.main()
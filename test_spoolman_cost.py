@@ -0,0 +1,69 @@
+# test_spoolman_cost.py
+
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import calculate_filament_cost
+import filament_calculations
+import spoolman_cost
+
+SPOOLS = [
+    {'id': 1, 'filament': {'name': 'PLA Red', 'material': 'PLA', 'diameter': 1.75, 'density': 1.24}, 'price': 20.0, 'initial_weight': 1000},
+    {'id': 2, 'filament': {'name': 'PETG Black', 'material': 'PETG'}, 'price': 30.0, 'initial_weight': 1000},
+]
+
+JOBS = [
+    ('a', [('1', '100g'), ('2', '50g')]),
+    ('b', [('2', '2kg')]),
+    ('c', [('3', '10g')]),
+    spoolman_cost.Job('d', [], "unreadable.gcode is empty."),
+]
+
+class TestLibrary(unittest.TestCase):
+
+    def test_public_names_resolve(self):
+        for name in spoolman_cost.__all__:
+            self.assertTrue(hasattr(spoolman_cost, name), name)
+
+    def test_price_batch(self):
+        result = spoolman_cost.price_batch(JOBS, SPOOLS)
+        self.assertEqual([job.job_id for job in result.jobs], ['a', 'b', 'c', 'd'])
+        a, b, c, d = result.jobs
+        self.assertEqual((a.spools, a.error), (2, ''))
+        self.assertAlmostEqual(a.cost, 3.5)
+        self.assertEqual(a.lines[0][0], '1')
+        self.assertAlmostEqual(b.grams, 2000.0)
+        self.assertEqual(c.error, "Unknown spool ID 3.")
+        self.assertEqual((d.spools, d.error), (0, "unreadable.gcode is empty."))
+        self.assertEqual([(row['spool_id'], row['jobs']) for row in result.totals], [('1', 1), ('2', 2)])
+        self.assertAlmostEqual(result.totals[1]['cost'], 61.5)
+
+    def test_price_batch_takes_numeric_and_rejects_missing_usage(self):
+        result = spoolman_cost.price_batch([("a", [(1, 100)]), ("b", [(1, None)])], SPOOLS)
+        self.assertAlmostEqual(result.jobs[0].cost, 2.0)
+        self.assertEqual(result.jobs[0].error, '')
+        self.assertIn("Invalid usage 'None'", result.jobs[1].error)
+        engine = spoolman_cost.PricingEngine([("a", [(1, 100)]), ("b", [(1, None)])], SPOOLS)
+        self.assertEqual(engine.job_ids, ["a"])
+        self.assertIn("b", engine.errors)
+
+    def test_price_batch_from_threads(self):
+        index = spoolman_cost.CostIndex(SPOOLS)
+        expected = spoolman_cost.price_batch(JOBS, index)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: spoolman_cost.price_batch(JOBS, index), range(32)))
+        self.assertTrue(all(result == expected for result in results))
+
+    def test_legacy_module_uses_shared_functions(self):
+        self.assertIs(calculate_filament_cost.calculate_cost, filament_calculations.calculate_cost)
+        self.assertIs(calculate_filament_cost.parse_filament_input, filament_calculations.parse_filament_input)
+        # Both checks used to exist in only one of the two copies
+        with self.assertRaises(ValueError):
+            calculate_filament_cost.calculate_cost(-1, 1000, 20)
+        self.assertAlmostEqual(
+            calculate_filament_cost.calculate_mass_per_meter(0, 1.24),
+            calculate_filament_cost.calculate_mass_per_meter(1.75, 1.24),
+        )
+
+if __name__ == '__main__':
+    unittest.main()
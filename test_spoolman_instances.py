@@ -0,0 +1,47 @@
+# test_spoolman_instances.py
+
+import threading
+import unittest
+
+from unittest.mock import patch
+from spoolman_instances import fetch_spools, instances_from_env, parse_instances
+from snapshot_store import id_sort_key
+
+class TestSpoolmanInstances(unittest.TestCase):
+
+    def test_parse_instances(self):
+        self.assertEqual(
+            parse_instances("farm1=http://10.0.0.5:7912/api/v1, http://farm2:7912/api/v1,"),
+            [("farm1", "http://10.0.0.5:7912/api/v1"), ("farm2:7912", "http://farm2:7912/api/v1")],
+        )
+        with self.assertRaises(ValueError):
+            parse_instances("a=http://x/api/v1,a=http://y/api/v1")
+
+    @patch.dict("os.environ", {"SPOOLMAN_API_URL": "http://spoolman:7912/api/v1"}, clear=True)
+    def test_instances_from_env_defaults_to_single_url(self):
+        self.assertEqual(instances_from_env(), [("spoolman:7912", "http://spoolman:7912/api/v1")])
+
+    @patch('spoolman_instances.iter_spools')
+    def test_single_instance_is_streamed_unchanged(self, mock_iter_spools):
+        mock_iter_spools.return_value = iter([{'id': 1}])
+        spools = list(fetch_spools([("farm1", "http://farm1/api/v1")]))
+        self.assertEqual(spools, [{'id': 1}])
+
+    @patch('spoolman_instances.get_spools')
+    def test_instances_are_fetched_concurrently_and_namespaced(self, mock_get_spools):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def get_spools(url, cache=None, offline=False):
+            # Both fetches must be in flight at the same time to pass the barrier
+            barrier.wait()
+            return [{'id': 2}, {'id': 10}] if "farm2" in url else [{'id': 1}]
+
+        mock_get_spools.side_effect = get_spools
+        spools = list(fetch_spools([("farm2", "http://farm2/api/v1"), ("farm1", "http://farm1/api/v1")]))
+
+        self.assertEqual([spool['id'] for spool in spools], ["farm1:1", "farm2:2", "farm2:10"])
+        self.assertEqual(spools[1]['instance'], "farm2")
+        self.assertEqual([spool['id'] for spool in spools], sorted((spool['id'] for spool in spools), key=id_sort_key))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+# test_usage_report.py
+
+import datetime
+import json
+import os
+import tempfile
+import unittest
+
+from snapshot_store import SnapshotStore
+from usage_report import iter_directory_states, iter_store_states, usage_report
+from test_helpers import spool
+
+SNAPSHOTS = [
+    (datetime.datetime(2025, 2, 7, 9, 0), [spool(1, 900.0), spool(2, 500.0, "PETG")]),
+    (datetime.datetime(2025, 2, 7, 18, 0), [spool(1, 800.0), spool(2, 450.0, "PETG")]),
+    (datetime.datetime(2025, 2, 8, 9, 0), [spool(1, 700.0), spool(2, 460.0, "PETG"), spool(3, 1000.0)]),
+]
+
+class TestUsageReport(unittest.TestCase):
+
+    def test_daily_report_from_directory(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for taken_at, spools in SNAPSHOTS:
+                name = f"snapshot_{taken_at:%Y-%m-%d_%H-%M-%S}.json"
+                with open(os.path.join(tmpdir, name), "w") as f:
+                    json.dump(spools, f)
+            rows = list(usage_report(iter_directory_states(tmpdir), interval="day"))
+
+        self.assertEqual(
+            [(row["period_start"][:10], row["level"], row["key"], row["grams"], row["cost"]) for row in rows],
+            [
+                ("2025-02-07", "spool", 1, 100.0, 2.0),
+                ("2025-02-07", "spool", 2, 50.0, 1.0),
+                ("2025-02-07", "material", "PETG", 50.0, 1.0),
+                ("2025-02-07", "material", "PLA", 100.0, 2.0),
+                # Spool 2 gained weight and spool 3 is new, so neither counts as consumption
+                ("2025-02-08", "spool", 1, 100.0, 2.0),
+                ("2025-02-08", "material", "PLA", 100.0, 2.0),
+            ],
+        )
+
+    def test_per_snapshot_report_from_incremental_store(self):
+        with SnapshotStore(":memory:") as store:
+            for taken_at, spools in SNAPSHOTS:
+                store.append(iter(spools), taken_at=taken_at, incremental=True, keyframe_interval=2)
+            states = list(iter_store_states(store))
+            self.assertEqual([sorted(state) for _, state in states], [[1, 2], [1, 2], [1, 2, 3]])
+            rows = list(usage_report(iter(states), interval="snapshot"))
+
+        periods = sorted({(row["period_start"], row["period_end"]) for row in rows})
+        self.assertEqual(periods, [
+            ("2025-02-07 09:00:00", "2025-02-07 18:00:00"),
+            ("2025-02-07 18:00:00", "2025-02-08 09:00:00"),
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
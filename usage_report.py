@@ -0,0 +1,146 @@
+# usage_report.py
+
+import datetime
+import os
+
+from snapshot_store import TIMESTAMP_FORMAT, id_sort_key, parse_time_range, state_record
+from snapshot_utils import FILE_TIMESTAMP_FORMAT, SNAPSHOT_EXTENSIONS, load_snapshot_records, spool_usage
+
+REPORT_FIELDS = ["period_start", "period_end", "level", "key", "name", "material", "grams", "cost"]
+INTERVALS = ("snapshot", "hour", "day", "week")
+
+def snapshot_file_time(path):
+    """
+    Returns the time a snapshot file was taken, from its snapshot_<timestamp>.json
+    name (snapshot_<timestamp>_<n>.json for runs in the same second), or from its
+    modification time if the name carries no timestamp.
+    """
+    stem = os.path.basename(path).split(".", 1)[0]
+    timestamp = stem[len("snapshot_"):]
+    if timestamp.rpartition("_")[2].isdigit() and timestamp.count("_") > 1:
+        timestamp = timestamp.rpartition("_")[0]
+    try:
+        return datetime.datetime.strptime(timestamp, FILE_TIMESTAMP_FORMAT)
+    except ValueError:
+        return datetime.datetime.fromtimestamp(os.path.getmtime(path))
+
+def iter_directory_states(directory):
+    """
+    Yields (taken_at, {spool_id: record}) for every snapshot file in a directory,
+    oldest first. Each file is read once, and only when its turn comes.
+    """
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.lower().endswith(SNAPSHOT_EXTENSIONS)]
+    for taken_at, path in sorted((snapshot_file_time(path), path) for path in paths):
+        yield taken_at, {record['id']: record for record in load_snapshot_records(path)}
+
+def iter_store_states(store, start=None, end=None):
+    """
+    Yields (taken_at, {spool_id: record}) for the stored snapshots in a time range, oldest first.
+    """
+    for taken_at, state in store.iter_states(start, end):
+        yield (
+            datetime.datetime.strptime(taken_at, TIMESTAMP_FORMAT),
+            {spool_id: state_record(spool_id, fields) for spool_id, fields in state.items()},
+        )
+
+def period_start(when, interval):
+    """
+    Returns the start of the reporting period (hour, day or ISO week) containing a time.
+    """
+    if interval == "hour":
+        return when.replace(minute=0, second=0, microsecond=0)
+    day = when.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    return day
+
+def usage_report(states, interval="day"):
+    """
+    Computes filament consumption and cost per spool and per material for each period
+    in a single ordered pass over snapshot states, yielding report rows (dicts with
+    REPORT_FIELDS) as each period completes.
+
+    Consumption between two consecutive snapshots is attributed to the period in
+    which the later one was taken; with interval='snapshot' every consecutive pair
+    is its own period. Only weight decreases count as consumption. Apart from the
+    running totals of the current period, the previous state is all that is kept.
+    """
+    previous_time = previous = None
+    current_period = None
+    spool_totals = {}
+
+    for taken_at, state in states:
+        if previous is not None:
+            if interval == "snapshot":
+                period = (previous_time, taken_at)
+            else:
+                start = period_start(taken_at, interval)
+                period = (start, None)
+
+            if period != current_period:
+                if current_period is not None:
+                    yield from _period_rows(current_period, spool_totals, interval)
+                current_period = period
+                spool_totals = {}
+
+            for spool_id, spool2 in state.items():
+                spool1 = previous.get(spool_id)
+                if spool1 is None:
+                    continue
+                weight_diff, cost_used = spool_usage(spool1, spool2)
+                if weight_diff <= 0:
+                    continue
+                totals = spool_totals.get(spool_id)
+                if totals is None:
+                    filament = spool2['filament']
+                    totals = spool_totals[spool_id] = [
+                        filament.get('name', 'Unknown'), filament.get('material') or 'Unknown', 0.0, 0.0
+                    ]
+                totals[2] += weight_diff
+                totals[3] += cost_used
+
+        previous_time, previous = taken_at, state
+
+    if current_period is not None:
+        yield from _period_rows(current_period, spool_totals, interval)
+
+def _period_rows(period, spool_totals, interval):
+    start, end = period
+    if end is None:
+        if interval == "hour":
+            end = start + datetime.timedelta(hours=1)
+        elif interval == "week":
+            end = start + datetime.timedelta(weeks=1)
+        else:
+            end = start + datetime.timedelta(days=1)
+    start_text, end_text = start.isoformat(sep=" "), end.isoformat(sep=" ")
+
+    material_totals = {}
+    for spool_id in sorted(spool_totals, key=id_sort_key):
+        name, material, grams, cost = spool_totals[spool_id]
+        yield {
+            "period_start": start_text, "period_end": end_text, "level": "spool", "key": spool_id,
+            "name": name, "material": material, "grams": round(grams, 2), "cost": round(cost, 2),
+        }
+        totals = material_totals.setdefault(material, [0.0, 0.0])
+        totals[0] += grams
+        totals[1] += cost
+
+    for material in sorted(material_totals):
+        grams, cost = material_totals[material]
+        yield {
+            "period_start": start_text, "period_end": end_text, "level": "material", "key": material,
+            "name": "", "material": material, "grams": round(grams, 2), "cost": round(cost, 2),
+        }
+
+def report_states(source, store=None):
+    """
+    Resolves a --report source, either a directory of snapshot files or a time range
+    such as '7d' or '2025-02-01..2025-02-08' in the snapshot store, to snapshot states.
+    """
+    if os.path.isdir(source):
+        return iter_directory_states(source)
+    if store is None:
+        raise ValueError(f"{source} is not a directory and no snapshot store is available.")
+    start, end = parse_time_range(source)
+    return iter_store_states(store, start, end)